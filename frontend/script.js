@@ -114,37 +114,78 @@ function displayRecipe(recipe) {
     DOM.responseSection.style.display = 'block';
 }
 
-// API call to generate recipe
-async function generateRecipe(formData) {
+// Show instructions while they are still streaming in
+function displayPartialInstructions(text) {
+    DOM.recipeTitle.textContent = 'Generating...';
+    DOM.instructionsContainer.innerHTML = marked.parse(text);
+    DOM.responseSection.style.display = 'block';
+}
+
+// Parse one Server-Sent Event block into its event name and JSON payload
+function parseEvent(block) {
+    let event = 'message';
+    const dataLines = [];
+    block.split('\n').forEach(line => {
+        if (line.startsWith('event:')) {
+            event = line.slice(6).trim();
+        } else if (line.startsWith('data:')) {
+            dataLines.push(line.slice(5).trim());
+        }
+    });
+    return { event, data: dataLines.length ? JSON.parse(dataLines.join('\n')) : null };
+}
+
+// API call to generate recipe, streaming the instructions as they are generated
+async function generateRecipe(formData, onChunk) {
+    let response;
     try {
-        const response = await fetch('http://127.0.0.1:8000/api/recipes/generate/', {
+        response = await fetch('http://127.0.0.1:8000/api/recipes/generate/stream/', {
             method: 'POST',
             headers: {
                 'Content-Type': 'application/json',
+                'Accept': 'text/event-stream',
             },
             body: JSON.stringify(formData),
         });
-
-        if (!response.ok) {
-            const errorData = await response.json();
-            console.error('Serializer errors:', errorData);
-            throw new Error(
-                errorData.errors
-                    ? JSON.stringify(errorData.errors)
-                    : `HTTP error! Status: ${response.status}`
-            );
-        }
-
-        const data = await response.json();
-        return data;
     } catch (error) {
         console.error('API error:', error);
-        throw new Error(
-            error.message.includes('HTTP error')
-                ? error.message
-                : 'Failed to generate recipe. Please check the form data and try again.'
-        );
+        throw new Error('Failed to generate recipe. Please check the form data and try again.');
+    }
+
+    if (!response.ok) {
+        const errorText = await response.text();
+        console.error('Serializer errors:', errorText);
+        throw new Error(`HTTP error! Status: ${response.status}`);
     }
+
+    const reader = response.body.getReader();
+    const decoder = new TextDecoder();
+    let buffer = '';
+    let instructions = '';
+
+    while (true) {
+        const { done, value } = await reader.read();
+        if (done) {
+            break;
+        }
+        buffer += decoder.decode(value, { stream: true });
+        const blocks = buffer.split('\n\n');
+        buffer = blocks.pop();
+
+        for (const block of blocks) {
+            const { event, data } = parseEvent(block);
+            if (event === 'chunk') {
+                instructions += data.text;
+                onChunk(instructions);
+            } else if (event === 'recipe') {
+                return data;
+            } else if (event === 'error') {
+                throw new Error(data.error || 'Failed to generate recipe.');
+            }
+        }
+    }
+
+    throw new Error('Failed to generate recipe. The connection closed early.');
 }
 
 // Get form data
@@ -189,7 +230,7 @@ DOM.form.addEventListener('submit', async (e) => {
 
     try {
         toggleLoading(true);
-        const recipe = await generateRecipe(formData);
+        const recipe = await generateRecipe(formData, displayPartialInstructions);
         displayRecipe(recipe);
     } catch (error) {
         showError(error.message);
@@ -3,6 +3,12 @@ ASGI config for recipe_creator project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
 
+Serve it with an ASGI server so async views such as
+``recipes.views.generate_recipe_async`` can hold many generations in flight
+per worker, e.g.::
+
+    gunicorn recipe_creator.asgi:application -k uvicorn.workers.UvicornWorker
+
 For more information on this file, see
 https://docs.djangoproject.com/en/5.2/howto/deployment/asgi/
 """
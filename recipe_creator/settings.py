@@ -48,6 +48,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    "recipes.metrics.MetricsMiddleware",
+    "recipes.routers.ReplicaRoutingMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
@@ -81,12 +83,83 @@ WSGI_APPLICATION = "recipe_creator.wsgi.application"
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
 
-DATABASES = {
-    "default": {
+# SQLite by default, tuned for a single node: WAL lets readers run alongside
+# the writer, synchronous=NORMAL is durable enough under WAL, and IMMEDIATE
+# transactions take the write lock up front instead of failing to upgrade a
+# read lock mid-transaction. Set DATABASE_ENGINE=postgresql with
+# DATABASE_NAME, DATABASE_USER, DATABASE_PASSWORD, DATABASE_HOST and
+# DATABASE_PORT for PostgreSQL, and DATABASE_POOL=true there to use psycopg's
+# connection pool. Otherwise connections are kept open for
+# DATABASE_CONN_MAX_AGE seconds instead of one per request.
+#
+# DATABASE_REPLICAS is a comma-separated list of read replicas: PostgreSQL
+# hosts, or SQLite files standing in for them locally. recipes.routers sends
+# request reads to a replica and writes to the primary; a client that writes
+# reads from the primary for the next RECIPE_REPLICA_LAG seconds.
+
+DATABASE_ENGINE = getenv("DATABASE_ENGINE", "sqlite3")
+DATABASE_CONN_MAX_AGE = int(getenv("DATABASE_CONN_MAX_AGE", 600))
+DATABASE_POOL = getenv("DATABASE_POOL", "").lower() in ("1", "true")
+DATABASE_REPLICAS = [
+    replica.strip()
+    for replica in getenv("DATABASE_REPLICAS", "").split(",")
+    if replica.strip()
+]
+SQLITE_PRAGMAS = (
+    "PRAGMA journal_mode=WAL;"
+    "PRAGMA synchronous=NORMAL;"
+    "PRAGMA cache_size=-65536;"
+    "PRAGMA temp_store=MEMORY;"
+    "PRAGMA mmap_size=268435456"
+)
+
+
+def database(location: str) -> dict:
+    """
+    Connection settings for the primary or a replica, by SQLite file or
+    PostgreSQL host.
+    """
+    if DATABASE_ENGINE == "postgresql":
+        return {
+            "ENGINE": "django.db.backends.postgresql",
+            "NAME": getenv("DATABASE_NAME", "recipe_creator"),
+            "USER": getenv("DATABASE_USER", ""),
+            "PASSWORD": getenv("DATABASE_PASSWORD", ""),
+            "HOST": location,
+            "PORT": getenv("DATABASE_PORT", ""),
+            # the pool replaces persistent connections
+            "CONN_MAX_AGE": 0 if DATABASE_POOL else DATABASE_CONN_MAX_AGE,
+            "CONN_HEALTH_CHECKS": True,
+            "OPTIONS": {"pool": True} if DATABASE_POOL else {},
+        }
+    return {
         "ENGINE": "django.db.backends.sqlite3",
-        "NAME": BASE_DIR / "db.sqlite3",
+        "NAME": location,
+        "CONN_MAX_AGE": DATABASE_CONN_MAX_AGE,
+        "CONN_HEALTH_CHECKS": True,
+        "OPTIONS": {
+            "init_command": SQLITE_PRAGMAS,
+            "transaction_mode": "IMMEDIATE",
+            # seconds a writer waits for the lock before "database is locked"
+            "timeout": 20,
+        },
     }
+
+
+DATABASES = {
+    "default": database(
+        getenv("DATABASE_HOST", "")
+        if DATABASE_ENGINE == "postgresql"
+        else getenv("DATABASE_NAME", str(BASE_DIR / "db.sqlite3"))
+    ),
+    **{
+        f"replica_{n}": {**database(replica), "TEST": {"MIRROR": "default"}}
+        for n, replica in enumerate(DATABASE_REPLICAS, 1)
+    },
 }
+DATABASE_ROUTERS = ["recipes.routers.ReplicaRouter"]
+RECIPE_READ_REPLICAS = [alias for alias in DATABASES if alias != "default"]
+RECIPE_REPLICA_LAG = int(getenv("RECIPE_REPLICA_LAG", 5))
 
 
 # Password validation
@@ -132,6 +205,156 @@ DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
 
 REST_FRAMEWORK = {
     "DEFAULT_SCHEMA_CLASS": "drf_spectacular.openapi.AutoSchema",
+    "DEFAULT_RENDERER_CLASSES": [
+        "recipes.renderers.FastJSONRenderer",
+        "rest_framework.renderers.BrowsableAPIRenderer",
+    ],
 }
 
 CORS_ALLOW_ALL_ORIGINS = True
+
+# Caches
+# https://docs.djangoproject.com/en/5.2/topics/cache/
+# The "recipes" cache holds upstream API responses. LocMemCache is per-process;
+# point RECIPE_CACHE_BACKEND/RECIPE_CACHE_LOCATION at a shared backend (e.g.
+# django.core.cache.backends.redis.RedisCache with maxmemory-policy allkeys-lru)
+# so every gunicorn worker shares entries.
+# The "recipes_state" cache holds bookkeeping that eviction must not drop:
+# cache hit/miss counters, the /metrics histograms and the change logs of the
+# in-memory recipe indexes. Its keys are few and never expire, so give a shared
+# backend its own database with maxmemory-policy noeviction.
+
+RECIPE_CACHE_ALIAS = "recipes"
+RECIPE_CACHE_BACKEND = getenv(
+    "RECIPE_CACHE_BACKEND", "django.core.cache.backends.locmem.LocMemCache"
+)
+RECIPE_STATE_CACHE_ALIAS = "recipes_state"
+RECIPE_STATE_CACHE_BACKEND = getenv("RECIPE_STATE_CACHE_BACKEND", RECIPE_CACHE_BACKEND)
+
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+    },
+    RECIPE_CACHE_ALIAS: {
+        "BACKEND": RECIPE_CACHE_BACKEND,
+        "LOCATION": getenv("RECIPE_CACHE_LOCATION", "recipes"),
+        "TIMEOUT": int(getenv("RECIPE_CACHE_TIMEOUT", 60 * 60 * 24)),
+    },
+    RECIPE_STATE_CACHE_ALIAS: {
+        "BACKEND": RECIPE_STATE_CACHE_BACKEND,
+        "LOCATION": getenv("RECIPE_STATE_CACHE_LOCATION", "recipes_state"),
+        "TIMEOUT": None,
+    },
+}
+
+if not RECIPE_CACHE_BACKEND.endswith("RedisCache"):
+    # Redis evicts through its own maxmemory-policy instead of MAX_ENTRIES
+    CACHES[RECIPE_CACHE_ALIAS]["OPTIONS"] = {
+        "MAX_ENTRIES": int(getenv("RECIPE_CACHE_MAX_ENTRIES", 10000)),
+    }
+if not RECIPE_STATE_CACHE_BACKEND.endswith("RedisCache"):
+    # far above the number of bookkeeping keys, so they are never culled
+    CACHES[RECIPE_STATE_CACHE_ALIAS]["OPTIONS"] = {"MAX_ENTRIES": 1_000_000}
+
+RECIPE_GENERATION_CACHE_TIMEOUT = int(
+    getenv("RECIPE_GENERATION_CACHE_TIMEOUT", 60 * 60 * 24 * 7)
+)
+
+RECIPE_NUTRITION_CACHE_TIMEOUT = int(
+    getenv("RECIPE_NUTRITION_CACHE_TIMEOUT", 60 * 60 * 24 * 30)
+)
+
+# Upstream APIs (Gemini, Nutritionix)
+# Timeouts are in seconds. Every call is retried at most UPSTREAM_RETRY_ATTEMPTS
+# times in total, with jittered exponential backoff starting at UPSTREAM_RETRY_BACKOFF.
+
+UPSTREAM_CONNECT_TIMEOUT = float(getenv("UPSTREAM_CONNECT_TIMEOUT", 3.05))
+UPSTREAM_READ_TIMEOUT = float(getenv("UPSTREAM_READ_TIMEOUT", 10))
+GEMINI_TIMEOUT = float(getenv("GEMINI_TIMEOUT", 60))
+UPSTREAM_POOL_CONNECTIONS = int(getenv("UPSTREAM_POOL_CONNECTIONS", 4))
+UPSTREAM_POOL_MAXSIZE = int(getenv("UPSTREAM_POOL_MAXSIZE", 20))
+UPSTREAM_RETRY_ATTEMPTS = int(getenv("UPSTREAM_RETRY_ATTEMPTS", 3))
+UPSTREAM_RETRY_BACKOFF = float(getenv("UPSTREAM_RETRY_BACKOFF", 0.5))
+UPSTREAM_RETRY_MAX_BACKOFF = float(getenv("UPSTREAM_RETRY_MAX_BACKOFF", 4))
+
+# Tail-latency protection. A Gemini or Nutritionix call, retries included, gives
+# up after its *_DEADLINE seconds. After UPSTREAM_BREAKER_FAILURES consecutive
+# failures a provider's calls fail fast for UPSTREAM_BREAKER_RESET seconds
+# (per worker). Set GEMINI_HEDGE_PERCENTILE (e.g. 95) to send a second Gemini
+# request once the first is slower than that percentile of recent calls, but
+# never sooner than GEMINI_HEDGE_MIN_DELAY seconds; the first answer wins.
+
+GEMINI_DEADLINE = float(getenv("GEMINI_DEADLINE", 30))
+NUTRITIONIX_DEADLINE = float(getenv("NUTRITIONIX_DEADLINE", 15))
+UPSTREAM_BREAKER_FAILURES = int(getenv("UPSTREAM_BREAKER_FAILURES", 5))
+UPSTREAM_BREAKER_RESET = float(getenv("UPSTREAM_BREAKER_RESET", 30))
+GEMINI_HEDGE_PERCENTILE = float(getenv("GEMINI_HEDGE_PERCENTILE", 0))
+GEMINI_HEDGE_MIN_DELAY = float(getenv("GEMINI_HEDGE_MIN_DELAY", 0.5))
+
+# Background generation jobs (see the process_generation_jobs management command)
+# A running job untouched for RECIPE_JOB_STALE_AFTER seconds is assumed orphaned
+# and requeued, until it has been attempted RECIPE_JOB_MAX_ATTEMPTS times.
+
+RECIPE_JOB_STALE_AFTER = int(getenv("RECIPE_JOB_STALE_AFTER", 10 * 60))
+RECIPE_JOB_MAX_ATTEMPTS = int(getenv("RECIPE_JOB_MAX_ATTEMPTS", 3))
+
+# Batch generation (POST /api/recipes/generate/batch/ and the generate_recipes command)
+
+RECIPE_BATCH_CONCURRENCY = int(getenv("RECIPE_BATCH_CONCURRENCY", 4))
+RECIPE_BATCH_MAX_CONCURRENCY = int(getenv("RECIPE_BATCH_MAX_CONCURRENCY", 16))
+RECIPE_BATCH_MAX_ITEMS = int(getenv("RECIPE_BATCH_MAX_ITEMS", 100))
+
+# Recipe list pagination; clients may ask for up to RECIPE_MAX_PAGE_SIZE rows per page
+
+RECIPE_PAGE_SIZE = int(getenv("RECIPE_PAGE_SIZE", 20))
+RECIPE_MAX_PAGE_SIZE = int(getenv("RECIPE_MAX_PAGE_SIZE", 100))
+
+# Serving-size scaling (GET /api/recipes/{id}/scale/ and POST /api/recipes/scale/)
+
+RECIPE_MAX_SERVINGS = int(getenv("RECIPE_MAX_SERVINGS", 1000))
+RECIPE_SCALE_MAX_ITEMS = int(getenv("RECIPE_SCALE_MAX_ITEMS", 500))
+
+# Nutrition. Recipes store a compact nutrition blob (serving sizes and nf_*
+# nutrients per food) plus summary columns; set RECIPE_STORE_FULL_NUTRITION=true
+# to keep the full Nutritionix response, photos and metadata included.
+
+RECIPE_STORE_FULL_NUTRITION = getenv("RECIPE_STORE_FULL_NUTRITION", "").lower() in (
+    "1",
+    "true",
+)
+
+# HTTP caching of recipe reads. Responses carry ETag and Last-Modified and are
+# cached in the recipes cache until a write to the recipes they show; shared
+# caches such as a CDN may keep them for RECIPE_HTTP_MAX_AGE seconds before
+# revalidating.
+
+RECIPE_RESPONSE_CACHE_TIMEOUT = int(
+    getenv("RECIPE_RESPONSE_CACHE_TIMEOUT", 60 * 60 * 24)
+)
+RECIPE_HTTP_MAX_AGE = int(getenv("RECIPE_HTTP_MAX_AGE", 0))
+
+# Request metrics. MetricsMiddleware adds a Server-Timing header (database,
+# upstream and serialization time) unless RECIPE_SERVER_TIMING=false, and
+# records histograms served at /metrics. Each worker buffers observations and
+# adds them to counters in the recipes cache at most every
+# RECIPE_METRICS_FLUSH_INTERVAL seconds; with a shared backend such as Redis,
+# /metrics reports every gunicorn worker.
+
+RECIPE_SERVER_TIMING = getenv("RECIPE_SERVER_TIMING", "true").lower() in (
+    "1",
+    "true",
+)
+RECIPE_METRICS_FLUSH_INTERVAL = float(getenv("RECIPE_METRICS_FLUSH_INTERVAL", 5))
+
+# Near-duplicate reuse. With RECIPE_SIMILAR_REUSE=true, a generation request
+# whose ingredients match a stored recipe of the same cuisine, diet and
+# difficulty with a Jaccard similarity of at least RECIPE_SIMILARITY_THRESHOLD
+# reuses that recipe's instructions instead of calling Gemini.
+
+RECIPE_SIMILAR_REUSE = getenv("RECIPE_SIMILAR_REUSE", "").lower() in ("1", "true")
+RECIPE_SIMILARITY_THRESHOLD = float(getenv("RECIPE_SIMILARITY_THRESHOLD", 0.8))
+
+# Catalog export. GET /api/recipes/export/ streams the catalog as NDJSON,
+# reading and serializing RECIPE_EXPORT_CHUNK_SIZE recipes at a time.
+
+RECIPE_EXPORT_CHUNK_SIZE = int(getenv("RECIPE_EXPORT_CHUNK_SIZE", 1000))
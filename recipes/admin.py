@@ -1,5 +1,7 @@
 from django.contrib import admin
-from .models import Recipe, Ingredient
+from .models import GenerationJob, Ingredient, Recipe, RecipeIngredient
 
 admin.site.register(Recipe)
 admin.site.register(Ingredient)
+admin.site.register(RecipeIngredient)
+admin.site.register(GenerationJob)
@@ -1,6 +1,73 @@
 from django.apps import AppConfig
+from django.db.models.signals import (
+    post_delete,
+    post_migrate,
+    post_save,
+    pre_delete,
+)
+
+
+def restore_search_index(sender, using: str, **kwargs) -> None:
+    """
+    Re-create the full-text index triggers after migrate, in case a SQLite
+    table rebuild dropped them.
+    """
+    from django.db import connections
+    from .search import ensure_search_index
+
+    ensure_search_index(connections[using])
 
 
 class RecipesConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "recipes"
+
+    def ready(self) -> None:
+        from django.db import connections
+        from django.db.backends.signals import connection_created
+        from .costs import (
+            ingredient_cost_changed,
+            ingredient_deleted,
+            ingredient_deleting,
+            line_cost_changed,
+            recipe_cost_saved,
+        )
+        from .http_cache import invalidate_recipe_responses
+        from .metrics import install_query_recorder
+        from .models import Ingredient, Recipe, RecipeIngredient
+        from .pantry import update_pantry_index
+        from .similarity import update_similarity_index
+        from .signals import (
+            ingredient_changed,
+            recipe_line_changed,
+            recipe_saved,
+            recipes_changed,
+        )
+
+        post_migrate.connect(restore_search_index, sender=self)
+        # keep the denormalized recipe costs current; connected before
+        # recipes_changed is sent, so its receivers see the refreshed costs
+        post_save.connect(line_cost_changed, sender=RecipeIngredient)
+        post_delete.connect(line_cost_changed, sender=RecipeIngredient)
+        post_save.connect(recipe_cost_saved, sender=Recipe)
+        post_save.connect(ingredient_cost_changed, sender=Ingredient)
+        pre_delete.connect(ingredient_deleting, sender=Ingredient)
+        post_delete.connect(ingredient_deleted, sender=Ingredient)
+
+        # turn model writes into recipes_changed; bulk writes that skip model
+        # signals (bulk.link_ingredients) send it themselves
+        post_save.connect(recipe_saved, sender=Recipe)
+        post_delete.connect(recipe_saved, sender=Recipe)
+        post_save.connect(recipe_line_changed, sender=RecipeIngredient)
+        post_delete.connect(recipe_line_changed, sender=RecipeIngredient)
+        post_save.connect(ingredient_changed, sender=Ingredient)
+        pre_delete.connect(ingredient_changed, sender=Ingredient)
+
+        recipes_changed.connect(update_pantry_index)
+        recipes_changed.connect(update_similarity_index)
+        recipes_changed.connect(invalidate_recipe_responses)
+
+        # time every query for the Server-Timing header and /metrics
+        connection_created.connect(install_query_recorder)
+        for connection in connections.all(initialized_only=True):
+            install_query_recorder(sender=None, connection=connection)
@@ -0,0 +1,374 @@
+import json
+import random
+import re
+import statistics
+import time
+from contextlib import ExitStack, contextmanager
+from decimal import Decimal
+from typing import Any, Callable, Iterator
+from unittest.mock import patch
+from django.conf import settings
+from django.core.cache import caches
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from .bulk import bulk_create_recipes
+from .catalog import recipe_records
+from .models import Recipe
+
+SCENARIOS: tuple[str, ...] = ("generate", "list", "detail", "search")
+
+# every binding of the upstream calls; services and views import them by name
+UPSTREAM_TARGETS: tuple[str, ...] = (
+    "recipes.services.generate_recipe_content",
+    "recipes.services.stream_recipe_content",
+    "recipes.services.get_nutritional_info",
+    "recipes.views.generate_recipe_content",
+    "recipes.views.get_nutritional_info",
+)
+
+# first-page list queries the list scenario cycles through, following each
+# query's next links so deeper cursor pages are measured too
+LIST_QUERIES: list[dict[str, str]] = [
+    {},
+    {"cuisine": "italian"},
+    {"dietary_restrictions": "vegan,vegetarian", "difficulty": "easy"},
+    {"max_total_time": "30"},
+    {"calories_per_serving__lte": "300"},
+    {"page_size": "100"},
+]
+
+SEARCH_QUERIES: list[str] = [
+    "tomato",
+    "pasta",
+    "quinoa salad",
+    "chicken",
+    "paneer tikka",
+    "stir fry",
+]
+
+# per-ingredient nutrients the Nutritionix stand-in answers with
+STUB_NUTRIENTS: dict[str, tuple[int, int]] = {
+    "nf_calories": (20, 400),
+    "nf_protein": (0, 40),
+    "nf_total_fat": (0, 30),
+    "nf_total_carbohydrate": (0, 60),
+    "nf_dietary_fiber": (0, 10),
+    "nf_sodium": (0, 900),
+}
+
+
+class StubUpstream:
+    """
+    Local stand-ins for the Gemini and Nutritionix calls.
+
+    Answers are deterministic for the same inputs and each call sleeps for the
+    configured latency, in seconds, so generation can be measured without
+    network access or API keys.
+    """
+
+    def __init__(self, gemini_latency: float = 0.0, nutritionix_latency: float = 0.0):
+        self.gemini_latency = gemini_latency
+        self.nutritionix_latency = nutritionix_latency
+
+    def _recipe_text(self, ingredients: list, cuisine: str, difficulty: str) -> str:
+        steps: list[str] = [f"Prepare the {name}." for name in ingredients]
+        steps.append(f"Cook {cuisine or 'the dish'} style ({difficulty or 'easy'}).")
+        return "\n".join(f"{n}. {step}" for n, step in enumerate(steps, 1))
+
+    def generate_recipe_content(
+        self,
+        ingredients: list,
+        cuisine: str,
+        dietary_restrictions: str,
+        difficulty: str,
+    ) -> dict[str, str]:
+        time.sleep(self.gemini_latency)
+        return {"text": self._recipe_text(ingredients, cuisine, difficulty)}
+
+    def stream_recipe_content(
+        self,
+        ingredients: list,
+        cuisine: str,
+        dietary_restrictions: str,
+        difficulty: str,
+    ) -> Iterator[dict[str, str]]:
+        time.sleep(self.gemini_latency)
+        for line in self._recipe_text(ingredients, cuisine, difficulty).split("\n"):
+            yield {"text": line + "\n"}
+
+    def get_nutritional_info(self, ingredients: list) -> dict[str, Any]:
+        time.sleep(self.nutritionix_latency)
+        foods: list[dict[str, Any]] = []
+        for ingredient in ingredients:
+            if not (ingredient.quantity and ingredient.name):
+                continue
+            rng = random.Random(f"{ingredient.name}|{ingredient.quantity}")
+            food: dict[str, Any] = {
+                "food_name": str(ingredient.name).lower(),
+                "serving_qty": float(ingredient.quantity),
+                "serving_unit": ingredient.unit or "serving",
+            }
+            for field, (low, high) in STUB_NUTRIENTS.items():
+                food[field] = round(rng.uniform(low, high), 2)
+            foods.append(food)
+        return {"foods": foods}
+
+    @contextmanager
+    def patch(self) -> Iterator["StubUpstream"]:
+        """
+        Replace the upstream calls with this stand-in for the duration of the block.
+        """
+        with ExitStack() as stack:
+            for target in UPSTREAM_TARGETS:
+                stack.enter_context(
+                    patch(target, getattr(self, target.rsplit(".", 1)[1]))
+                )
+            yield self
+
+
+def load_templates(path: str) -> list[dict[str, Any]]:
+    """
+    Read the recipes of a fixture such as sample_recipes.json, with their
+    ingredient lines, as generation templates. A recipe without any lines
+    borrows the ingredients of an earlier template.
+    """
+    with open(path, encoding="utf-8") as f:
+        objects: list[dict[str, Any]] = json.load(f)
+
+    templates: list[dict[str, Any]] = [
+        {
+            **record,
+            "ingredients": [
+                {
+                    "name": line["name"],
+                    "quantity": str(line.get("quantity") or "1"),
+                    "unit": line.get("unit") or "",
+                }
+                for line in record["ingredients"]
+            ],
+        }
+        for record in recipe_records(iter(objects))
+        if isinstance(record, dict) and "title" in record
+    ]
+
+    with_ingredients: list[dict[str, Any]] = [t for t in templates if t["ingredients"]]
+    if not with_ingredients:
+        raise ValueError(f"{path} has no recipes with ingredients to extend.")
+    for index, template in enumerate(templates):
+        if not template["ingredients"]:
+            template["ingredients"] = with_ingredients[index % len(with_ingredients)][
+                "ingredients"
+            ]
+    return templates
+
+
+def synthetic_recipes(
+    templates: list[dict[str, Any]], count: int, seed: int = 0
+) -> Iterator[dict[str, Any]]:
+    """
+    Yield `count` recipe entries for bulk_create_recipes, varied from the
+    templates with a seeded RNG so the same seed gives the same catalog.
+    """
+    rng = random.Random(seed)
+    choices: dict[str, list[str]] = {
+        name: [value for value, _ in Recipe._meta.get_field(name).choices]
+        for name in ("cuisine", "dietary_restrictions", "difficulty")
+    }
+    pool: list[dict[str, str]] = list(
+        {line["name"]: line for t in templates for line in t["ingredients"]}.values()
+    )
+    for n in range(count):
+        template: dict[str, Any] = templates[n % len(templates)]
+        base_title: str = re.sub(r"\s+\d+$", "", template["title"])
+        extras: list[dict[str, str]] = rng.sample(pool, k=rng.randint(0, 3))
+        ingredients: list[dict[str, str]] = list(
+            {
+                line["name"]: line for line in [*template["ingredients"], *extras]
+            }.values()
+        )
+        factor = Decimal(rng.randint(50, 200)) / 100
+        calories = Decimal(str(template.get("calories") or 300)) * factor
+        protein = Decimal(str(template.get("protein") or 10)) * factor
+        yield {
+            "title": f"{base_title} {n + 1}",
+            "description": template.get("description") or base_title,
+            "instructions": template.get("instructions") or "",
+            "ingredients": ingredients,
+            "cuisine": rng.choice(choices["cuisine"]),
+            "dietary_restrictions": rng.choice(choices["dietary_restrictions"]),
+            "difficulty": rng.choice(choices["difficulty"]),
+            "prep_time": rng.randint(5, 45),
+            "cook_time": rng.randint(5, 90),
+            "servings": rng.randint(1, 8),
+            "nutritional_info": {
+                "calories": int(calories),
+                "protein": f"{protein.quantize(Decimal('1'))}g",
+            },
+        }
+
+
+def seed_catalog(
+    templates: list[dict[str, Any]],
+    count: int,
+    seed: int = 0,
+    batch_size: int = 1000,
+    progress: Callable[[int], None] | None = None,
+) -> int:
+    """
+    Insert a synthetic catalog of `count` recipes in bulk batches.
+    """
+    created: int = 0
+    batch: list[dict[str, Any]] = []
+    for entry in synthetic_recipes(templates, count, seed):
+        batch.append(entry)
+        if len(batch) == batch_size:
+            created += len(bulk_create_recipes(batch))
+            batch = []
+            if progress:
+                progress(created)
+    if batch:
+        created += len(bulk_create_recipes(batch))
+        if progress:
+            progress(created)
+    return created
+
+
+def percentile_summary(samples: list[float]) -> dict[str, float]:
+    """
+    Return the p50, p95 and p99 of a list of samples.
+    """
+    if len(samples) == 1:
+        return {"p50": samples[0], "p95": samples[0], "p99": samples[0]}
+    cuts: list[float] = statistics.quantiles(samples, n=100, method="inclusive")
+    return {"p50": cuts[49], "p95": cuts[94], "p99": cuts[98]}
+
+
+class ScenarioRunner:
+    """
+    Issue the benchmark requests through the Django test client, timing each
+    one and counting its database queries.
+    """
+
+    def __init__(
+        self, requests: int, seed: int = 0, warm_cache: bool = False, warmup: int = 0
+    ):
+        self.requests = requests
+        self.warm_cache = warm_cache
+        self.warmup = warmup
+        self.rng = random.Random(seed)
+        self.client = Client(HTTP_ACCEPT="application/json")
+        self.cursors: dict[int, str | None] = {}
+
+    def _generate(self, n: int) -> Any:
+        entry: dict[str, Any] = next(
+            synthetic_recipes(self.templates, 1, seed=self.rng.random())
+        )
+        entry["title"] = f"Benchmark {n}"
+        for key in ("instructions", "nutritional_info"):
+            entry.pop(key)
+        return self.client.post(
+            reverse("generate_recipe"), data=entry, content_type="application/json"
+        )
+
+    def _list(self, n: int) -> Any:
+        slot: int = n % len(LIST_QUERIES)
+        next_link: str | None = self.cursors.get(slot)
+        if next_link:
+            response = self.client.get(next_link)
+        else:
+            response = self.client.get(reverse("recipe_list"), LIST_QUERIES[slot])
+        self.cursors[slot] = (
+            json.loads(response.content).get("next")
+            if response.status_code == 200
+            else None
+        )
+        return response
+
+    def _detail(self, n: int) -> Any:
+        return self.client.get(
+            reverse("recipe_detail", args=[self.rng.randint(self.min_id, self.max_id)])
+        )
+
+    def _search(self, n: int) -> Any:
+        return self.client.get(
+            reverse("recipe_search"), {"q": SEARCH_QUERIES[n % len(SEARCH_QUERIES)]}
+        )
+
+    def run(self, scenario: str, templates: list[dict[str, Any]]) -> dict[str, Any]:
+        """
+        Run one scenario and return its throughput, latency percentiles (in
+        milliseconds), queries per request and error count.
+        """
+        self.templates = templates
+        self.cursors = {}
+        ids = Recipe.objects.order_by("pk").values_list("pk", flat=True)
+        self.min_id, self.max_id = ids.first() or 0, ids.last() or 0
+        request: Callable[[int], Any] = getattr(self, f"_{scenario}")
+        cache = caches[settings.RECIPE_CACHE_ALIAS]
+
+        for n in range(self.warmup):
+            request(n)
+
+        latencies: list[float] = []
+        queries: list[int] = []
+        errors: int = 0
+        elapsed: float = 0.0
+        for n in range(self.requests):
+            if not self.warm_cache:
+                cache.clear()
+            with CaptureQueriesContext(connection) as captured:
+                started: float = time.perf_counter()
+                response = request(self.warmup + n)
+                took: float = time.perf_counter() - started
+            elapsed += took
+            latencies.append(took * 1000)
+            queries.append(len(captured))
+            if response.status_code >= 400:
+                errors += 1
+
+        return {
+            "requests": self.requests,
+            "errors": errors,
+            "throughput": round(self.requests / elapsed, 2) if elapsed else 0.0,
+            **{
+                name: round(value, 3)
+                for name, value in percentile_summary(latencies).items()
+            },
+            "queries_mean": round(statistics.fmean(queries), 2),
+            "queries_max": max(queries),
+        }
+
+
+def compare_to_baseline(
+    results: dict[str, Any], baseline: dict[str, Any], tolerance: float
+) -> list[str]:
+    """
+    List the regressions of `results` against a stored baseline run.
+
+    A scenario regresses when its p95 latency grows, or its throughput drops,
+    by more than `tolerance` (a fraction), or when it issues more queries per
+    request. Scenarios missing from either run are not compared.
+    """
+    regressions: list[str] = []
+    for scenario, current in results["scenarios"].items():
+        previous: dict[str, Any] | None = baseline.get("scenarios", {}).get(scenario)
+        if previous is None:
+            continue
+        if current["p95"] > previous["p95"] * (1 + tolerance):
+            regressions.append(
+                f"{scenario}: p95 {current['p95']:.1f}ms, "
+                f"baseline {previous['p95']:.1f}ms"
+            )
+        if current["throughput"] < previous["throughput"] * (1 - tolerance):
+            regressions.append(
+                f"{scenario}: throughput {current['throughput']:.1f}/s, "
+                f"baseline {previous['throughput']:.1f}/s"
+            )
+        if current["queries_max"] > previous["queries_max"]:
+            regressions.append(
+                f"{scenario}: {current['queries_max']} queries per request, "
+                f"baseline {previous['queries_max']}"
+            )
+    return regressions
@@ -0,0 +1,146 @@
+from decimal import Decimal
+from typing import Any, Iterable
+from django.db import transaction
+from .costs import refresh_instance_costs
+from .models import Ingredient, Recipe, RecipeIngredient
+from .nutrition import apply_nutrition_summary
+from .signals import notify_recipes_changed
+from .units import canonical_unit
+
+IngredientKey = tuple[str, str, Decimal]
+
+# RecipeIngredient.quantity has two decimal places
+QUANTITY_STEP = Decimal("0.01")
+
+# keeps each lookup query well under SQLite's bound-parameter limit
+LOOKUP_BATCH_SIZE = 250
+
+
+def normalize_ingredient(data: dict[str, Any]) -> dict[str, Any]:
+    """
+    Normalize an ingredient line to the form it is stored and looked up in,
+    with its unit in canonical spelling ("Cups" is stored as "cup").
+    Allergens and cost per unit only apply when the ingredient is new.
+    """
+    return {
+        "name": str(data.get("name") or "").strip().lower(),
+        "unit": canonical_unit(data.get("unit")),
+        "quantity": str(data.get("quantity", "")).strip().lower(),
+        "allergens": data.get("allergens"),
+        "cost_per_unit": data.get("cost_per_unit"),
+    }
+
+
+def ingredient_key(data: dict[str, Any]) -> IngredientKey:
+    """
+    Return the key of a normalized ingredient line within its recipe.
+    """
+    return (
+        data["name"],
+        data["unit"],
+        Decimal(str(data["quantity"])).quantize(QUANTITY_STEP),
+    )
+
+
+def _lookup_ingredients(names: list[str]) -> dict[str, int]:
+    """
+    Fetch the ids of existing ingredients by name, in batched queries.
+    """
+    found: dict[str, int] = {}
+    for start in range(0, len(names), LOOKUP_BATCH_SIZE):
+        found.update(
+            Ingredient.objects.filter(
+                name__in=names[start : start + LOOKUP_BATCH_SIZE]
+            ).values_list("name", "pk")
+        )
+    return found
+
+
+def resolve_ingredients(lines: Iterable[dict[str, Any]]) -> dict[str, int]:
+    """
+    Map the names of normalized ingredient lines to canonical Ingredient ids,
+    creating the missing ingredients from the first line naming each.
+
+    Existing ingredients are fetched in one query per LOOKUP_BATCH_SIZE names
+    and the misses are inserted with one bulk_create. The unique name makes a
+    concurrent insert of the same ingredient a no-op, and the re-read of the
+    misses then picks up whichever row won.
+    """
+    first: dict[str, dict[str, Any]] = {}
+    for line in lines:
+        first.setdefault(line["name"], line)
+    resolved: dict[str, int] = _lookup_ingredients(list(first))
+
+    missing: list[str] = [name for name in first if name not in resolved]
+    if missing:
+        Ingredient.objects.bulk_create(
+            [
+                Ingredient(
+                    name=name,
+                    **{
+                        field: first[name][field]
+                        for field in ("allergens", "cost_per_unit")
+                        if first[name].get(field) is not None
+                    },
+                )
+                for name in missing
+            ],
+            ignore_conflicts=True,
+        )
+        resolved.update(_lookup_ingredients(missing))
+    return resolved
+
+
+def link_ingredients(recipes: list[Recipe], lines: list[list[dict[str, Any]]]) -> None:
+    """
+    Attach normalized ingredient lines to their recipes with one bulk insert.
+    """
+    ingredient_ids: dict[str, int] = resolve_ingredients(
+        line for recipe_lines in lines for line in recipe_lines
+    )
+    RecipeIngredient.objects.bulk_create(
+        [
+            RecipeIngredient(
+                recipe_id=recipe.pk,
+                ingredient_id=ingredient_ids[name],
+                unit=unit,
+                quantity=quantity,
+            ).measure(name)
+            for recipe, recipe_lines in zip(recipes, lines)
+            for name, unit, quantity in dict.fromkeys(
+                ingredient_key(line) for line in recipe_lines
+            )
+        ],
+        ignore_conflicts=True,
+    )
+    # bulk_create skips the line signals that keep recipe costs current
+    refresh_instance_costs(
+        recipe for recipe, recipe_lines in zip(recipes, lines) if recipe_lines
+    )
+    notify_recipes_changed(recipe.pk for recipe in recipes)
+
+
+def bulk_create_recipes(entries: list[dict[str, Any]]) -> list[Recipe]:
+    """
+    Insert recipes and their ingredient links with a constant number of queries.
+
+    Each entry is validated RecipeSerializer data plus any extra model fields
+    (instructions, nutritional_info). Returns the created recipes in order.
+    """
+    recipes: list[Recipe] = [
+        Recipe(**{k: v for k, v in entry.items() if k != "ingredients"})
+        for entry in entries
+    ]
+    # bulk_create skips Recipe.save, so the nutrition summary is filled in here
+    for recipe in recipes:
+        apply_nutrition_summary(recipe)
+    with transaction.atomic():
+        recipes = Recipe.objects.bulk_create(recipes)
+        link_ingredients(
+            recipes,
+            [
+                [normalize_ingredient(data) for data in entry.get("ingredients", [])]
+                for entry in entries
+            ],
+        )
+    return recipes
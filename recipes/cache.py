@@ -0,0 +1,164 @@
+import hashlib
+import json
+from decimal import Decimal, InvalidOperation
+from typing import Any, Iterable
+from django.conf import settings
+from django.core.cache import caches
+
+
+def normalize_ingredient_name(name: Any) -> str:
+    """
+    Normalize an ingredient name so equivalent spellings share a cache key.
+    """
+    return " ".join(str(name).split()).lower()
+
+
+def fingerprint(payload: dict[str, Any]) -> str:
+    """
+    Build a stable content hash for a JSON-serializable payload.
+    """
+    encoded: bytes = json.dumps(
+        payload, sort_keys=True, separators=(",", ":"), default=str
+    ).encode("utf-8")
+    return hashlib.sha256(encoded).hexdigest()
+
+
+def generation_fingerprint(
+    ingredients: Iterable[Any],
+    cuisine: Any,
+    dietary_restrictions: Any,
+    difficulty: Any,
+    model: str,
+    prompt_version: int,
+) -> str:
+    """
+    Fingerprint the inputs of a Gemini recipe generation call.
+    """
+    names: set[str] = {normalize_ingredient_name(name) for name in ingredients}
+    names.discard("")
+    return fingerprint(
+        {
+            "ingredients": sorted(names),
+            "cuisine": cuisine,
+            "dietary_restrictions": dietary_restrictions,
+            "difficulty": difficulty,
+            "model": model,
+            "prompt_version": prompt_version,
+        }
+    )
+
+
+def normalize_quantity(quantity: Any) -> str:
+    """
+    Normalize a quantity so "2", "2.0" and "2.00" share a cache key.
+    """
+    try:
+        return format(Decimal(str(quantity).strip()).normalize(), "f")
+    except InvalidOperation:
+        return str(quantity).strip().lower()
+
+
+def nutrition_fingerprint(name: Any, quantity: Any, unit: Any) -> str:
+    """
+    Fingerprint a single ingredient line of a Nutritionix query.
+    """
+    return fingerprint(
+        {
+            "name": normalize_ingredient_name(name),
+            "quantity": normalize_quantity(quantity),
+            "unit": normalize_ingredient_name(unit or ""),
+        }
+    )
+
+
+class ResponseCache:
+    """
+    A namespaced view over the shared recipes cache that keeps hit/miss counters.
+
+    The counters live in the RECIPE_STATE_CACHE_ALIAS cache, shared by every
+    worker like the entries but never evicted to make room for them.
+    """
+
+    def __init__(self, namespace: str, timeout_setting: str) -> None:
+        self.namespace: str = namespace
+        self.timeout_setting: str = timeout_setting
+
+    @property
+    def backend(self) -> Any:
+        return caches[settings.RECIPE_CACHE_ALIAS]
+
+    @property
+    def counters(self) -> Any:
+        return caches[settings.RECIPE_STATE_CACHE_ALIAS]
+
+    @property
+    def timeout(self) -> int | None:
+        return getattr(settings, self.timeout_setting)
+
+    def make_key(self, key: str) -> str:
+        return f"{self.namespace}:{key}"
+
+    def get(self, key: str) -> Any:
+        value: Any = self.backend.get(self.make_key(key))
+        self._count("hits" if value is not None else "misses")
+        return value
+
+    def get_many(self, keys: Iterable[str]) -> dict[str, Any]:
+        """
+        Fetch several entries in one backend round trip, keyed by the unprefixed key.
+        """
+        keys = list(dict.fromkeys(keys))
+        if not keys:
+            return {}
+        found: dict[str, Any] = self.backend.get_many(
+            [self.make_key(key) for key in keys]
+        )
+        values: dict[str, Any] = {
+            key: found[self.make_key(key)]
+            for key in keys
+            if self.make_key(key) in found
+        }
+        if values:
+            self._count("hits", len(values))
+        if len(values) < len(keys):
+            self._count("misses", len(keys) - len(values))
+        return values
+
+    def set(self, key: str, value: Any) -> None:
+        self.backend.set(self.make_key(key), value, timeout=self.timeout)
+
+    def set_many(self, values: dict[str, Any]) -> None:
+        if values:
+            self.backend.set_many(
+                {self.make_key(key): value for key, value in values.items()},
+                timeout=self.timeout,
+            )
+
+    def stats(self) -> dict[str, int]:
+        """
+        Return the hit and miss counters for this namespace.
+        """
+        counters: dict[str, Any] = self.counters.get_many(
+            [self._counter_key("hits"), self._counter_key("misses")]
+        )
+        return {
+            "hits": counters.get(self._counter_key("hits"), 0),
+            "misses": counters.get(self._counter_key("misses"), 0),
+        }
+
+    def _counter_key(self, name: str) -> str:
+        return f"stats:{self.namespace}:{name}"
+
+    def _count(self, name: str, delta: int = 1) -> None:
+        key: str = self._counter_key(name)
+        # add() is a no-op when the counter exists, so concurrent workers never
+        # reset each other's counts; incr() is atomic on shared backends.
+        self.counters.add(key, 0, timeout=None)
+        try:
+            self.counters.incr(key, delta)
+        except ValueError:
+            self.counters.set(key, delta, timeout=None)
+
+
+generation_cache = ResponseCache("generation", "RECIPE_GENERATION_CACHE_TIMEOUT")
+nutrition_cache = ResponseCache("nutrition", "RECIPE_NUTRITION_CACHE_TIMEOUT")
@@ -0,0 +1,215 @@
+import json
+from itertools import islice
+from typing import IO, Any, Iterator
+from django.db.models import QuerySet
+from .readers import recipe_columns, serialize_recipe_rows
+from .renderers import FastJSONRenderer
+
+# characters read from an import file at a time, and the largest single record
+READ_SIZE = 1 << 16
+MAX_RECORD_SIZE = 1 << 24
+
+_decoder = json.JSONDecoder()
+NUMBER_CHARS = frozenset("0123456789+-.eE")
+
+
+def iter_ndjson(stream: IO[str]) -> Iterator[Any]:
+    """
+    Yield the JSON value on each non-blank line of an NDJSON stream.
+    Raises ValueError naming the line of a malformed value.
+    """
+    for number, line in enumerate(stream, 1):
+        if not line.strip():
+            continue
+        try:
+            yield json.loads(line)
+        except json.JSONDecodeError as e:
+            raise ValueError(f"line {number}: {e}") from None
+
+
+def iter_json_array(stream: IO[str]) -> Iterator[Any]:
+    """
+    Yield the elements of a top-level JSON array one at a time, reading the
+    stream in blocks so only about one element is held in memory.
+    """
+    buffer: str = ""
+    position: int = 0
+    eof: bool = False
+
+    def fill() -> None:
+        nonlocal buffer, position, eof
+        if len(buffer) - position > MAX_RECORD_SIZE:
+            raise ValueError(f"a record is longer than {MAX_RECORD_SIZE} characters")
+        block: str = stream.read(READ_SIZE)
+        buffer, position, eof = buffer[position:] + block, 0, not block
+
+    def peek() -> str:
+        """
+        Skip whitespace and return the next character, or "" at the end.
+        """
+        nonlocal position
+        while True:
+            while position < len(buffer) and buffer[position] in " \t\r\n":
+                position += 1
+            if position < len(buffer) or eof:
+                return buffer[position : position + 1]
+            fill()
+
+    if peek() != "[":
+        raise ValueError("expected a JSON array")
+    position += 1
+    if peek() == "]":
+        return
+    while True:
+        peek()
+        while True:
+            try:
+                value, end = _decoder.raw_decode(buffer, position)
+            except json.JSONDecodeError:
+                if eof:
+                    raise
+                fill()
+                continue
+            if (
+                not eof
+                and type(value) in (int, float)
+                and set(buffer[end:]) <= NUMBER_CHARS
+            ):
+                # a number at the end of the buffer may continue in the next block
+                fill()
+                continue
+            break
+        yield value
+        position = end
+        separator: str = peek()
+        if separator == "]":
+            return
+        if separator != ",":
+            raise ValueError("expected ',' or ']' after an array element")
+        position += 1
+
+
+def iter_records(stream: IO[str], fmt: str = "auto") -> Iterator[Any]:
+    """
+    Yield the records of a JSON array or NDJSON stream. With fmt="auto" a
+    stream starting with "[" is read as an array, anything else as NDJSON.
+    """
+    if fmt == "auto":
+        head: str = ""
+        while not head.strip():
+            chunk: str = stream.read(1)
+            if not chunk:
+                return
+            head += chunk
+        fmt = "json" if head.strip() == "[" else "ndjson"
+        stream = _Prefixed(head, stream)
+    if fmt == "json":
+        yield from iter_json_array(stream)
+    else:
+        yield from iter_ndjson(stream)
+
+
+class _Prefixed:
+    """
+    A text stream with some already-read characters put back in front.
+    """
+
+    def __init__(self, prefix: str, stream: IO[str]) -> None:
+        self.prefix = prefix
+        self.stream = stream
+
+    def read(self, size: int = -1) -> str:
+        prefix, self.prefix = self.prefix, ""
+        if size < 0:
+            return prefix + self.stream.read()
+        return prefix + self.stream.read(max(size - len(prefix), 0))
+
+    def __iter__(self) -> Iterator[str]:
+        first: str = self.prefix + self.stream.readline()
+        self.prefix = ""
+        if first:
+            yield first
+        yield from self.stream
+
+
+def recipe_records(items: Iterator[Any]) -> Iterator[Any]:
+    """
+    Turn Django fixture objects (as in sample_recipes.json) into recipe
+    records, passing any other item through. A fixture recipe takes the
+    recipes.recipeingredient lines naming it, before or after it, with their
+    ingredients resolved against the ingredient objects read before them.
+    Older fixtures, with quantity and unit on the ingredient and ingredient
+    pks on the recipe, are read too.
+    """
+    ingredients: dict[Any, dict[str, Any]] = {}
+    # lines read before their recipe, and the last recipe, still taking lines
+    early: dict[Any, list[dict[str, Any]]] = {}
+    held: tuple[Any, dict[str, Any]] | None = None
+    for item in items:
+        if not (isinstance(item, dict) and "model" in item and "fields" in item):
+            if held is not None:
+                yield held[1]
+                held = None
+            yield item
+            continue
+        fields: dict[str, Any] = item["fields"]
+        if item["model"] == "recipes.ingredient":
+            ingredients[item.get("pk")] = fields
+        elif item["model"] == "recipes.recipeingredient":
+            if fields.get("ingredient") not in ingredients:
+                continue
+            line: dict[str, Any] = {
+                **ingredients[fields["ingredient"]],
+                "quantity": fields.get("quantity"),
+                "unit": fields.get("unit") or "",
+            }
+            if held is not None and held[0] == fields.get("recipe"):
+                held[1]["ingredients"].append(line)
+            else:
+                early.setdefault(fields.get("recipe"), []).append(line)
+        elif item["model"] == "recipes.recipe":
+            if held is not None:
+                yield held[1]
+            record: dict[str, Any] = {
+                **fields,
+                "ingredients": [
+                    ingredients[pk]
+                    for pk in fields.get("ingredients") or []
+                    if pk in ingredients
+                ]
+                + early.pop(item.get("pk"), []),
+            }
+            held = (item.get("pk"), record)
+    if held is not None:
+        yield held[1]
+
+
+def iter_recipe_chunks(queryset: QuerySet, chunk_size: int) -> Iterator[list[dict]]:
+    """
+    Serialize a Recipe queryset, in its order, one chunk at a time.
+
+    Rows are read through a server-side cursor where the database supports
+    one (iterator(chunk_size=...)), and each chunk's ingredients are fetched
+    with one query, so memory stays flat however large the catalog.
+    """
+    rows: Iterator[dict[str, Any]] = queryset.values(*recipe_columns()).iterator(
+        chunk_size=chunk_size
+    )
+    while chunk := list(islice(rows, chunk_size)):
+        yield serialize_recipe_rows(chunk, using=queryset.db)
+
+
+def render_records(records: list[dict]) -> list[bytes]:
+    """
+    Render serialized recipes to JSON exactly as the JSON API renders them.
+    """
+    renderer = FastJSONRenderer()
+    return [renderer.render(record) for record in records]
+
+
+def encode_ndjson(chunks: Iterator[list[dict]]) -> Iterator[bytes]:
+    """
+    Encode serialized recipe chunks as NDJSON, one bytes block per chunk.
+    """
+    for chunk in chunks:
+        yield b"".join(line + b"\n" for line in render_records(chunk))
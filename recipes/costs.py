@@ -0,0 +1,170 @@
+from decimal import ROUND_HALF_UP, Decimal
+from typing import Any, Iterable
+from django.db.models import Case, DecimalField, F, QuerySet, Sum, Value, When
+from django.db.models.functions import Coalesce
+from .models import Ingredient, Recipe
+
+# the denormalized cost columns on Recipe
+COST_FIELDS: list[str] = ["cost", "cost_per_serving"]
+
+CENT = Decimal("0.01")
+
+# keeps each refresh query well under SQLite's bound-parameter limit
+REFRESH_BATCH_SIZE = 500
+
+AMOUNT = DecimalField(max_digits=20, decimal_places=2)
+
+# cost_per_unit is the price of this many of a line's base units: ingredients
+# measured in grams or millilitres are priced per kilogram or litre, and the
+# rest per piece (or per clove, pinch, ... for units that cannot be converted)
+PRICE_SIZES: dict[str, Decimal] = {"g": Decimal(1000), "ml": Decimal(1000)}
+
+
+def line_cost(
+    base_quantity: Decimal, base_unit: str, cost_per_unit: Decimal
+) -> Decimal:
+    """
+    The unrounded cost of an amount in a base unit of an ingredient.
+    """
+    return base_quantity * cost_per_unit / PRICE_SIZES.get(base_unit, Decimal(1))
+
+
+# line_cost of every line of a recipe, for aggregating over Recipe rows; it
+# multiplies by the inverse size, as SQLite stores whole amounts as integers
+# and divides those without a remainder
+LINE_COST = (
+    F("ingredients__base_quantity")
+    * F("ingredients__ingredient__cost_per_unit")
+    * Case(
+        *[
+            When(ingredients__base_unit=unit, then=Value(1 / size))
+            for unit, size in PRICE_SIZES.items()
+        ],
+        default=Value(Decimal(1)),
+        output_field=AMOUNT,
+    )
+)
+
+
+def cost_summary(total: Decimal | None, servings: int) -> tuple[Decimal, Decimal]:
+    """
+    Round a recipe's summed line cost and divide it over its servings.
+    """
+    cost: Decimal = (total or Decimal(0)).quantize(CENT, rounding=ROUND_HALF_UP)
+    return cost, (cost / (servings or 1)).quantize(CENT, rounding=ROUND_HALF_UP)
+
+
+def refresh_costs(recipes: QuerySet) -> list[Recipe]:
+    """
+    Recompute the cost columns of a Recipe queryset.
+
+    One aggregate query sums line_cost over the recipes' lines, and only the
+    recipes whose cost changed are written, with bulk_update. Returns the
+    written recipes, holding only their pk and new costs.
+    """
+    rows = (
+        recipes.order_by()
+        .annotate(
+            total=Coalesce(
+                Sum(LINE_COST, output_field=AMOUNT),
+                Value(Decimal(0)),
+                output_field=AMOUNT,
+            )
+        )
+        .values_list("pk", "servings", "cost", "cost_per_serving", "total")
+    )
+    changed: list[Recipe] = []
+    for pk, servings, cost, cost_per_serving, total in rows:
+        summary: tuple[Decimal, Decimal] = cost_summary(total, servings)
+        if summary != (cost, cost_per_serving):
+            changed.append(Recipe(pk=pk, cost=summary[0], cost_per_serving=summary[1]))
+    Recipe.objects.bulk_update(changed, COST_FIELDS, batch_size=REFRESH_BATCH_SIZE)
+    return changed
+
+
+def refresh_recipe_costs(recipe_ids: Iterable[int]) -> list[Recipe]:
+    """
+    Recompute the cost columns of the given recipes, REFRESH_BATCH_SIZE at a time.
+    Returns the written recipes, as refresh_costs does.
+    """
+    ids: list[int] = sorted(set(recipe_ids))
+    written: list[Recipe] = []
+    for start in range(0, len(ids), REFRESH_BATCH_SIZE):
+        written += refresh_costs(
+            Recipe.objects.filter(pk__in=ids[start : start + REFRESH_BATCH_SIZE])
+        )
+    return written
+
+
+def refresh_instance_costs(recipes: Iterable[Recipe]) -> None:
+    """
+    Recompute the cost columns of saved recipes and copy the new costs onto
+    the given instances, so they serialize what was stored.
+    """
+    by_pk: dict[int, Recipe] = {recipe.pk: recipe for recipe in recipes}
+    for written in refresh_recipe_costs(by_pk):
+        for field in COST_FIELDS:
+            setattr(by_pk[written.pk], field, getattr(written, field))
+
+
+def _deleted_with_parent(origin: Any) -> bool:
+    """
+    Whether a line is being deleted along with its recipe or ingredient, whose
+    own receivers refresh the costs once rather than once per line.
+    """
+    model = origin.model if isinstance(origin, QuerySet) else type(origin)
+    return model in (Recipe, Ingredient)
+
+
+def line_cost_changed(sender, instance, **kwargs) -> None:
+    """
+    post_save and post_delete receiver for RecipeIngredient.
+    """
+    if _deleted_with_parent(kwargs.get("origin")):
+        return
+    refresh_recipe_costs([instance.recipe_id])
+
+
+def recipe_cost_saved(sender, instance, created: bool, **kwargs) -> None:
+    """
+    post_save receiver for Recipe. A new recipe has no lines yet; a saved one
+    may have new servings, or have written back a cost read before its lines
+    changed.
+    """
+    update_fields = kwargs.get("update_fields")
+    if created or (
+        update_fields is not None
+        and not {"servings", *COST_FIELDS} & set(update_fields)
+    ):
+        return
+    refresh_instance_costs([instance])
+
+
+def ingredient_cost_changed(sender, instance, created: bool, **kwargs) -> None:
+    """
+    post_save receiver for Ingredient: refresh every recipe using it, in one
+    aggregate query over those recipes.
+    """
+    update_fields = kwargs.get("update_fields")
+    if created or (update_fields is not None and "cost_per_unit" not in update_fields):
+        return
+    refresh_costs(
+        Recipe.objects.filter(pk__in=instance.recipe_lines.values("recipe_id"))
+    )
+
+
+def ingredient_deleting(sender, instance, **kwargs) -> None:
+    """
+    pre_delete receiver for Ingredient: note the recipes whose lines the
+    delete cascades to, for ingredient_deleted.
+    """
+    instance._cost_recipe_ids = list(
+        instance.recipe_lines.values_list("recipe_id", flat=True)
+    )
+
+
+def ingredient_deleted(sender, instance, **kwargs) -> None:
+    """
+    post_delete receiver for Ingredient.
+    """
+    refresh_recipe_costs(getattr(instance, "_cost_recipe_ids", []))
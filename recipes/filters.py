@@ -0,0 +1,122 @@
+from decimal import Decimal, InvalidOperation
+from typing import Any
+from datetime import datetime
+from django.db.models import QuerySet
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+from rest_framework.exceptions import ValidationError
+from .models import Recipe
+from .nutrition import NUTRIENTS
+
+# query parameter -> model field, matched exactly against the field's choices
+CHOICE_FILTERS: dict[str, str] = {
+    "cuisine": "cuisine",
+    "dietary_restrictions": "dietary_restrictions",
+    "difficulty": "difficulty",
+}
+
+# query parameter -> ORM lookup, for non-negative integer bounds
+RANGE_FILTERS: dict[str, str] = {
+    "min_total_time": "total_time__gte",
+    "max_total_time": "total_time__lte",
+}
+
+# query parameter -> ORM lookup, for decimal bounds on the indexed per-serving
+# nutrition columns, e.g. ?calories_per_serving__lte=500
+NUTRITION_FILTERS: dict[str, str] = {
+    f"{name}_per_serving__{bound}": f"{name}_per_serving__{bound}"
+    for name in NUTRIENTS
+    for bound in ("gte", "lte")
+}
+
+
+# query parameter -> ORM lookup, for decimal bounds on the indexed cost
+# columns, e.g. ?cost_per_serving__lte=2.50
+COST_FILTERS: dict[str, str] = {
+    f"{field}__{bound}": f"{field}__{bound}"
+    for field in ("cost", "cost_per_serving")
+    for bound in ("gte", "lte")
+}
+
+
+def filter_recipes(queryset: QuerySet, params: Any) -> QuerySet:
+    """
+    Apply the recipe_list filter query parameters to a recipe queryset.
+
+    Choice filters accept a comma-separated list of values. Raises
+    ValidationError, reported as a 400, for unknown values or bad bounds.
+    """
+    errors: dict[str, list[str]] = {}
+    lookups: dict[str, Any] = {}
+
+    for param, field_name in CHOICE_FILTERS.items():
+        raw: str | None = params.get(param)
+        if not raw:
+            continue
+        allowed: set[str] = {
+            value for value, _ in Recipe._meta.get_field(field_name).choices
+        }
+        values: list[str] = [value.strip() for value in raw.split(",") if value.strip()]
+        invalid: list[str] = [value for value in values if value not in allowed]
+        if invalid:
+            errors[param] = [f'"{value}" is not a valid choice.' for value in invalid]
+        elif len(values) == 1:
+            lookups[field_name] = values[0]
+        else:
+            lookups[f"{field_name}__in"] = values
+
+    for param, lookup in RANGE_FILTERS.items():
+        raw = params.get(param)
+        if not raw:
+            continue
+        try:
+            bound: int = int(raw)
+        except ValueError:
+            errors[param] = ["A valid integer is required."]
+            continue
+        if bound < 0:
+            errors[param] = ["Ensure this value is greater than or equal to 0."]
+            continue
+        lookups[lookup] = bound
+
+    for param, lookup in {**NUTRITION_FILTERS, **COST_FILTERS}.items():
+        raw = params.get(param)
+        if not raw:
+            continue
+        try:
+            amount: Decimal = Decimal(raw)
+            if not amount.is_finite():
+                raise InvalidOperation(raw)
+        except InvalidOperation:
+            errors[param] = ["A valid number is required."]
+            continue
+        lookups[lookup] = amount
+
+    if errors:
+        raise ValidationError(errors)
+    return queryset.filter(**lookups)
+
+
+def filter_since(queryset: QuerySet, params: Any) -> QuerySet:
+    """
+    Keep recipes created at or after ?since=, an ISO 8601 date or datetime
+    (naive values are in the server time zone). The bound is inclusive, so
+    a client passing the last created_at it received misses nothing that
+    shares the timestamp.
+    """
+    raw: str | None = params.get("since")
+    if not raw:
+        return queryset
+    try:
+        since: datetime | None = parse_datetime(raw)
+        if since is None and (day := parse_date(raw)) is not None:
+            since = datetime.combine(day, datetime.min.time())
+    except ValueError:
+        since = None
+    if since is None:
+        raise ValidationError(
+            {"since": ["Use an ISO 8601 date or datetime, e.g. 2024-06-01T12:00:00Z."]}
+        )
+    if timezone.is_naive(since):
+        since = timezone.make_aware(since)
+    return queryset.filter(created_at__gte=since)
@@ -0,0 +1,113 @@
+import time
+from typing import Callable
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from django.http import HttpResponseBase
+from django.utils.cache import (
+    get_conditional_response,
+    patch_cache_control,
+    patch_vary_headers,
+)
+from django.utils.http import http_date
+from rest_framework.response import Response
+from .cache import fingerprint
+from .routers import use_primary
+
+# version stamps, in nanoseconds since the epoch, of the last change to one
+# recipe and to the recipe collection; responses are cached per version
+RECIPE_VERSION_KEY = "http:version:recipe:{}"
+LIST_VERSION_KEY = "http:version:list"
+RESPONSE_KEY = "http:response:{}"
+
+
+def get_cache():
+    return caches[settings.RECIPE_CACHE_ALIAS]
+
+
+def bump_versions(recipe_ids: list[int]) -> None:
+    """
+    Give the changed recipes, and the recipe list, a new version stamp.
+    """
+    version: int = time.time_ns()
+    versions: dict[str, int] = {
+        RECIPE_VERSION_KEY.format(pk): version for pk in recipe_ids
+    }
+    versions[LIST_VERSION_KEY] = version
+    get_cache().set_many(versions, timeout=None)
+
+
+def invalidate_recipe_responses(sender, recipe_ids: list[int], **kwargs) -> None:
+    """
+    recipes_changed receiver. Versions are bumped right away, so readers stop
+    serving the old response, and again on commit, so a response another
+    request rebuilt from the not yet committed state is discarded too.
+    """
+    bump_versions(recipe_ids)
+    transaction.on_commit(lambda: bump_versions(recipe_ids))
+
+
+def current_version(key: str) -> int:
+    """
+    Read a version stamp, starting one now if it is missing or was evicted.
+    """
+    cache = get_cache()
+    version: int | None = cache.get(key)
+    if version is None:
+        version = time.time_ns()
+        if not cache.add(key, version, timeout=None):
+            version = cache.get(key, version)
+    return version
+
+
+def cached_response(request, version_key: str, build: Callable[[], Response]):
+    """
+    Serve a read-only recipe response with ETag and Last-Modified validators,
+    from the response cache when possible.
+
+    The ETag is derived from the URL, the negotiated media type and the
+    version stamp, so a conditional request that still matches is answered
+    with 304 Not Modified and a repeated one is served from the cache, both
+    without touching the database. Only 200 responses from build are cached.
+    Within RECIPE_REPLICA_LAG seconds of a change, build reads from the primary.
+    """
+    version: int = current_version(version_key)
+    digest: str = fingerprint(
+        {
+            "url": request.build_absolute_uri(),
+            "media_type": getattr(request, "accepted_media_type", None),
+            "version": version,
+        }
+    )
+    etag: str = f'"{digest}"'
+    last_modified: int = version // 1_000_000_000
+
+    response: HttpResponseBase | None = get_conditional_response(
+        request, etag=etag, last_modified=last_modified
+    )
+    if response is None:
+        cache = get_cache()
+        data = cache.get(RESPONSE_KEY.format(digest))
+        if data is not None:
+            response = Response(data)
+        else:
+            if time.time_ns() - version < settings.RECIPE_REPLICA_LAG * 1_000_000_000:
+                # a read replica may not have the latest change yet; build
+                # from the primary so no stale copy is cached or ETagged
+                with use_primary():
+                    response = build()
+            else:
+                response = build()
+            if response.status_code != 200:
+                return response
+            cache.set(
+                RESPONSE_KEY.format(digest),
+                response.data,
+                timeout=settings.RECIPE_RESPONSE_CACHE_TIMEOUT,
+            )
+
+    response["ETag"] = etag
+    response["Last-Modified"] = http_date(last_modified)
+    patch_cache_control(response, public=True, max_age=settings.RECIPE_HTTP_MAX_AGE)
+    patch_vary_headers(response, ["Accept"])
+    return response
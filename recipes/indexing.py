@@ -0,0 +1,145 @@
+import threading
+from typing import Any, Iterable
+from django.conf import settings
+from django.core.cache import caches
+from .routers import use_primary
+
+# a process further behind than this rebuilds instead of replaying the change log
+MAX_REPLAY = 1000
+
+
+class RecipeIndex:
+    """
+    Base for in-memory, per-process indexes over the recipe catalog.
+
+    An index is built once per process and then kept current incrementally:
+    writes in this process update it directly, and writes in other processes
+    are replayed from a change log of recipe ids in the shared recipes_state
+    cache, under keys prefixed with the index's namespace. Entries are always read
+    from the primary database. Subclasses define how a
+    recipe's entry is loaded, and linked into or unlinked from the index.
+    """
+
+    namespace: str = ""
+
+    def __init__(self) -> None:
+        self.lock = threading.Lock()
+        # held for a whole rebuild, so concurrent requests build the index once
+        self.build_lock = threading.Lock()
+        self.version: int | None = None
+        self._reset()
+
+    @property
+    def cache(self):
+        return caches[settings.RECIPE_STATE_CACHE_ALIAS]
+
+    @property
+    def version_key(self) -> str:
+        return f"{self.namespace}:version"
+
+    def change_key(self, version: int) -> str:
+        return f"{self.namespace}:change:{version}"
+
+    def _reset(self) -> None:
+        """
+        Empty the index structures.
+        """
+        raise NotImplementedError
+
+    def _load(self, recipe_ids: Iterable[int] | None = None) -> dict[int, Any]:
+        """
+        Read the entries of the given recipes, or of every recipe, by recipe id.
+        Recipes that should not be indexed are left out.
+        """
+        raise NotImplementedError
+
+    def _link(self, recipe_id: int, entry: Any) -> None:
+        raise NotImplementedError
+
+    def _unlink(self, recipe_id: int) -> None:
+        raise NotImplementedError
+
+    def rebuild(self) -> None:
+        """
+        Build the whole index from the database.
+        """
+        version: int = self.cache.get(self.version_key, 0)
+        with use_primary():
+            loaded: dict[int, Any] = self._load()
+        with self.lock:
+            self._reset()
+            for recipe_id in sorted(loaded):
+                self._link(recipe_id, loaded[recipe_id])
+            self.version = version
+
+    def rebuild_from(self, version: int | None) -> None:
+        """
+        Rebuild the index unless another thread already did while this one
+        waited, that is unless it has moved on from version.
+        """
+        with self.build_lock:
+            if self.version == version:
+                self.rebuild()
+
+    def refresh(self, recipe_ids: Iterable[int]) -> None:
+        """
+        Re-read the given recipes from the database and update their entries.
+        Recipes that no longer exist are dropped.
+        """
+        recipe_ids = set(recipe_ids)
+        if not recipe_ids:
+            return
+        with use_primary():
+            loaded: dict[int, Any] = self._load(recipe_ids)
+        with self.lock:
+            for recipe_id in recipe_ids:
+                self._unlink(recipe_id)
+                if loaded.get(recipe_id):
+                    self._link(recipe_id, loaded[recipe_id])
+
+    def sync(self) -> None:
+        """
+        Bring the index up to date with changes made by other processes.
+        """
+        version: int | None = self.version
+        if version is None:
+            self.rebuild_from(version)
+            return
+        latest: int = self.cache.get(self.version_key, 0)
+        if latest == version:
+            return
+        if latest < version or latest - version > MAX_REPLAY:
+            # the cache was flushed or this process fell too far behind
+            self.rebuild_from(version)
+            return
+
+        keys: list[str] = [self.change_key(v) for v in range(version + 1, latest + 1)]
+        changes: dict[str, Any] = self.cache.get_many(keys)
+        if len(changes) < len(keys):
+            self.rebuild_from(version)
+            return
+        self.refresh(
+            recipe_id for recipe_ids in changes.values() for recipe_id in recipe_ids
+        )
+        with self.lock:
+            self.version = max(self.version, latest)
+
+    def record_change(self, recipe_ids: Iterable[int]) -> None:
+        """
+        Apply a committed write to this process's index and publish it to the others.
+        """
+        recipe_ids = sorted(set(recipe_ids))
+        if not recipe_ids:
+            return
+        self.cache.add(self.version_key, 0, timeout=None)
+        version: int = self.cache.incr(self.version_key)
+        self.cache.set(self.change_key(version), recipe_ids, timeout=None)
+        # sync never replays more than the last MAX_REPLAY entries
+        if version > MAX_REPLAY:
+            self.cache.delete(self.change_key(version - MAX_REPLAY))
+        if self.version is not None:
+            self.refresh(recipe_ids)
+            with self.lock:
+                # our own entry is applied; earlier ones are replayed by sync
+                if self.version == version - 1:
+                    self.version = version
@@ -0,0 +1,108 @@
+import logging
+from datetime import timedelta
+from typing import Any
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+from .models import GenerationJob
+from .serializers import RecipeSerializer
+from .services import GenerationError, generate_content_for, save_generated_recipe
+
+logger = logging.getLogger(__name__)
+
+# how many pending ids a worker looks at per claim; losing a race on one id just
+# moves on to the next instead of going back to the database
+CLAIM_BATCH_SIZE = 10
+
+
+def enqueue_generation_job(payload: Any) -> GenerationJob:
+    """
+    Persist a generation request for a background worker to pick up.
+    """
+    return GenerationJob.objects.create(payload=payload)
+
+
+def claim_next_job() -> GenerationJob | None:
+    """
+    Atomically move the oldest pending job to running and return it.
+
+    A job is claimed with a conditional UPDATE, so any number of worker
+    processes can poll the same table without taking a job twice and without
+    relying on SELECT ... FOR UPDATE SKIP LOCKED, which SQLite lacks.
+    """
+    candidates = (
+        GenerationJob.objects.filter(status=GenerationJob.PENDING)
+        .order_by("created_at", "id")
+        .values_list("id", flat=True)[:CLAIM_BATCH_SIZE]
+    )
+    for job_id in list(candidates):
+        claimed: int = GenerationJob.objects.filter(
+            pk=job_id, status=GenerationJob.PENDING
+        ).update(
+            status=GenerationJob.RUNNING,
+            started_at=timezone.now(),
+            attempts=F("attempts") + 1,
+        )
+        if claimed:
+            return GenerationJob.objects.get(pk=job_id)
+    return None
+
+
+def requeue_stale_jobs() -> int:
+    """
+    Return jobs whose worker died mid-run to the queue, or fail them once
+    they have used up their attempts.
+    """
+    cutoff = timezone.now() - timedelta(seconds=settings.RECIPE_JOB_STALE_AFTER)
+    stale = GenerationJob.objects.filter(
+        status=GenerationJob.RUNNING, started_at__lt=cutoff
+    )
+    failed: int = stale.filter(attempts__gte=settings.RECIPE_JOB_MAX_ATTEMPTS).update(
+        status=GenerationJob.FAILED,
+        error="Worker did not finish the job",
+        finished_at=timezone.now(),
+    )
+    requeued: int = stale.update(status=GenerationJob.PENDING, started_at=None)
+    return failed + requeued
+
+
+def finish_job(job: GenerationJob, **outcome: Any) -> bool:
+    """
+    Record the outcome of a claimed job, unless this worker no longer owns it:
+    a stale-job sweep may have requeued it, and every claim bumps attempts.
+    Returns whether the outcome was recorded.
+    """
+    return bool(
+        GenerationJob.objects.filter(
+            pk=job.pk, status=GenerationJob.RUNNING, attempts=job.attempts
+        ).update(finished_at=timezone.now(), **outcome)
+    )
+
+
+def process_job(job: GenerationJob) -> GenerationJob:
+    """
+    Generate and save the recipe for a claimed job and record the outcome.
+    """
+    serializer = RecipeSerializer(data=job.payload)
+    if not serializer.is_valid():
+        finish_job(job, status=GenerationJob.FAILED, error=str(serializer.errors))
+    else:
+        try:
+            instructions, nutritional_info = generate_content_for(serializer)
+            with transaction.atomic():
+                recipe = save_generated_recipe(
+                    serializer, instructions, nutritional_info
+                )
+                # a worker that lost the job keeps no recipe; the job's new
+                # owner saves its own
+                if not finish_job(job, status=GenerationJob.SUCCEEDED, recipe=recipe):
+                    transaction.set_rollback(True)
+        except GenerationError as e:
+            finish_job(job, status=GenerationJob.FAILED, error=str(e))
+        except Exception as e:
+            logger.exception("Generation job %s crashed", job.pk)
+            finish_job(job, status=GenerationJob.FAILED, error=str(e))
+
+    job.refresh_from_db()
+    return job
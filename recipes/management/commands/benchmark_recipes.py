@@ -0,0 +1,211 @@
+import json
+import platform
+import time
+from typing import Any
+import django
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import setup_test_environment, teardown_test_environment
+from recipes.benchmark import (
+    SCENARIOS,
+    ScenarioRunner,
+    StubUpstream,
+    compare_to_baseline,
+    load_templates,
+    seed_catalog,
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark the generate, list, detail and search endpoints against a "
+        "synthetic catalog in a throwaway test database, with Gemini and "
+        "Nutritionix replaced by local stand-ins. Reports throughput, "
+        "p50/p95/p99 latency and queries per request, and can fail on "
+        "regressions against a stored baseline."
+    )
+
+    def add_arguments(self, parser) -> None:
+        parser.add_argument(
+            "--recipes",
+            type=int,
+            default=10_000,
+            help="Size of the synthetic catalog, e.g. 10000, 100000 or 1000000.",
+        )
+        parser.add_argument(
+            "--requests",
+            type=int,
+            default=200,
+            help="Number of timed requests per scenario.",
+        )
+        parser.add_argument(
+            "--warmup",
+            type=int,
+            default=10,
+            help="Number of untimed requests run before each scenario.",
+        )
+        parser.add_argument(
+            "--scenarios",
+            default=",".join(SCENARIOS),
+            help=f"Comma-separated scenarios to run, out of {', '.join(SCENARIOS)}.",
+        )
+        parser.add_argument(
+            "--gemini-latency",
+            type=float,
+            default=0.0,
+            help="Simulated Gemini latency, in milliseconds.",
+        )
+        parser.add_argument(
+            "--nutritionix-latency",
+            type=float,
+            default=0.0,
+            help="Simulated Nutritionix latency, in milliseconds.",
+        )
+        parser.add_argument(
+            "--fixture",
+            default=str(settings.BASE_DIR / "sample_recipes.json"),
+            help="Fixture whose recipes the synthetic catalog is varied from.",
+        )
+        parser.add_argument(
+            "--seed", type=int, default=0, help="Seed for the catalog and requests."
+        )
+        parser.add_argument(
+            "--warm-cache",
+            action="store_true",
+            help="Keep the recipe cache between requests instead of clearing it, "
+            "to measure cached responses.",
+        )
+        parser.add_argument("--output", help="Write the results as JSON to this file.")
+        parser.add_argument(
+            "--baseline",
+            help="Compare against results previously written with --output and "
+            "exit with an error on regressions.",
+        )
+        parser.add_argument(
+            "--tolerance",
+            type=float,
+            default=20.0,
+            help="Allowed p95 and throughput change against the baseline, in percent.",
+        )
+
+    def handle(self, *args, **options) -> None:
+        scenarios: list[str] = [
+            name.strip() for name in options["scenarios"].split(",") if name.strip()
+        ]
+        unknown: list[str] = [name for name in scenarios if name not in SCENARIOS]
+        if unknown:
+            raise CommandError(f"Unknown scenario(s): {', '.join(unknown)}")
+        if options["recipes"] < 1 or options["requests"] < 1:
+            raise CommandError("--recipes and --requests must be at least 1.")
+
+        baseline: dict[str, Any] | None = None
+        if options["baseline"]:
+            try:
+                with open(options["baseline"], encoding="utf-8") as f:
+                    baseline = json.load(f)
+            except (OSError, json.JSONDecodeError) as e:
+                raise CommandError(f"Could not read {options['baseline']}: {e}")
+        try:
+            templates: list[dict[str, Any]] = load_templates(options["fixture"])
+        except (OSError, ValueError, KeyError) as e:
+            raise CommandError(f"Could not read {options['fixture']}: {e}")
+
+        stub = StubUpstream(
+            gemini_latency=options["gemini_latency"] / 1000,
+            nutritionix_latency=options["nutritionix_latency"] / 1000,
+        )
+        setup_test_environment()
+        old_name: str = connection.creation.create_test_db(
+            verbosity=0, autoclobber=True, serialize=False
+        )
+        try:
+            results: dict[str, Any] = self.run_benchmark(
+                templates, scenarios, stub, options
+            )
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+
+        self.report(results)
+        if options["output"]:
+            with open(options["output"], "w", encoding="utf-8") as f:
+                json.dump(results, f, indent=2)
+                f.write("\n")
+
+        if baseline is not None:
+            if baseline.get("catalog", {}).get("recipes") != options["recipes"]:
+                self.stderr.write(
+                    "Warning: the baseline was measured on a catalog of "
+                    f"{baseline.get('catalog', {}).get('recipes')} recipes."
+                )
+            regressions: list[str] = compare_to_baseline(
+                results, baseline, options["tolerance"] / 100
+            )
+            if regressions:
+                for line in regressions:
+                    self.stderr.write(f"Regression: {line}")
+                raise CommandError(
+                    f"{len(regressions)} regression(s) against {options['baseline']}"
+                )
+            self.stdout.write(self.style.SUCCESS("No regressions against baseline."))
+
+    def run_benchmark(
+        self,
+        templates: list[dict[str, Any]],
+        scenarios: list[str],
+        stub: StubUpstream,
+        options: dict[str, Any],
+    ) -> dict[str, Any]:
+        started: float = time.perf_counter()
+
+        def progress(created: int) -> None:
+            if created % 100_000 == 0 or created == options["recipes"]:
+                self.stdout.write(f"Seeded {created} of {options['recipes']} recipes")
+
+        seed_catalog(templates, options["recipes"], options["seed"], progress=progress)
+        seeded: float = time.perf_counter() - started
+
+        runner = ScenarioRunner(
+            options["requests"],
+            seed=options["seed"],
+            warm_cache=options["warm_cache"],
+            warmup=options["warmup"],
+        )
+        measured: dict[str, Any] = {}
+        with stub.patch():
+            for scenario in scenarios:
+                measured[scenario] = runner.run(scenario, templates)
+
+        return {
+            "catalog": {
+                "recipes": options["recipes"],
+                "seed": options["seed"],
+                "seconds": round(seeded, 1),
+            },
+            "settings": {
+                "requests": options["requests"],
+                "warmup": options["warmup"],
+                "warm_cache": options["warm_cache"],
+                "gemini_latency_ms": options["gemini_latency"],
+                "nutritionix_latency_ms": options["nutritionix_latency"],
+            },
+            "environment": {
+                "python": platform.python_version(),
+                "django": django.get_version(),
+                "database": connection.vendor,
+            },
+            "scenarios": measured,
+        }
+
+    def report(self, results: dict[str, Any]) -> None:
+        self.stdout.write(
+            f"{'scenario':<10} {'req/s':>9} {'p50 ms':>9} {'p95 ms':>9} "
+            f"{'p99 ms':>9} {'queries':>8} {'errors':>7}"
+        )
+        for scenario, row in results["scenarios"].items():
+            self.stdout.write(
+                f"{scenario:<10} {row['throughput']:>9.1f} {row['p50']:>9.2f} "
+                f"{row['p95']:>9.2f} {row['p99']:>9.2f} "
+                f"{row['queries_mean']:>8.1f} {row['errors']:>7}"
+            )
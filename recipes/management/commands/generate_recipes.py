@@ -0,0 +1,60 @@
+import json
+import time
+from django.core.management.base import BaseCommand, CommandError
+from recipes.services import generate_recipes_batch
+
+
+class Command(BaseCommand):
+    help = (
+        "Generate recipes in bulk from a JSON file holding a list of generation "
+        'requests (the POST /api/recipes/generate/ body), or {"items": [...]}.'
+    )
+
+    def add_arguments(self, parser) -> None:
+        parser.add_argument("path", help="JSON file with the generation requests.")
+        parser.add_argument(
+            "--concurrency",
+            type=int,
+            default=None,
+            help="Maximum number of upstream calls in flight.",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=100,
+            help="Number of requests generated and saved per bulk write.",
+        )
+
+    def handle(self, *args, **options) -> None:
+        if options["batch_size"] < 1:
+            raise CommandError("--batch-size must be at least 1.")
+        try:
+            with open(options["path"], encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, json.JSONDecodeError) as e:
+            raise CommandError(f"Could not read {options['path']}: {e}")
+
+        items = data.get("items") if isinstance(data, dict) else data
+        if not isinstance(items, list):
+            raise CommandError("Expected a list of generation requests.")
+
+        created: int = 0
+        started: float = time.perf_counter()
+        for start in range(0, len(items), options["batch_size"]):
+            batch = items[start : start + options["batch_size"]]
+            for result in generate_recipes_batch(batch, options["concurrency"]):
+                index: int = start + result["index"]
+                if result["status"] == "created":
+                    created += 1
+                    self.stdout.write(
+                        f"[{index}] created recipe {result['recipe']['id']}"
+                    )
+                else:
+                    self.stderr.write(f"[{index}] failed: {result['errors']}")
+
+        elapsed: float = time.perf_counter() - started
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Created {created} of {len(items)} recipe(s) in {elapsed:.1f}s"
+            )
+        )
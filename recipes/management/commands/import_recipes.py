@@ -0,0 +1,101 @@
+import sys
+import time
+from typing import IO, Any
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework.exceptions import ValidationError
+from recipes.bulk import bulk_create_recipes
+from recipes.catalog import iter_records, recipe_records
+from recipes.serializers import RecipeSerializer
+
+
+class Command(BaseCommand):
+    help = (
+        "Import recipes from a JSON array, NDJSON or Django fixture file, or - "
+        "for stdin, with constant memory. Records use the recipe API shape, as "
+        "written by export_recipes. Each chunk is validated, its ingredients "
+        "deduplicated in batches and its recipes bulk-inserted in one "
+        "transaction; invalid records are reported and skipped."
+    )
+
+    def add_arguments(self, parser) -> None:
+        parser.add_argument("path", help="File to import, or - for stdin.")
+        parser.add_argument(
+            "--format",
+            choices=["auto", "json", "ndjson"],
+            default="auto",
+            help="Input format; auto reads a file starting with [ as a JSON array.",
+        )
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            default=1000,
+            help="Number of recipes validated and written per transaction.",
+        )
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Validate every record without writing anything.",
+        )
+
+    def handle(self, *args, **options) -> None:
+        if options["chunk_size"] < 1:
+            raise CommandError("--chunk-size must be at least 1.")
+        path: str = options["path"]
+        try:
+            stream: IO[str] = sys.stdin if path == "-" else open(path, encoding="utf-8")
+        except OSError as e:
+            raise CommandError(f"Could not read {path}: {e}")
+        try:
+            self.import_stream(stream, options)
+        finally:
+            if stream is not sys.stdin:
+                stream.close()
+
+    def import_stream(self, stream: IO[str], options: dict[str, Any]) -> None:
+        # one serializer validates every record, so its fields are built once
+        validator = RecipeSerializer()
+        chunk: list[dict[str, Any]] = []
+        imported: int = 0
+        skipped: int = 0
+        started: float = time.perf_counter()
+
+        def write() -> None:
+            nonlocal imported
+            if not options["dry_run"]:
+                bulk_create_recipes(chunk)
+            imported += len(chunk)
+            chunk.clear()
+            if imported % 100_000 < options["chunk_size"]:
+                self.stdout.write(f"{imported} recipe(s) {self.verb(options)}")
+
+        try:
+            for index, record in enumerate(
+                recipe_records(iter_records(stream, options["format"]))
+            ):
+                try:
+                    chunk.append(validator.run_validation(record))
+                except ValidationError as e:
+                    skipped += 1
+                    self.stderr.write(f"[{index}] skipped: {e.detail}")
+                    continue
+                if len(chunk) >= options["chunk_size"]:
+                    write()
+        except ValueError as e:
+            raise CommandError(
+                f"Could not read {options['path']} after {imported} recipe(s): {e}"
+            )
+        if chunk:
+            write()
+
+        elapsed: float = time.perf_counter() - started
+        rate: float = imported / elapsed if elapsed else 0.0
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"{imported} recipe(s) {self.verb(options)}, {skipped} skipped, "
+                f"in {elapsed:.1f}s ({rate:.0f} recipes/s)"
+            )
+        )
+
+    @staticmethod
+    def verb(options: dict[str, Any]) -> str:
+        return "validated" if options["dry_run"] else "imported"
@@ -0,0 +1,59 @@
+import time
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+from recipes.jobs import claim_next_job, process_job, requeue_stale_jobs
+from recipes.metrics import flush
+
+
+class Command(BaseCommand):
+    help = (
+        "Process queued recipe generation jobs. Start one copy per worker "
+        "process you want; jobs are claimed atomically, so copies never overlap."
+    )
+
+    def add_arguments(self, parser) -> None:
+        parser.add_argument(
+            "--once",
+            action="store_true",
+            help="Exit once the queue is empty instead of polling for new jobs.",
+        )
+        parser.add_argument(
+            "--poll-interval",
+            type=float,
+            default=1.0,
+            help="Seconds to wait before polling an empty queue again.",
+        )
+        parser.add_argument(
+            "--max-jobs",
+            type=int,
+            default=None,
+            help="Exit after processing this many jobs.",
+        )
+
+    def handle(self, *args, **options) -> None:
+        processed: int = 0
+        try:
+            while options["max_jobs"] is None or processed < options["max_jobs"]:
+                close_old_connections()
+                requeued: int = requeue_stale_jobs()
+                if requeued:
+                    self.stdout.write(f"Recovered {requeued} stale job(s)")
+
+                job = claim_next_job()
+                if job is None:
+                    if options["once"]:
+                        break
+                    time.sleep(options["poll_interval"])
+                    continue
+
+                job = process_job(job)
+                processed += 1
+                self.stdout.write(f"Job {job.pk}: {job.status}")
+                # no request middleware runs here to flush the job's timings
+                flush()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            flush(force=True)
+
+        self.stdout.write(self.style.SUCCESS(f"Processed {processed} job(s)"))
@@ -0,0 +1,357 @@
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import lru_cache
+from itertools import product
+from typing import Any, Callable, Iterator
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.cache import caches
+
+# upper bounds, in seconds, of the latency histogram buckets
+LATENCY_BUCKETS: tuple[float, ...] = (
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+    30.0,
+)
+QUERY_COUNT_BUCKETS: tuple[float, ...] = (1, 2, 5, 10, 20, 50, 100, 200)
+
+UPSTREAM_PROVIDERS: tuple[str, ...] = ("gemini", "nutritionix")
+SERIALIZATION_PHASES: tuple[str, ...] = ("serialize", "render")
+STATUS_CLASSES: tuple[str, ...] = ("1xx", "2xx", "3xx", "4xx", "5xx")
+
+# view label of requests that did not resolve to a named recipes view
+OTHER_VIEW = "other"
+
+METRIC_KEY = "metrics:{}"
+
+
+@lru_cache(maxsize=None)
+def view_names() -> tuple[str, ...]:
+    """
+    The view label values: every named route of the recipes API, plus
+    "metrics" and OTHER_VIEW, so the series are known up front.
+    """
+    from . import urls
+
+    names: list[str] = [pattern.name for pattern in urls.urlpatterns if pattern.name]
+    return (*names, "metrics", OTHER_VIEW)
+
+
+class RequestTimings:
+    """
+    Time spent in each phase of one request, by phase name: "db" plus the
+    upstream providers and serialization phases.
+    """
+
+    def __init__(self) -> None:
+        self.started: float = time.perf_counter()
+        self.durations: dict[str, float] = {}
+        self.counts: dict[str, int] = {}
+        self.lock = threading.Lock()
+
+    def add(self, name: str, seconds: float) -> None:
+        with self.lock:
+            self.durations[name] = self.durations.get(name, 0.0) + seconds
+            self.counts[name] = self.counts.get(name, 0) + 1
+
+    def server_timing(self, total: float) -> str:
+        """
+        Format the timings as a Server-Timing header value, in milliseconds.
+        """
+        entries: list[str] = []
+        for name, seconds in self.durations.items():
+            entry: str = f"{name};dur={seconds * 1000:.1f}"
+            if name == "db":
+                entry += f';desc="{self.counts[name]} queries"'
+            entries.append(entry)
+        entries.append(f"total;dur={total * 1000:.1f}")
+        return ", ".join(entries)
+
+
+current_timings: ContextVar[RequestTimings | None] = ContextVar(
+    "current_timings", default=None
+)
+
+
+class Histogram:
+    """
+    A Prometheus histogram whose observations are buffered per process and
+    flushed into counters in the shared recipes_state cache, so every worker
+    that shares the backend reports into the same series.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        buckets: tuple[float, ...],
+        labels: dict[str, Callable[[], tuple[str, ...]]],
+        scale: int = 1_000_000,
+    ) -> None:
+        self.name = name
+        self.documentation = documentation
+        self.buckets = buckets
+        self.labels = labels
+        # sums are kept as integers (cache incr only adds integers)
+        self.scale = scale
+
+    def _key(self, labels: tuple[str, ...], part: str) -> str:
+        return METRIC_KEY.format(f"{self.name}:{':'.join(labels)}:{part}")
+
+    def observe(self, value: float, *labels: str) -> None:
+        index: int = next(
+            (i for i, bound in enumerate(self.buckets) if value <= bound),
+            len(self.buckets),
+        )
+        _buffer(
+            {
+                self._key(labels, str(index)): 1,
+                self._key(labels, "count"): 1,
+                self._key(labels, "sum"): round(value * self.scale),
+            }
+        )
+
+    def series(self) -> list[tuple[str, ...]]:
+        return list(product(*(values() for values in self.labels.values())))
+
+    def keys(self) -> list[str]:
+        return [
+            self._key(labels, part)
+            for labels in self.series()
+            for part in [*map(str, range(len(self.buckets) + 1)), "count", "sum"]
+        ]
+
+    def expose(self, values: dict[str, int]) -> list[str]:
+        """
+        Render the series that have observations in the Prometheus text format.
+        """
+        lines: list[str] = [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} histogram",
+        ]
+        for labels in self.series():
+            count: int = values.get(self._key(labels, "count"), 0)
+            if not count:
+                continue
+            pairs: str = ",".join(
+                f'{name}="{value}"' for name, value in zip(self.labels, labels)
+            )
+            cumulative: int = 0
+            for index, bound in enumerate([*self.buckets, "+Inf"]):
+                cumulative += values.get(self._key(labels, str(index)), 0)
+                lines.append(f'{self.name}_bucket{{{pairs},le="{bound}"}} {cumulative}')
+            total: float = values.get(self._key(labels, "sum"), 0) / self.scale
+            lines.append(f"{self.name}_sum{{{pairs}}} {total}")
+            lines.append(f"{self.name}_count{{{pairs}}} {count}")
+        return lines
+
+
+REQUEST_DURATION = Histogram(
+    "recipe_http_request_duration_seconds",
+    "Time to produce a response, by view.",
+    LATENCY_BUCKETS,
+    {"view": view_names, "status": lambda: STATUS_CLASSES},
+)
+REQUEST_DB_DURATION = Histogram(
+    "recipe_http_request_db_duration_seconds",
+    "Time spent in database queries per request, by view.",
+    LATENCY_BUCKETS,
+    {"view": view_names},
+)
+REQUEST_DB_QUERIES = Histogram(
+    "recipe_http_request_db_queries",
+    "Database queries per request, by view.",
+    QUERY_COUNT_BUCKETS,
+    {"view": view_names},
+    scale=1,
+)
+UPSTREAM_DURATION = Histogram(
+    "recipe_upstream_request_duration_seconds",
+    "Latency of upstream API calls, by provider.",
+    LATENCY_BUCKETS,
+    {"provider": lambda: UPSTREAM_PROVIDERS},
+)
+SERIALIZATION_DURATION = Histogram(
+    "recipe_serialization_duration_seconds",
+    "Time spent serializing and rendering responses, by phase.",
+    LATENCY_BUCKETS,
+    {"phase": lambda: SERIALIZATION_PHASES},
+)
+
+HISTOGRAMS: tuple[Histogram, ...] = (
+    REQUEST_DURATION,
+    REQUEST_DB_DURATION,
+    REQUEST_DB_QUERIES,
+    UPSTREAM_DURATION,
+    SERIALIZATION_DURATION,
+)
+
+_pending: Counter = Counter()
+_pending_lock = threading.Lock()
+_last_flush: float = time.monotonic()
+
+
+def _buffer(deltas: dict[str, int]) -> None:
+    with _pending_lock:
+        _pending.update(deltas)
+
+
+def flush(force: bool = False) -> None:
+    """
+    Add the buffered observations to the shared counters, at most once every
+    RECIPE_METRICS_FLUSH_INTERVAL seconds unless forced.
+    """
+    global _last_flush
+    with _pending_lock:
+        now: float = time.monotonic()
+        if not force and now - _last_flush < settings.RECIPE_METRICS_FLUSH_INTERVAL:
+            return
+        deltas: dict[str, int] = dict(_pending)
+        _pending.clear()
+        _last_flush = now
+
+    cache = caches[settings.RECIPE_STATE_CACHE_ALIAS]
+    for key, delta in deltas.items():
+        # incr() is atomic on shared backends; add() only wins for a new
+        # counter, so a concurrent first flush from another worker is kept
+        try:
+            cache.incr(key, delta)
+        except ValueError:
+            if not cache.add(key, delta, timeout=None):
+                cache.incr(key, delta)
+
+
+def render_metrics() -> str:
+    """
+    Render every histogram in the Prometheus text exposition format.
+    """
+    flush(force=True)
+    keys: list[str] = [key for histogram in HISTOGRAMS for key in histogram.keys()]
+    values: dict[str, int] = caches[settings.RECIPE_STATE_CACHE_ALIAS].get_many(keys)
+    lines: list[str] = []
+    for histogram in HISTOGRAMS:
+        lines.extend(histogram.expose(values))
+    return "\n".join(lines) + "\n"
+
+
+@contextmanager
+def timed(name: str) -> Iterator[None]:
+    """
+    Time an upstream call (name is the provider) or a serialization phase,
+    into the current request's timings and the matching histogram.
+    """
+    started: float = time.perf_counter()
+    try:
+        yield
+    finally:
+        seconds: float = time.perf_counter() - started
+        timings: RequestTimings | None = current_timings.get()
+        if timings is not None:
+            timings.add(name, seconds)
+        if name in UPSTREAM_PROVIDERS:
+            UPSTREAM_DURATION.observe(seconds, name)
+        else:
+            SERIALIZATION_DURATION.observe(seconds, name)
+
+
+def with_request_timings(func: Callable) -> Callable:
+    """
+    Bind func to the current request's timings, for running it on another
+    thread (thread pools do not carry context variables over).
+    """
+    timings: RequestTimings | None = current_timings.get()
+
+    def run(*args, **kwargs) -> Any:
+        token = current_timings.set(timings)
+        try:
+            return func(*args, **kwargs)
+        finally:
+            current_timings.reset(token)
+
+    return run
+
+
+def record_query(execute, sql, params, many, context) -> Any:
+    """
+    Database execute wrapper adding each query's time to the current request.
+    """
+    timings: RequestTimings | None = current_timings.get()
+    if timings is None:
+        return execute(sql, params, many, context)
+    started: float = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        timings.add("db", time.perf_counter() - started)
+
+
+def install_query_recorder(sender, connection, **kwargs) -> None:
+    """
+    connection_created receiver; wraps every database connection once.
+    """
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
+
+
+class MetricsMiddleware:
+    """
+    Time each request, add a Server-Timing header with its database, upstream
+    and serialization phases, and record it in the /metrics histograms.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response) -> None:
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        timings = RequestTimings()
+        token = current_timings.set(timings)
+        try:
+            response = self.get_response(request)
+        finally:
+            current_timings.reset(token)
+        return self.finish(request, response, timings)
+
+    async def __acall__(self, request):
+        timings = RequestTimings()
+        token = current_timings.set(timings)
+        try:
+            response = await self.get_response(request)
+        finally:
+            current_timings.reset(token)
+        return self.finish(request, response, timings)
+
+    def finish(self, request, response, timings: RequestTimings):
+        total: float = time.perf_counter() - timings.started
+        match = getattr(request, "resolver_match", None)
+        view: str = (
+            match.url_name
+            if match is not None and match.url_name in view_names()
+            else OTHER_VIEW
+        )
+        status: str = f"{response.status_code // 100}xx"
+        REQUEST_DURATION.observe(total, view, status)
+        REQUEST_DB_DURATION.observe(timings.durations.get("db", 0.0), view)
+        REQUEST_DB_QUERIES.observe(timings.counts.get("db", 0), view)
+        if settings.RECIPE_SERVER_TIMING:
+            response["Server-Timing"] = timings.server_timing(total)
+        flush()
+        return response
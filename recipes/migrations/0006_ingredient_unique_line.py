@@ -0,0 +1,51 @@
+# Generated by Django 5.2.3 on 2026-10-18 19:32
+
+from django.db import migrations, models
+
+
+def merge_duplicate_ingredients(apps, schema_editor) -> None:
+    """
+    Normalize existing ingredient rows and merge the duplicates that the unique
+    constraint would reject, repointing recipes at the surviving row.
+    """
+    Ingredient = apps.get_model("recipes", "Ingredient")
+    Recipe = apps.get_model("recipes", "Recipe")
+    through = Recipe.ingredients.through
+
+    keepers: dict[tuple, int] = {}
+    for ingredient in Ingredient.objects.order_by("pk"):
+        name: str = str(ingredient.name).strip().lower()
+        unit: str = str(ingredient.unit or "").strip().lower()
+        # str(None) used to be stored for a missing unit
+        if unit == "none":
+            unit = ""
+        key: tuple = (name, unit, ingredient.quantity)
+
+        keeper: int | None = keepers.get(key)
+        if keeper is None:
+            keepers[key] = ingredient.pk
+            if (name, unit) != (ingredient.name, ingredient.unit):
+                Ingredient.objects.filter(pk=ingredient.pk).update(name=name, unit=unit)
+            continue
+
+        linked = through.objects.filter(ingredient_id=ingredient.pk)
+        already = through.objects.filter(ingredient_id=keeper).values("recipe_id")
+        linked.filter(recipe_id__in=already).delete()
+        linked.update(ingredient_id=keeper)
+        ingredient.delete()
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("recipes", "0005_generationjob"),
+    ]
+
+    operations = [
+        migrations.RunPython(merge_duplicate_ingredients, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name="ingredient",
+            constraint=models.UniqueConstraint(
+                fields=("name", "unit", "quantity"), name="unique_ingredient_line"
+            ),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.3 on 2026-10-18 19:33
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("recipes", "0006_ingredient_unique_line"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="recipe",
+            index=models.Index(
+                fields=["-created_at", "-id"], name="recipe_created_id_idx"
+            ),
+        ),
+    ]
@@ -0,0 +1,131 @@
+# Generated by Django 5.2.3 on 2026-10-18 19:34
+
+from django.db import migrations, models
+
+
+# recipes.search's full-text index as of this migration, frozen so later
+# changes to the index do not change what it does. After every migrate,
+# apps.restore_search_index brings the index up to the current definition.
+FTS_TABLE = "recipes_recipe_fts"
+
+SQLITE_SEARCH_SQL: list[str] = [
+    f"""
+CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5(
+    title, description, instructions,
+    content='recipes_recipe', content_rowid='id', tokenize='porter unicode61'
+)
+""",
+    f"""
+CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ai AFTER INSERT ON recipes_recipe BEGIN
+    INSERT INTO {FTS_TABLE}(rowid, title, description, instructions)
+    VALUES (new.id, new.title, new.description, new.instructions);
+END
+""",
+    f"""
+CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ad AFTER DELETE ON recipes_recipe BEGIN
+    INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, title, description, instructions)
+    VALUES ('delete', old.id, old.title, old.description, old.instructions);
+END
+""",
+    f"""
+CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_au
+AFTER UPDATE OF title, description, instructions ON recipes_recipe BEGIN
+    INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, title, description, instructions)
+    VALUES ('delete', old.id, old.title, old.description, old.instructions);
+    INSERT INTO {FTS_TABLE}(rowid, title, description, instructions)
+    VALUES (new.id, new.title, new.description, new.instructions);
+END
+""",
+    # index the recipes that already exist
+    f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')",
+]
+SQLITE_DROP_SQL: list[str] = [
+    f"DROP TRIGGER IF EXISTS {FTS_TABLE}_ai",
+    f"DROP TRIGGER IF EXISTS {FTS_TABLE}_ad",
+    f"DROP TRIGGER IF EXISTS {FTS_TABLE}_au",
+    f"DROP TABLE IF EXISTS {FTS_TABLE}",
+]
+
+POSTGRES_SEARCH_SQL: list[str] = [
+    """
+ALTER TABLE recipes_recipe ADD COLUMN IF NOT EXISTS search_vector tsvector
+GENERATED ALWAYS AS (
+    setweight(to_tsvector('english', coalesce(title, '')), 'A')
+    || setweight(to_tsvector('english', coalesce(description, '')), 'B')
+    || setweight(to_tsvector('english', coalesce(instructions, '')), 'C')
+) STORED
+""",
+    """
+CREATE INDEX IF NOT EXISTS recipe_search_vector_idx
+ON recipes_recipe USING GIN (search_vector)
+""",
+]
+POSTGRES_DROP_SQL: list[str] = [
+    "DROP INDEX IF EXISTS recipe_search_vector_idx",
+    "ALTER TABLE recipes_recipe DROP COLUMN IF EXISTS search_vector",
+]
+
+
+def run_for_vendor(schema_editor, statements: dict[str, list[str]]) -> None:
+    for statement in statements.get(schema_editor.connection.vendor, []):
+        schema_editor.execute(statement)
+
+
+def create_search_index(apps, schema_editor) -> None:
+    """
+    Build the full-text index: FTS5 plus sync triggers on SQLite, a generated
+    tsvector column with a GIN index on Postgres.
+    """
+    run_for_vendor(
+        schema_editor,
+        {"sqlite": SQLITE_SEARCH_SQL, "postgresql": POSTGRES_SEARCH_SQL},
+    )
+
+
+def drop_search_index(apps, schema_editor) -> None:
+    run_for_vendor(
+        schema_editor, {"sqlite": SQLITE_DROP_SQL, "postgresql": POSTGRES_DROP_SQL}
+    )
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("recipes", "0007_recipe_created_id_idx"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="recipe",
+            name="total_time",
+            field=models.GeneratedField(
+                db_persist=True,
+                expression=models.F("prep_time") + models.F("cook_time"),
+                output_field=models.PositiveIntegerField(),
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="recipe",
+            index=models.Index(
+                fields=[
+                    "cuisine",
+                    "dietary_restrictions",
+                    "difficulty",
+                    "-created_at",
+                    "-id",
+                ],
+                name="recipe_filter_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="recipe",
+            index=models.Index(
+                fields=["dietary_restrictions", "-created_at", "-id"],
+                name="recipe_diet_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="recipe",
+            index=models.Index(fields=["total_time"], name="recipe_total_time_idx"),
+        ),
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -0,0 +1,210 @@
+# Generated by Django 5.2.3 on 2026-10-18 19:40
+
+import re
+from decimal import ROUND_HALF_UP, Decimal, InvalidOperation
+from typing import Any
+
+from django.db import migrations, models
+
+BATCH_SIZE = 500
+
+# recipes.nutrition as of this migration, frozen so later changes to the
+# summary extraction do not change what it does
+NUTRIENTS: dict[str, str] = {
+    "calories": "nf_calories",
+    "protein": "nf_protein",
+    "fat": "nf_total_fat",
+    "carbs": "nf_total_carbohydrate",
+    "fiber": "nf_dietary_fiber",
+    "sodium": "nf_sodium",
+}
+SUMMARY_FIELDS: list[str] = [
+    field for name in NUTRIENTS for field in (name, f"{name}_per_serving")
+]
+AMOUNT_PATTERN = re.compile(r"^\s*(\d+(?:\.\d+)?)")
+CENT = Decimal("0.01")
+
+
+def to_amount(value: Any) -> Decimal | None:
+    if value is None or isinstance(value, bool):
+        return None
+    if isinstance(value, str):
+        match = AMOUNT_PATTERN.match(value)
+        if not match:
+            return None
+        value = match.group(1)
+    try:
+        return Decimal(str(value))
+    except InvalidOperation:
+        return None
+
+
+def nutrition_summary(info: Any, servings: int) -> dict[str, Decimal | None]:
+    totals: dict[str, Decimal | None] = dict.fromkeys(NUTRIENTS)
+    if isinstance(info, dict) and isinstance(info.get("foods"), list):
+        for name, source in NUTRIENTS.items():
+            amounts: list[Decimal] = [
+                amount
+                for food in info["foods"]
+                if isinstance(food, dict)
+                and (amount := to_amount(food.get(source))) is not None
+            ]
+            if amounts:
+                totals[name] = sum(amounts, Decimal(0))
+    elif isinstance(info, dict):
+        for name in NUTRIENTS:
+            totals[name] = to_amount(info.get(name))
+
+    summary: dict[str, Decimal | None] = {}
+    for name, total in totals.items():
+        summary[name] = None if total is None else total.quantize(CENT, ROUND_HALF_UP)
+        summary[f"{name}_per_serving"] = (
+            None
+            if total is None or not servings
+            else (total / servings).quantize(CENT, ROUND_HALF_UP)
+        )
+    return summary
+
+
+def backfill_nutrition_summary(apps, schema_editor) -> None:
+    """
+    Fill in the new summary columns. Stored nutrition blobs are left as they
+    are; only new writes are compacted.
+    """
+    Recipe = apps.get_model("recipes", "Recipe")
+    batch: list = []
+    for recipe in Recipe.objects.exclude(nutritional_info=None).iterator(
+        chunk_size=BATCH_SIZE
+    ):
+        for field, value in nutrition_summary(
+            recipe.nutritional_info, recipe.servings
+        ).items():
+            setattr(recipe, field, value)
+        batch.append(recipe)
+        if len(batch) == BATCH_SIZE:
+            Recipe.objects.bulk_update(batch, SUMMARY_FIELDS)
+            batch = []
+    if batch:
+        Recipe.objects.bulk_update(batch, SUMMARY_FIELDS)
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("recipes", "0008_recipe_filters_and_search"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="recipe",
+            name="calories",
+            field=models.DecimalField(
+                blank=True, decimal_places=2, max_digits=10, null=True
+            ),
+        ),
+        migrations.AddField(
+            model_name="recipe",
+            name="calories_per_serving",
+            field=models.DecimalField(
+                blank=True, decimal_places=2, max_digits=10, null=True
+            ),
+        ),
+        migrations.AddField(
+            model_name="recipe",
+            name="carbs",
+            field=models.DecimalField(
+                blank=True, decimal_places=2, max_digits=10, null=True
+            ),
+        ),
+        migrations.AddField(
+            model_name="recipe",
+            name="carbs_per_serving",
+            field=models.DecimalField(
+                blank=True, decimal_places=2, max_digits=10, null=True
+            ),
+        ),
+        migrations.AddField(
+            model_name="recipe",
+            name="fat",
+            field=models.DecimalField(
+                blank=True, decimal_places=2, max_digits=10, null=True
+            ),
+        ),
+        migrations.AddField(
+            model_name="recipe",
+            name="fat_per_serving",
+            field=models.DecimalField(
+                blank=True, decimal_places=2, max_digits=10, null=True
+            ),
+        ),
+        migrations.AddField(
+            model_name="recipe",
+            name="fiber",
+            field=models.DecimalField(
+                blank=True, decimal_places=2, max_digits=10, null=True
+            ),
+        ),
+        migrations.AddField(
+            model_name="recipe",
+            name="fiber_per_serving",
+            field=models.DecimalField(
+                blank=True, decimal_places=2, max_digits=10, null=True
+            ),
+        ),
+        migrations.AddField(
+            model_name="recipe",
+            name="protein",
+            field=models.DecimalField(
+                blank=True, decimal_places=2, max_digits=10, null=True
+            ),
+        ),
+        migrations.AddField(
+            model_name="recipe",
+            name="protein_per_serving",
+            field=models.DecimalField(
+                blank=True, decimal_places=2, max_digits=10, null=True
+            ),
+        ),
+        migrations.AddField(
+            model_name="recipe",
+            name="sodium",
+            field=models.DecimalField(
+                blank=True, decimal_places=2, max_digits=10, null=True
+            ),
+        ),
+        migrations.AddField(
+            model_name="recipe",
+            name="sodium_per_serving",
+            field=models.DecimalField(
+                blank=True, decimal_places=2, max_digits=10, null=True
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="recipe",
+            index=models.Index(
+                fields=["calories_per_serving"], name="recipe_calories_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="recipe",
+            index=models.Index(
+                fields=["protein_per_serving"], name="recipe_protein_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="recipe",
+            index=models.Index(fields=["fat_per_serving"], name="recipe_fat_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="recipe",
+            index=models.Index(fields=["carbs_per_serving"], name="recipe_carbs_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="recipe",
+            index=models.Index(fields=["fiber_per_serving"], name="recipe_fiber_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="recipe",
+            index=models.Index(fields=["sodium_per_serving"], name="recipe_sodium_idx"),
+        ),
+        migrations.RunPython(backfill_nutrition_summary, migrations.RunPython.noop),
+    ]
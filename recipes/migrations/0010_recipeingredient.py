@@ -0,0 +1,56 @@
+# Generated by Django 5.2.3 on 2026-10-18 21:05
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("recipes", "0009_recipe_nutrition_summary"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="RecipeIngredient",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("quantity", models.DecimalField(decimal_places=2, max_digits=10)),
+                ("unit", models.CharField(blank=True, default="", max_length=50)),
+                (
+                    "ingredient",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="recipe_lines",
+                        to="recipes.ingredient",
+                    ),
+                ),
+                (
+                    "recipe",
+                    # no reverse accessor until the old Recipe.ingredients is gone
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="+",
+                        to="recipes.recipe",
+                    ),
+                ),
+            ],
+            options={
+                "ordering": ["id"],
+            },
+        ),
+        # lets 0011's reverse rebuild the per-line rows before quantity is
+        # required again
+        migrations.AlterField(
+            model_name="ingredient",
+            name="quantity",
+            field=models.DecimalField(decimal_places=2, max_digits=10, null=True),
+        ),
+    ]
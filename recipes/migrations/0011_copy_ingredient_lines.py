@@ -0,0 +1,144 @@
+from django.db import migrations
+
+BATCH_SIZE = 1000
+
+
+def merge_line(seen: dict[tuple, object], line) -> list:
+    """
+    Add a line to the lines of its recipe seen so far, keyed as the
+    unique_recipe_ingredient_line constraint keys them. A line repeating a
+    seen one is added into it, and the sum may repeat another; returns the
+    lines merged away.
+    """
+    merged: list = []
+    while (key := (line.ingredient_id, line.unit, line.quantity)) in seen:
+        kept = seen.pop(key)
+        kept.quantity += line.quantity
+        merged.append(line)
+        line = kept
+    seen[key] = line
+    return merged
+
+
+def copy_ingredient_lines(apps, schema_editor) -> None:
+    """
+    Turn the per-line ingredient rows into canonical ingredients plus recipe
+    lines: the oldest row of each name becomes the canonical ingredient, every
+    recipe link becomes a RecipeIngredient carrying the row's quantity and
+    unit, and the remaining rows are deleted. Links of a recipe that become
+    the same line are merged into one, their quantities added up.
+    """
+    Ingredient = apps.get_model("recipes", "Ingredient")
+    Recipe = apps.get_model("recipes", "Recipe")
+    RecipeIngredient = apps.get_model("recipes", "RecipeIngredient")
+    through = Recipe.ingredients.through
+
+    canonical: dict[str, int] = {}
+    renamed: dict[int, str] = {}
+    duplicates: list[int] = []
+    for pk, name in (
+        Ingredient.objects.order_by("pk")
+        .values_list("pk", "name")
+        .iterator(chunk_size=BATCH_SIZE)
+    ):
+        key: str = str(name).strip().lower()
+        if key in canonical:
+            duplicates.append(pk)
+            continue
+        canonical[key] = pk
+        if key != name:
+            renamed[pk] = key
+
+    batch: list = []
+    current: int | None = None
+    lines: list = []
+    seen: dict[tuple, object] = {}
+    merged: set[int] = set()
+    for recipe_id, name, quantity, unit in (
+        through.objects.order_by("recipe_id", "pk")
+        .values_list(
+            "recipe_id", "ingredient__name", "ingredient__quantity", "ingredient__unit"
+        )
+        .iterator(chunk_size=BATCH_SIZE)
+    ):
+        if recipe_id != current:
+            batch.extend(line for line in lines if id(line) not in merged)
+            current, lines, seen, merged = recipe_id, [], {}, set()
+            if len(batch) >= BATCH_SIZE:
+                RecipeIngredient.objects.bulk_create(batch)
+                batch = []
+        line = RecipeIngredient(
+            recipe_id=recipe_id,
+            ingredient_id=canonical[str(name).strip().lower()],
+            quantity=quantity,
+            unit=str(unit or "").strip().lower(),
+        )
+        lines.append(line)
+        merged.update(id(line) for line in merge_line(seen, line))
+    batch.extend(line for line in lines if id(line) not in merged)
+    for start in range(0, len(batch), BATCH_SIZE):
+        RecipeIngredient.objects.bulk_create(batch[start : start + BATCH_SIZE])
+
+    for start in range(0, len(duplicates), BATCH_SIZE):
+        Ingredient.objects.filter(
+            pk__in=duplicates[start : start + BATCH_SIZE]
+        ).delete()
+    for pk, name in renamed.items():
+        Ingredient.objects.filter(pk=pk).update(name=name)
+
+
+def split_ingredient_lines(apps, schema_editor) -> None:
+    """
+    Reverse copy_ingredient_lines: every distinct quantity and unit of an
+    ingredient's lines becomes an ingredient row again, the canonical row
+    taking the first, and recipes are linked to those rows. Ingredients no
+    line uses get a quantity of 0.
+    """
+    Ingredient = apps.get_model("recipes", "Ingredient")
+    Recipe = apps.get_model("recipes", "Recipe")
+    RecipeIngredient = apps.get_model("recipes", "RecipeIngredient")
+    through = Recipe.ingredients.through
+
+    links: list = []
+    current: int | None = None
+    rows: dict[tuple, int] = {}
+    for line in (
+        RecipeIngredient.objects.select_related("ingredient")
+        .order_by("ingredient_id", "pk")
+        .iterator(chunk_size=BATCH_SIZE)
+    ):
+        if line.ingredient_id != current:
+            current, rows = line.ingredient_id, {}
+        key: tuple = (line.unit, line.quantity)
+        if key not in rows:
+            canonical = line.ingredient
+            if rows:
+                rows[key] = Ingredient.objects.create(
+                    name=canonical.name,
+                    allergens=canonical.allergens,
+                    cost_per_unit=canonical.cost_per_unit,
+                    quantity=line.quantity,
+                    unit=line.unit,
+                ).pk
+            else:
+                Ingredient.objects.filter(pk=canonical.pk).update(
+                    quantity=line.quantity, unit=line.unit
+                )
+                rows[key] = canonical.pk
+        links.append(through(recipe_id=line.recipe_id, ingredient_id=rows[key]))
+        if len(links) == BATCH_SIZE:
+            through.objects.bulk_create(links, ignore_conflicts=True)
+            links = []
+    if links:
+        through.objects.bulk_create(links, ignore_conflicts=True)
+    Ingredient.objects.filter(quantity=None).update(quantity=0)
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("recipes", "0010_recipeingredient"),
+    ]
+
+    operations = [
+        migrations.RunPython(copy_ingredient_lines, split_ingredient_lines),
+    ]
@@ -0,0 +1,48 @@
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("recipes", "0011_copy_ingredient_lines"),
+    ]
+
+    operations = [
+        migrations.RemoveConstraint(
+            model_name="ingredient",
+            name="unique_ingredient_line",
+        ),
+        migrations.RemoveField(
+            model_name="recipe",
+            name="ingredients",
+        ),
+        migrations.RemoveField(
+            model_name="ingredient",
+            name="quantity",
+        ),
+        migrations.RemoveField(
+            model_name="ingredient",
+            name="unit",
+        ),
+        migrations.AlterField(
+            model_name="ingredient",
+            name="name",
+            field=models.CharField(max_length=100, unique=True),
+        ),
+        migrations.AlterField(
+            model_name="recipeingredient",
+            name="recipe",
+            field=models.ForeignKey(
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="ingredients",
+                to="recipes.recipe",
+            ),
+        ),
+        migrations.AddConstraint(
+            model_name="recipeingredient",
+            constraint=models.UniqueConstraint(
+                fields=("recipe", "ingredient", "unit", "quantity"),
+                name="unique_recipe_ingredient_line",
+            ),
+        ),
+    ]
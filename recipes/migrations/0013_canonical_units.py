@@ -0,0 +1,116 @@
+import re
+
+from django.db import migrations
+
+BATCH_SIZE = 1000
+
+# recipes.units' spellings as of this migration, frozen so later changes to
+# the unit tables do not change what it does
+ALIASES: dict[str, str] = {
+    "cloves": "clove",
+    "slices": "slice",
+    "pinches": "pinch",
+    "dashes": "dash",
+    "cans": "can",
+    "bunches": "bunch",
+    "sprigs": "sprig",
+    "sticks": "stick",
+    "leaves": "leaf",
+    "heads": "head",
+    **dict.fromkeys(("milligram", "milligrams", "milligramme"), "mg"),
+    **dict.fromkeys(("gram", "grams", "gramme", "grammes", "gr", "gm"), "g"),
+    **dict.fromkeys(("kilogram", "kilograms", "kilo", "kilos", "kgs"), "kg"),
+    **dict.fromkeys(("ounce", "ounces"), "oz"),
+    **dict.fromkeys(("lbs", "pound", "pounds"), "lb"),
+    **dict.fromkeys(
+        ("milliliter", "milliliters", "millilitre", "millilitres", "mls", "cc"), "ml"
+    ),
+    **dict.fromkeys(("centiliter", "centiliters", "centilitre", "centilitres"), "cl"),
+    **dict.fromkeys(("deciliter", "deciliters", "decilitre", "decilitres"), "dl"),
+    **dict.fromkeys(("liter", "liters", "litre", "litres", "ltr"), "l"),
+    **dict.fromkeys(("teaspoon", "teaspoons", "tsps"), "tsp"),
+    **dict.fromkeys(
+        ("tablespoon", "tablespoons", "tbsps", "tbs", "tbl", "tbls"), "tbsp"
+    ),
+    **dict.fromkeys(("fluid ounce", "fluid ounces", "floz"), "fl oz"),
+    **dict.fromkeys(("cups", "c"), "cup"),
+    **dict.fromkeys(("pints", "pt"), "pint"),
+    **dict.fromkeys(("quarts", "qt"), "quart"),
+    **dict.fromkeys(("gallons", "gal"), "gallon"),
+    **dict.fromkeys(
+        ("pieces", "pc", "pcs", "each", "ea", "whole", "item", "items"), "piece"
+    ),
+}
+SEPARATORS = re.compile(r"[.\s]+")
+
+
+def canonical_unit(unit) -> str:
+    cleaned: str = SEPARATORS.sub(" ", str(unit or "")).strip().lower()
+    return ALIASES.get(cleaned, cleaned)
+
+
+def merge_line(seen: dict[tuple, object], line) -> tuple[object, list]:
+    """
+    Add a line to the lines of its recipe seen so far, keyed as the
+    unique_recipe_ingredient_line constraint keys them. A line repeating a
+    seen one is added into it, and the sum may repeat another. Returns the
+    line kept and the lines merged away.
+    """
+    merged: list = []
+    while (key := (line.ingredient_id, line.unit, line.quantity)) in seen:
+        kept = seen.pop(key)
+        kept.quantity += line.quantity
+        merged.append(line)
+        line = kept
+    seen[key] = line
+    return line, merged
+
+
+def canonicalize_units(apps, schema_editor) -> None:
+    """
+    Rewrite every recipe line's unit in canonical spelling ("grams" as "g").
+    A line that then repeats another line of its recipe is added into it and
+    deleted.
+    """
+    RecipeIngredient = apps.get_model("recipes", "RecipeIngredient")
+
+    changed: dict[int, object] = {}
+    duplicates: list[int] = []
+    current: int | None = None
+    seen: dict[tuple, object] = {}
+    for line in (
+        RecipeIngredient.objects.order_by("recipe_id", "pk")
+        .only("pk", "recipe_id", "ingredient_id", "unit", "quantity")
+        .iterator(chunk_size=BATCH_SIZE)
+    ):
+        if line.recipe_id != current:
+            current, seen = line.recipe_id, {}
+        unit: str = canonical_unit(line.unit)
+        if unit != line.unit:
+            line.unit = unit
+            changed[line.pk] = line
+        kept, merged = merge_line(seen, line)
+        for duplicate in merged:
+            changed.pop(duplicate.pk, None)
+            duplicates.append(duplicate.pk)
+        if merged:
+            changed[kept.pk] = kept
+
+    # duplicates go first, so no update collides with a line still present
+    for start in range(0, len(duplicates), BATCH_SIZE):
+        RecipeIngredient.objects.filter(
+            pk__in=duplicates[start : start + BATCH_SIZE]
+        ).delete()
+    RecipeIngredient.objects.bulk_update(
+        changed.values(), ["unit", "quantity"], batch_size=BATCH_SIZE
+    )
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("recipes", "0012_remove_ingredient_line_fields"),
+    ]
+
+    operations = [
+        migrations.RunPython(canonicalize_units, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,89 @@
+# Generated by Django 5.2.3 on 2026-10-18 20:24
+
+from decimal import ROUND_HALF_UP, Decimal
+
+from django.db import migrations, models
+from django.db.models.functions import Coalesce
+
+BATCH_SIZE = 500
+
+# recipes.costs as of this migration, frozen so later changes to the costing
+# do not change what it does
+COST_FIELDS: list[str] = ["cost", "cost_per_serving"]
+AMOUNT = models.DecimalField(max_digits=20, decimal_places=2)
+CENT = Decimal("0.01")
+
+
+def cost_summary(total: Decimal | None, servings: int) -> tuple[Decimal, Decimal]:
+    cost: Decimal = (total or Decimal(0)).quantize(CENT, rounding=ROUND_HALF_UP)
+    return cost, (cost / (servings or 1)).quantize(CENT, rounding=ROUND_HALF_UP)
+
+
+def backfill_costs(apps, schema_editor) -> None:
+    """
+    Fill in the new cost columns from each recipe's ingredient lines.
+    """
+    Recipe = apps.get_model("recipes", "Recipe")
+    rows = (
+        Recipe.objects.order_by("pk")
+        .annotate(
+            total=Coalesce(
+                models.Sum(
+                    models.F("ingredients__quantity")
+                    * models.F("ingredients__ingredient__cost_per_unit"),
+                    output_field=AMOUNT,
+                ),
+                models.Value(Decimal(0)),
+                output_field=AMOUNT,
+            )
+        )
+        .values_list("pk", "servings", "total")
+        .iterator(chunk_size=BATCH_SIZE)
+    )
+    batch: list = []
+    for pk, servings, total in rows:
+        cost, cost_per_serving = cost_summary(total, servings)
+        if cost:
+            batch.append(Recipe(pk=pk, cost=cost, cost_per_serving=cost_per_serving))
+        if len(batch) == BATCH_SIZE:
+            Recipe.objects.bulk_update(batch, COST_FIELDS)
+            batch = []
+    if batch:
+        Recipe.objects.bulk_update(batch, COST_FIELDS)
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("recipes", "0013_canonical_units"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="recipe",
+            name="cost",
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=20),
+        ),
+        migrations.AddField(
+            model_name="recipe",
+            name="cost_per_serving",
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=20),
+        ),
+        migrations.RunPython(backfill_costs, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name="recipe",
+            index=models.Index(fields=["cost", "id"], name="recipe_cost_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="recipe",
+            index=models.Index(
+                fields=["cost_per_serving", "id"], name="recipe_cost_serving_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="recipe",
+            index=models.Index(
+                fields=["cuisine", "dietary_restrictions", "cost_per_serving", "id"],
+                name="recipe_filter_cost_idx",
+            ),
+        ),
+    ]
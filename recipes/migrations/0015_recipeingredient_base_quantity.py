@@ -0,0 +1,172 @@
+# Generated by Django 5.2.3 on 2026-10-18 20:38
+
+from decimal import ROUND_HALF_UP, Decimal
+
+from django.db import migrations, models
+from django.db.models.functions import Coalesce
+
+BATCH_SIZE = 500
+
+# recipes.units and recipes.costs as of this migration, frozen so later
+# changes to the conversions do not change what it does. Units are already
+# canonical (0013_canonical_units).
+
+# canonical unit: (base unit, size in the base unit)
+UNITS: dict[str, tuple[str, Decimal]] = {
+    "mg": ("g", Decimal("0.001")),
+    "g": ("g", Decimal("1")),
+    "kg": ("g", Decimal("1000")),
+    "oz": ("g", Decimal("28.349523125")),
+    "lb": ("g", Decimal("453.59237")),
+    "ml": ("ml", Decimal("1")),
+    "cl": ("ml", Decimal("10")),
+    "dl": ("ml", Decimal("100")),
+    "l": ("ml", Decimal("1000")),
+    "tsp": ("ml", Decimal("4.92892159375")),
+    "tbsp": ("ml", Decimal("14.78676478125")),
+    "fl oz": ("ml", Decimal("29.5735295625")),
+    "cup": ("ml", Decimal("236.5882365")),
+    "pint": ("ml", Decimal("473.176473")),
+    "quart": ("ml", Decimal("946.352946")),
+    "gallon": ("ml", Decimal("3785.411784")),
+    "piece": ("piece", Decimal("1")),
+}
+DENSITIES: dict[str, Decimal] = {
+    "water": Decimal("1"),
+    "milk": Decimal("1.03"),
+    "buttermilk": Decimal("1.03"),
+    "yogurt": Decimal("1.03"),
+    "cream": Decimal("1.01"),
+    "butter": Decimal("0.911"),
+    "oil": Decimal("0.92"),
+    "olive oil": Decimal("0.91"),
+    "vegetable oil": Decimal("0.92"),
+    "honey": Decimal("1.42"),
+    "maple syrup": Decimal("1.32"),
+    "flour": Decimal("0.53"),
+    "all-purpose flour": Decimal("0.53"),
+    "sugar": Decimal("0.85"),
+    "brown sugar": Decimal("0.93"),
+    "powdered sugar": Decimal("0.56"),
+    "salt": Decimal("1.22"),
+    "rice": Decimal("0.85"),
+    "oats": Decimal("0.41"),
+    "cocoa powder": Decimal("0.42"),
+}
+PRICE_SIZES: dict[str, Decimal] = {"g": Decimal(1000), "ml": Decimal(1000)}
+COST_FIELDS: list[str] = ["cost", "cost_per_serving"]
+AMOUNT = models.DecimalField(max_digits=20, decimal_places=2)
+CENT = Decimal("0.01")
+
+
+def to_base(quantity: Decimal, unit: str, name: str) -> tuple[Decimal, str]:
+    if not unit:
+        return quantity, "piece"
+    if unit not in UNITS:
+        return quantity, unit
+    base, size = UNITS[unit]
+    amount: Decimal = quantity * size
+    if base == "ml" and (grams_per_ml := DENSITIES.get(name)) is not None:
+        return amount * grams_per_ml, "g"
+    return amount, base
+
+
+def write_costs(Recipe, line_cost) -> None:
+    """
+    Recompute every recipe's cost columns from an expression for the cost of
+    one of its lines.
+    """
+    rows = (
+        Recipe.objects.order_by("pk")
+        .annotate(
+            total=Coalesce(
+                models.Sum(line_cost, output_field=AMOUNT),
+                models.Value(Decimal(0)),
+                output_field=AMOUNT,
+            )
+        )
+        .values_list("pk", "servings", "total")
+        .iterator(chunk_size=BATCH_SIZE)
+    )
+    batch: list = []
+    for pk, servings, total in rows:
+        cost: Decimal = (total or Decimal(0)).quantize(CENT, rounding=ROUND_HALF_UP)
+        cost_per_serving: Decimal = (cost / (servings or 1)).quantize(
+            CENT, rounding=ROUND_HALF_UP
+        )
+        batch.append(Recipe(pk=pk, cost=cost, cost_per_serving=cost_per_serving))
+        if len(batch) == BATCH_SIZE:
+            Recipe.objects.bulk_update(batch, COST_FIELDS)
+            batch = []
+    if batch:
+        Recipe.objects.bulk_update(batch, COST_FIELDS)
+
+
+def measure_lines(apps, schema_editor) -> None:
+    """
+    Fill in the base quantity of every line and reprice the recipes from it.
+    """
+    RecipeIngredient = apps.get_model("recipes", "RecipeIngredient")
+    batch: list = []
+    for line in (
+        RecipeIngredient.objects.select_related("ingredient")
+        .order_by("pk")
+        .iterator(chunk_size=BATCH_SIZE)
+    ):
+        line.base_quantity, line.base_unit = to_base(
+            line.quantity, line.unit, line.ingredient.name
+        )
+        batch.append(line)
+        if len(batch) == BATCH_SIZE:
+            RecipeIngredient.objects.bulk_update(batch, ["base_quantity", "base_unit"])
+            batch = []
+    if batch:
+        RecipeIngredient.objects.bulk_update(batch, ["base_quantity", "base_unit"])
+
+    write_costs(
+        apps.get_model("recipes", "Recipe"),
+        models.F("ingredients__base_quantity")
+        * models.F("ingredients__ingredient__cost_per_unit")
+        # SQLite divides whole amounts, stored as integers, without a remainder
+        * models.Case(
+            *[
+                models.When(ingredients__base_unit=unit, then=models.Value(1 / size))
+                for unit, size in PRICE_SIZES.items()
+            ],
+            default=models.Value(Decimal(1)),
+            output_field=AMOUNT,
+        ),
+    )
+
+
+def price_stored_quantities(apps, schema_editor) -> None:
+    """
+    Reprice the recipes as 0014_recipe_cost did, per stored quantity.
+    """
+    write_costs(
+        apps.get_model("recipes", "Recipe"),
+        models.F("ingredients__quantity")
+        * models.F("ingredients__ingredient__cost_per_unit"),
+    )
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("recipes", "0014_recipe_cost"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="recipeingredient",
+            name="base_quantity",
+            field=models.DecimalField(
+                decimal_places=4, default=0, editable=False, max_digits=20
+            ),
+        ),
+        migrations.AddField(
+            model_name="recipeingredient",
+            name="base_unit",
+            field=models.CharField(default="", editable=False, max_length=50),
+        ),
+        migrations.RunPython(measure_lines, price_stored_quantities),
+    ]
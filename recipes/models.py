@@ -1,15 +1,17 @@
 from django.db import models
 from django.db.models import JSONField
+from .units import to_base
 
 
 class Ingredient(models.Model):
     """
-    A model representing an ingredient, including its name, quantity, unit, allergens, and cost per unit.
+    A canonical ingredient, shared by every recipe that uses it: its name,
+    allergens, and cost per unit. How much a recipe uses is a RecipeIngredient.
     """
 
-    name: str = models.CharField(max_length=100)
-    quantity = models.DecimalField(max_digits=10, decimal_places=2)
-    unit: str = models.CharField(max_length=50, blank=True, null=True)
+    # written normalized (lowercase, stripped); the unique index is the lookup
+    # index and also stops concurrent duplicates
+    name: str = models.CharField(max_length=100, unique=True)
     allergens: str = models.CharField(max_length=200, blank=True, null=True)
     cost_per_unit = models.DecimalField(
         blank=True, null=True, decimal_places=2, default=0.0, max_digits=1000
@@ -58,36 +60,233 @@ class Recipe(models.Model):
 
     title: str = models.CharField(max_length=100)
     description: str = models.TextField()
-    ingredients = models.ManyToManyField(Ingredient)
     instructions: str = models.TextField(blank=True, null=True)
     dietary_restrictions: str = models.CharField(
         choices=dietary_choices, max_length=100, default="none"
     )
-    cuisine: str = models.CharField(choices=cuisine_choices, max_length=30, default="none")
+    cuisine: str = models.CharField(
+        choices=cuisine_choices, max_length=30, default="none"
+    )
     difficulty: str = models.CharField(
         choices=difficulty_choices, max_length=10, default="easy"
     )
-    prep_time: int = models.PositiveIntegerField(help_text="Preparation time in minutes")
+    prep_time: int = models.PositiveIntegerField(
+        help_text="Preparation time in minutes"
+    )
     cook_time: int = models.PositiveIntegerField(help_text="Cooking time in minutes")
     servings: int = models.PositiveIntegerField(default=1)
     nutritional_info: JSONField = models.JSONField(blank=True, null=True)
+    # summary of nutritional_info, filled in on every write by
+    # nutrition.apply_nutrition_summary; amounts in kcal, grams and milligrams
+    calories = models.DecimalField(
+        max_digits=10, decimal_places=2, blank=True, null=True
+    )
+    protein = models.DecimalField(
+        max_digits=10, decimal_places=2, blank=True, null=True
+    )
+    fat = models.DecimalField(max_digits=10, decimal_places=2, blank=True, null=True)
+    carbs = models.DecimalField(max_digits=10, decimal_places=2, blank=True, null=True)
+    fiber = models.DecimalField(max_digits=10, decimal_places=2, blank=True, null=True)
+    sodium = models.DecimalField(max_digits=10, decimal_places=2, blank=True, null=True)
+    calories_per_serving = models.DecimalField(
+        max_digits=10, decimal_places=2, blank=True, null=True
+    )
+    protein_per_serving = models.DecimalField(
+        max_digits=10, decimal_places=2, blank=True, null=True
+    )
+    fat_per_serving = models.DecimalField(
+        max_digits=10, decimal_places=2, blank=True, null=True
+    )
+    carbs_per_serving = models.DecimalField(
+        max_digits=10, decimal_places=2, blank=True, null=True
+    )
+    fiber_per_serving = models.DecimalField(
+        max_digits=10, decimal_places=2, blank=True, null=True
+    )
+    sodium_per_serving = models.DecimalField(
+        max_digits=10, decimal_places=2, blank=True, null=True
+    )
+    # sum of costs.line_cost over the recipe's lines, kept up to date
+    # by costs.refresh_costs whenever a line or an ingredient's cost changes
+    cost = models.DecimalField(max_digits=20, decimal_places=2, default=0)
+    cost_per_serving = models.DecimalField(max_digits=20, decimal_places=2, default=0)
     created_at = models.DateTimeField(auto_now_add=True)
+    total_time: int = models.GeneratedField(
+        expression=models.F("prep_time") + models.F("cook_time"),
+        output_field=models.PositiveIntegerField(),
+        db_persist=True,
+    )
+
+    class Meta:
+        indexes = [
+            # backs the keyset pagination of recipe_list
+            models.Index(fields=["-created_at", "-id"], name="recipe_created_id_idx"),
+            # recipe_list filters, ending in the pagination key so a filtered
+            # page is still a single index range scan
+            models.Index(
+                fields=[
+                    "cuisine",
+                    "dietary_restrictions",
+                    "difficulty",
+                    "-created_at",
+                    "-id",
+                ],
+                name="recipe_filter_idx",
+            ),
+            models.Index(
+                fields=["dietary_restrictions", "-created_at", "-id"],
+                name="recipe_diet_idx",
+            ),
+            models.Index(fields=["total_time"], name="recipe_total_time_idx"),
+            # per-serving nutrition range filters
+            models.Index(fields=["calories_per_serving"], name="recipe_calories_idx"),
+            models.Index(fields=["protein_per_serving"], name="recipe_protein_idx"),
+            models.Index(fields=["fat_per_serving"], name="recipe_fat_idx"),
+            models.Index(fields=["carbs_per_serving"], name="recipe_carbs_idx"),
+            models.Index(fields=["fiber_per_serving"], name="recipe_fiber_idx"),
+            models.Index(fields=["sodium_per_serving"], name="recipe_sodium_idx"),
+            # cost sort orders, ending in the pagination tie-breaker, and cost
+            # range filters; "cheapest vegan indian" is one range scan
+            models.Index(fields=["cost", "id"], name="recipe_cost_idx"),
+            models.Index(
+                fields=["cost_per_serving", "id"], name="recipe_cost_serving_idx"
+            ),
+            models.Index(
+                fields=["cuisine", "dietary_restrictions", "cost_per_serving", "id"],
+                name="recipe_filter_cost_idx",
+            ),
+        ]
 
     def __str__(self) -> str:
         return self.title
 
-    def measure_ingredients(self, new_servings) -> None:
+    def save(self, *args, **kwargs) -> None:
+        from .nutrition import SUMMARY_FIELDS, apply_nutrition_summary
+
+        apply_nutrition_summary(self)
+        update_fields = kwargs.get("update_fields")
+        if update_fields is not None and {"nutritional_info", "servings"} & set(
+            update_fields
+        ):
+            kwargs["update_fields"] = {*update_fields, *SUMMARY_FIELDS}
+        super().save(*args, **kwargs)
+
+    def measure_ingredients(self, new_servings: int) -> list[dict]:
         """
         Measure the ingredients for a new number of servings.
+        Returns the scaled lines; neither the recipe nor its ingredients are changed.
+        """
+        from .scaling import scale_ingredients
+
+        return scale_ingredients(
+            self.ingredients.all(), new_servings, self.servings or 1
+        )
+
+
+class RecipeIngredientManager(models.Manager):
+    def get_queryset(self) -> models.QuerySet:
+        # a line is always read with its ingredient's name, allergens and cost
+        return super().get_queryset().select_related("ingredient")
+
+
+class RecipeIngredient(models.Model):
+    """
+    One ingredient line of a recipe: the quantity and unit of a canonical
+    Ingredient. recipe.ingredients lists a recipe's lines in order.
+    """
+
+    recipe = models.ForeignKey(
+        Recipe, on_delete=models.CASCADE, related_name="ingredients"
+    )
+    ingredient = models.ForeignKey(
+        Ingredient, on_delete=models.CASCADE, related_name="recipe_lines"
+    )
+    quantity = models.DecimalField(max_digits=10, decimal_places=2)
+    # written normalized, "" for no unit
+    unit: str = models.CharField(max_length=50, blank=True, default="")
+    # quantity in grams, millilitres or pieces (units.to_base), which the
+    # ingredient's cost_per_unit is priced in; filled in on every write
+    base_quantity = models.DecimalField(
+        max_digits=20, decimal_places=4, default=0, editable=False
+    )
+    base_unit: str = models.CharField(max_length=50, default="", editable=False)
+
+    objects = RecipeIngredientManager()
+
+    class Meta:
+        ordering = ["id"]
+        constraints = [
+            models.UniqueConstraint(
+                fields=["recipe", "ingredient", "unit", "quantity"],
+                name="unique_recipe_ingredient_line",
+            )
+        ]
+
+    def __str__(self) -> str:
+        return f"{self.quantity} {self.unit} {self.name}".replace("  ", " ")
+
+    def save(self, *args, **kwargs) -> None:
+        self.measure(self.ingredient.name)
+        update_fields = kwargs.get("update_fields")
+        if update_fields is not None and {"quantity", "unit", "ingredient"} & set(
+            update_fields
+        ):
+            kwargs["update_fields"] = {*update_fields, "base_quantity", "base_unit"}
+        super().save(*args, **kwargs)
+
+    def measure(self, name: str) -> "RecipeIngredient":
+        """
+        Fill in base_quantity and base_unit from the quantity and unit of a
+        line of the named ingredient. Returns the line.
         """
-        factor: float = new_servings / self.servings
-        for ingredient in self.ingredients.all():
-            try:
-                quantity = ingredient.quantity * factor
-                ingredient.quantity = round(quantity, 2)
+        self.base_quantity, self.base_unit = to_base(self.quantity, self.unit, name)
+        return self
+
+    @property
+    def name(self) -> str:
+        return self.ingredient.name
+
+    @property
+    def allergens(self) -> str | None:
+        return self.ingredient.allergens
+
+    @property
+    def cost_per_unit(self):
+        return self.ingredient.cost_per_unit
 
-            except ValueError:
-                continue
 
-        self.servings = new_servings
-        self.save()
+class GenerationJob(models.Model):
+    """
+    A queued recipe generation request, processed by the process_generation_jobs command.
+    """
+
+    PENDING: str = "pending"
+    RUNNING: str = "running"
+    SUCCEEDED: str = "succeeded"
+    FAILED: str = "failed"
+
+    status_choices: list[tuple[str, str]] = [
+        (PENDING, "Pending"),
+        (RUNNING, "Running"),
+        (SUCCEEDED, "Succeeded"),
+        (FAILED, "Failed"),
+    ]
+
+    status: str = models.CharField(
+        choices=status_choices, max_length=10, default=PENDING
+    )
+    payload: JSONField = models.JSONField()
+    recipe = models.ForeignKey(
+        Recipe, blank=True, null=True, on_delete=models.SET_NULL, related_name="+"
+    )
+    error: str = models.TextField(blank=True, null=True)
+    attempts: int = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(blank=True, null=True)
+    finished_at = models.DateTimeField(blank=True, null=True)
+
+    class Meta:
+        indexes = [models.Index(fields=["status", "created_at"])]
+
+    def __str__(self) -> str:
+        return f"Generation job {self.pk} ({self.status})"
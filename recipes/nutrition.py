@@ -0,0 +1,133 @@
+import re
+from decimal import ROUND_HALF_UP, Decimal, InvalidOperation
+from typing import Any
+from django.conf import settings
+
+# summary column -> Nutritionix food field it is summed from
+NUTRIENTS: dict[str, str] = {
+    "calories": "nf_calories",
+    "protein": "nf_protein",
+    "fat": "nf_total_fat",
+    "carbs": "nf_total_carbohydrate",
+    "fiber": "nf_dietary_fiber",
+    "sodium": "nf_sodium",
+}
+
+# every summary column on Recipe: the totals plus their per-serving values
+SUMMARY_FIELDS: list[str] = [
+    field for name in NUTRIENTS for field in (name, f"{name}_per_serving")
+]
+
+# per-food fields kept when the raw Nutritionix response is compacted; photos,
+# tags, alternative measures and the full nutrient list are dropped
+FOOD_FIELDS: frozenset[str] = frozenset(
+    {"food_name", "serving_qty", "serving_unit", "serving_weight_grams"}
+)
+
+CENT = Decimal("0.01")
+
+# a leading amount in a flat nutrition value such as "18g"
+AMOUNT_PATTERN = re.compile(r"^\s*(\d+(?:\.\d+)?)")
+
+
+def to_amount(value: Any) -> Decimal | None:
+    """
+    Read a nutrient amount from a number or a string such as "18g".
+    """
+    if value is None or isinstance(value, bool):
+        return None
+    if isinstance(value, str):
+        match = AMOUNT_PATTERN.match(value)
+        if not match:
+            return None
+        value = match.group(1)
+    try:
+        return Decimal(str(value))
+    except InvalidOperation:
+        return None
+
+
+def compact_food(food: Any) -> Any:
+    """
+    Keep only the serving and nf_* nutrient fields of one Nutritionix food.
+    """
+    if not isinstance(food, dict):
+        return food
+    return {
+        key: value
+        for key, value in food.items()
+        if key in FOOD_FIELDS or key.startswith("nf_")
+    }
+
+
+def compact_foods(foods: list) -> list:
+    """
+    Compact a Nutritionix food list, unless RECIPE_STORE_FULL_NUTRITION asks
+    for the raw upstream response to be kept.
+    """
+    if settings.RECIPE_STORE_FULL_NUTRITION:
+        return foods
+    return [compact_food(food) for food in foods]
+
+
+def compact_nutrition(info: Any) -> Any:
+    """
+    Strip a nutrition blob down to the fields the API serves.
+    """
+    if not isinstance(info, dict) or not isinstance(info.get("foods"), list):
+        return info
+    return {**info, "foods": compact_foods(info["foods"])}
+
+
+def nutrition_totals(info: Any) -> dict[str, Decimal | None]:
+    """
+    Total each summary nutrient over a Nutritionix food list, or read it from
+    a flat blob such as {"calories": 350, "protein": "10g"}.
+    """
+    totals: dict[str, Decimal | None] = dict.fromkeys(NUTRIENTS)
+    if not isinstance(info, dict):
+        return totals
+
+    foods: Any = info.get("foods")
+    if isinstance(foods, list):
+        for name, source in NUTRIENTS.items():
+            amounts: list[Decimal] = [
+                amount
+                for food in foods
+                if isinstance(food, dict)
+                and (amount := to_amount(food.get(source))) is not None
+            ]
+            if amounts:
+                totals[name] = sum(amounts, Decimal(0))
+    else:
+        for name in NUTRIENTS:
+            totals[name] = to_amount(info.get(name))
+    return totals
+
+
+def nutrition_summary(info: Any, servings: int) -> dict[str, Decimal | None]:
+    """
+    Build the values of the Recipe nutrition summary columns.
+    """
+    summary: dict[str, Decimal | None] = {}
+    for name, total in nutrition_totals(info).items():
+        summary[name] = None if total is None else total.quantize(CENT, ROUND_HALF_UP)
+        summary[f"{name}_per_serving"] = (
+            None
+            if total is None or not servings
+            else (total / servings).quantize(CENT, ROUND_HALF_UP)
+        )
+    return summary
+
+
+def apply_nutrition_summary(recipe: Any) -> None:
+    """
+    Compact a recipe's nutrition blob and fill in its summary columns.
+
+    Called on every write path: Recipe.save and bulk_create_recipes.
+    """
+    recipe.nutritional_info = compact_nutrition(recipe.nutritional_info)
+    for field, value in nutrition_summary(
+        recipe.nutritional_info, recipe.servings
+    ).items():
+        setattr(recipe, field, value)
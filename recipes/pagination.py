@@ -0,0 +1,128 @@
+import json
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from typing import Any
+from django.conf import settings
+from django.db.models import Q, QuerySet
+from rest_framework.exceptions import NotFound, ValidationError
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+
+class RecipeCursorPagination(BasePagination):
+    """
+    Keyset pagination over (ordering field, id).
+
+    The cursor carries the sort key of the last row on the page, so fetching
+    the next page is an index range scan that costs the same on page 1 and
+    page 10,000, unlike OFFSET pagination. ?ordering= picks one of orderings,
+    each backed by an index ending in id.
+    """
+
+    cursor_query_param: str = "cursor"
+    page_size_query_param: str = "page_size"
+    ordering_query_param: str = "ordering"
+    ordering: str = "-created_at"
+    orderings: tuple[str, ...] = (
+        "-created_at",
+        "cost",
+        "-cost",
+        "cost_per_serving",
+        "-cost_per_serving",
+    )
+    invalid_cursor_message: str = "Invalid cursor"
+
+    def paginate_queryset(self, queryset: QuerySet, request, view=None) -> list:
+        self.request = request
+        self.page_size: int = self.get_page_size(request)
+        ordering: str = self.get_ordering(request)
+        self.field: str = ordering.lstrip("-")
+        self.descending: bool = ordering.startswith("-")
+
+        order: list[str] = [ordering, "-pk" if self.descending else "pk"]
+        queryset = queryset.order_by(*order)
+
+        cursor: tuple[Any, int] | None = self.decode_cursor(request, queryset)
+        if cursor is not None:
+            value, pk = cursor
+            direction: str = "lt" if self.descending else "gt"
+            queryset = queryset.filter(
+                Q(**{f"{self.field}__{direction}": value})
+                | Q(**{self.field: value, f"pk__{direction}": pk})
+            )
+
+        # one extra row tells us whether there is a next page without a COUNT
+        rows: list = list(queryset[: self.page_size + 1])
+        self.has_next: bool = len(rows) > self.page_size
+        self.page: list = rows[: self.page_size]
+        return self.page
+
+    def get_paginated_response(self, data) -> Response:
+        return Response({"next": self.get_next_link(), "results": data})
+
+    def get_paginated_response_schema(self, schema: dict) -> dict:
+        return {
+            "type": "object",
+            "required": ["results"],
+            "properties": {
+                "next": {"type": "string", "nullable": True, "format": "uri"},
+                "results": schema,
+            },
+        }
+
+    def get_ordering(self, request) -> str:
+        """
+        The requested ordering, raising ValidationError for one without an index.
+        """
+        requested: str = request.query_params.get(self.ordering_query_param, "")
+        if not requested:
+            return self.ordering
+        if requested not in self.orderings:
+            raise ValidationError(
+                {
+                    self.ordering_query_param: [
+                        f"Use one of: {', '.join(self.orderings)}."
+                    ]
+                }
+            )
+        return requested
+
+    def get_page_size(self, request) -> int:
+        try:
+            requested: int = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return settings.RECIPE_PAGE_SIZE
+        return max(1, min(requested, settings.RECIPE_MAX_PAGE_SIZE))
+
+    def get_next_link(self) -> str | None:
+        if not self.has_next:
+            return None
+        last = self.page[-1]
+        # pages are model instances or .values() rows
+        if isinstance(last, dict):
+            value, pk = last[self.field], last["id"]
+        else:
+            value, pk = getattr(last, self.field), last.pk
+        return replace_query_param(
+            self.request.build_absolute_uri(),
+            self.cursor_query_param,
+            self.encode_cursor(value, pk),
+        )
+
+    def encode_cursor(self, value: Any, pk: int) -> str:
+        # full isoformat: DjangoJSONEncoder would truncate datetimes to milliseconds
+        # and make rows that share a millisecond skip or repeat across pages
+        key: str = value.isoformat() if hasattr(value, "isoformat") else str(value)
+        raw: str = json.dumps([key, pk])
+        return urlsafe_b64encode(raw.encode("utf-8")).decode("ascii")
+
+    def decode_cursor(self, request, queryset: QuerySet) -> tuple[Any, int] | None:
+        encoded: str | None = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            value, pk = json.loads(urlsafe_b64decode(encoded.encode("ascii")))
+            field = queryset.model._meta.get_field(self.field)
+            return field.to_python(value), int(pk)
+        except Exception:
+            raise NotFound(self.invalid_cursor_message)
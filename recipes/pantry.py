@@ -0,0 +1,87 @@
+from array import array
+from bisect import bisect_left, insort
+from collections import Counter
+from typing import Any, Iterable
+from django.db import transaction
+from .cache import normalize_ingredient_name
+from .indexing import RecipeIndex
+from .models import RecipeIngredient
+
+
+class PantryIndex(RecipeIndex):
+    """
+    In-memory inverted index from normalized ingredient name to recipe ids.
+
+    Each posting list is a sorted array of recipe ids, so the whole catalog
+    costs a few bytes per recipe ingredient and a pantry lookup only touches the
+    recipes that share at least one ingredient with the pantry. The index is
+    kept current across processes through the RecipeIndex change log.
+    """
+
+    namespace = "pantry"
+
+    def _reset(self) -> None:
+        self.postings: dict[str, array] = {}
+        self.recipe_names: dict[int, tuple[str, ...]] = {}
+
+    def _load(self, recipe_ids: Iterable[int] | None = None) -> dict[int, set[str]]:
+        """
+        Read the ingredient names of the given recipes, or of every recipe.
+        """
+        rows = RecipeIngredient.objects.order_by()
+        if recipe_ids is not None:
+            rows = rows.filter(recipe_id__in=list(recipe_ids))
+        names: dict[int, set[str]] = {}
+        for recipe_id, name in rows.values_list("recipe_id", "ingredient__name"):
+            names.setdefault(recipe_id, set()).add(normalize_ingredient_name(name))
+        return names
+
+    def _unlink(self, recipe_id: int) -> None:
+        for name in self.recipe_names.pop(recipe_id, ()):
+            posting: array = self.postings[name]
+            del posting[bisect_left(posting, recipe_id)]
+            if not posting:
+                del self.postings[name]
+
+    def _link(self, recipe_id: int, names: set[str]) -> None:
+        self.recipe_names[recipe_id] = tuple(sorted(names))
+        for name in names:
+            insort(self.postings.setdefault(name, array("q")), recipe_id)
+
+    def match(self, pantry: Iterable[str]) -> list[dict[str, Any]]:
+        """
+        Rank recipes sharing at least one ingredient with the pantry by coverage.
+
+        Returns dicts with the recipe id, the fraction of its ingredients the
+        pantry covers and the ingredient names it is missing, best covered
+        first, then fewest missing, then newest.
+        """
+        self.sync()
+        names: set[str] = {normalize_ingredient_name(name) for name in pantry}
+        names.discard("")
+        with self.lock:
+            hits: Counter = Counter()
+            for name in names:
+                hits.update(self.postings.get(name, ()))
+            matches: list[dict[str, Any]] = []
+            for recipe_id, covered in hits.items():
+                recipe_names: tuple[str, ...] = self.recipe_names[recipe_id]
+                matches.append(
+                    {
+                        "recipe_id": recipe_id,
+                        "coverage": covered / len(recipe_names),
+                        "missing": [name for name in recipe_names if name not in names],
+                    }
+                )
+        matches.sort(key=lambda m: (-m["coverage"], len(m["missing"]), -m["recipe_id"]))
+        return matches
+
+
+pantry_index = PantryIndex()
+
+
+def update_pantry_index(sender, recipe_ids: list[int], **kwargs) -> None:
+    """
+    recipes_changed receiver: refresh the index once the write has committed.
+    """
+    transaction.on_commit(lambda: pantry_index.record_change(recipe_ids))
@@ -0,0 +1,153 @@
+from decimal import Decimal
+from functools import lru_cache
+from typing import Any, Callable
+from django.db.models import QuerySet
+from rest_framework import serializers
+from rest_framework.settings import api_settings
+from .metrics import timed
+from .models import RecipeIngredient
+from .serializers import RecipeIngredientSerializer, RecipeSerializer
+
+# serializer fields whose to_representation returns the database value unchanged
+# for the types .values() produces (ModelField only wraps total_time, an integer)
+PASSTHROUGH_FIELDS: tuple[type, ...] = (
+    serializers.CharField,
+    serializers.ChoiceField,
+    serializers.IntegerField,
+    serializers.JSONField,
+    serializers.BooleanField,
+    serializers.ModelField,
+)
+
+Plan = list[tuple[str, Callable[[Any], Any] | None]]
+
+# RecipeIngredientSerializer fields read from the line's canonical ingredient
+INGREDIENT_COLUMNS: dict[str, str] = {
+    "id": "ingredient_id",
+    "name": "ingredient__name",
+    "allergens": "ingredient__allergens",
+    "cost_per_unit": "ingredient__cost_per_unit",
+}
+
+
+def _decimal_converter(field: serializers.DecimalField) -> Callable[[Any], Any]:
+    """
+    DecimalField.to_representation, short-circuited for database values that
+    already carry the field's decimal places and only need formatting.
+    """
+    coerce_to_string: bool = getattr(
+        field, "coerce_to_string", api_settings.COERCE_DECIMAL_TO_STRING
+    )
+    if not coerce_to_string or field.localize or field.normalize_output:
+        return field.to_representation
+    exponent: int = -field.decimal_places
+    max_digits: int = field.max_digits or 0
+
+    def convert(value: Any) -> Any:
+        if isinstance(value, Decimal):
+            parts = value.as_tuple()
+            if parts.exponent == exponent and len(parts.digits) <= max_digits:
+                return f"{value:f}"
+        return field.to_representation(value)
+
+    return convert
+
+
+def _converter(field: serializers.Field) -> Callable[[Any], Any] | None:
+    if isinstance(field, PASSTHROUGH_FIELDS):
+        return None
+    if isinstance(field, serializers.DecimalField) and field.decimal_places is not None:
+        return _decimal_converter(field)
+    return field.to_representation
+
+
+def _plan(serializer: serializers.Serializer) -> Plan:
+    """
+    List (field name, converter) pairs in the serializer's output order; the
+    converter is None when the value can be copied as is.
+    """
+    return [(name, _converter(field)) for name, field in serializer.fields.items()]
+
+
+@lru_cache(maxsize=None)
+def recipe_plan() -> Plan:
+    return _plan(RecipeSerializer())
+
+
+@lru_cache(maxsize=None)
+def ingredient_plan() -> Plan:
+    return _plan(RecipeIngredientSerializer())
+
+
+def recipe_columns() -> list[str]:
+    """
+    The Recipe columns to select with .values() for serialize_recipe_rows.
+    """
+    return [name for name, _ in recipe_plan() if name != "ingredients"]
+
+
+def _represent(
+    row: dict[str, Any], plan: Plan, columns: dict[str, str] | None = None
+) -> dict[str, Any]:
+    out: dict[str, Any] = {}
+    for name, convert in plan:
+        value = row[columns.get(name, name) if columns else name]
+        out[name] = value if convert is None or value is None else convert(value)
+    return out
+
+
+def serialize_recipe_rows(
+    rows: list[dict[str, Any]], using: str | None = None
+) -> list[dict[str, Any]]:
+    """
+    Build RecipeSerializer output from .values(*recipe_columns()) rows,
+    reading their ingredients from the database alias using, if given.
+
+    Skips model instantiation and per-row serializer work: the ingredients of
+    every row come from one grouped query shaped like the ingredients
+    prefetch, and each value goes through the same field conversion
+    RecipeSerializer would apply, so the output is identical.
+    """
+    if not rows:
+        return []
+    with timed("serialize"):
+        return _serialize_recipe_rows(rows, using)
+
+
+def _serialize_recipe_rows(
+    rows: list[dict[str, Any]], using: str | None
+) -> list[dict[str, Any]]:
+    ingredient_fields: Plan = ingredient_plan()
+    ingredients: dict[int, list[dict[str, Any]]] = {row["id"]: [] for row in rows}
+    for line in (
+        RecipeIngredient.objects.using(using)
+        .filter(recipe__in=list(ingredients))
+        .values(
+            "recipe",
+            *(INGREDIENT_COLUMNS.get(name, name) for name, _ in ingredient_fields),
+        )
+    ):
+        ingredients[line["recipe"]].append(
+            _represent(line, ingredient_fields, INGREDIENT_COLUMNS)
+        )
+
+    results: list[dict[str, Any]] = []
+    for row in rows:
+        out: dict[str, Any] = {}
+        for name, convert in recipe_plan():
+            if name == "ingredients":
+                out[name] = ingredients[row["id"]]
+                continue
+            value = row[name]
+            out[name] = value if convert is None or value is None else convert(value)
+        results.append(out)
+    return results
+
+
+def read_recipes(queryset: QuerySet) -> list[dict[str, Any]]:
+    """
+    Serialize a Recipe queryset, in its order, through serialize_recipe_rows.
+    """
+    return serialize_recipe_rows(
+        list(queryset.values(*recipe_columns())), using=queryset.db
+    )
@@ -0,0 +1,90 @@
+import json
+import re
+from django.core.serializers.json import DjangoJSONEncoder
+from rest_framework.renderers import BaseRenderer, JSONRenderer
+from .metrics import timed
+
+try:
+    import orjson
+except ImportError:  # optional speedup; FastJSONRenderer falls back to json
+    orjson = None
+
+# orjson spells floats that Python writes in exponent notation differently
+# (1e16 vs 1e+16, 0.00001 vs 1e-05); output that may contain one is re-rendered
+ORJSON_EXPONENT = re.compile(rb"[0-9]e")
+ORJSON_SMALL_FLOAT = b"0.0000"
+
+
+def sse_event(event: str, data) -> str:
+    """
+    Format one Server-Sent Event with a JSON payload.
+    """
+    return f"event: {event}\ndata: {json.dumps(data, cls=DjangoJSONEncoder)}\n\n"
+
+
+class EventStreamRenderer(BaseRenderer):
+    """
+    Lets clients negotiate text/event-stream. Streamed responses skip rendering,
+    so this only renders plain responses such as validation errors, as an
+    "error" event.
+    """
+
+    media_type = "text/event-stream"
+    format = "sse"
+    charset = "utf-8"
+
+    def render(self, data, accepted_media_type=None, renderer_context=None) -> bytes:
+        return sse_event("error", data).encode(self.charset)
+
+
+class FastJSONRenderer(JSONRenderer):
+    """
+    JSONRenderer that encodes with orjson when it is installed.
+
+    The output is byte-for-byte what JSONRenderer would produce: datetimes,
+    decimals and other non-JSON types still go through the DRF encoder, and
+    anything orjson cannot match exactly (indented output, exponent floats,
+    non-string keys, huge integers) is rendered by JSONRenderer instead.
+    """
+
+    def render(self, data, accepted_media_type=None, renderer_context=None) -> bytes:
+        with timed("render"):
+            return self._render(data, accepted_media_type, renderer_context)
+
+    def _render(self, data, accepted_media_type, renderer_context) -> bytes:
+        if (
+            orjson is None
+            or data is None
+            or self.get_indent(accepted_media_type, renderer_context or {})
+        ):
+            return super().render(data, accepted_media_type, renderer_context)
+        try:
+            ret: bytes = orjson.dumps(
+                data,
+                default=self.encoder_class().default,
+                # leave datetimes and dataclasses to the DRF encoder
+                option=orjson.OPT_PASSTHROUGH_DATETIME
+                | orjson.OPT_PASSTHROUGH_DATACLASS,
+            )
+        except TypeError:
+            return super().render(data, accepted_media_type, renderer_context)
+        if ORJSON_SMALL_FLOAT in ret or ORJSON_EXPONENT.search(ret):
+            return super().render(data, accepted_media_type, renderer_context)
+        # JSONRenderer escapes these two for JavaScript compatibility
+        return ret.replace(b"\xe2\x80\xa8", b"\\u2028").replace(
+            b"\xe2\x80\xa9", b"\\u2029"
+        )
+
+
+class NDJSONRenderer(FastJSONRenderer):
+    """
+    Lets clients negotiate application/x-ndjson. Streamed responses skip
+    rendering, so this only renders plain responses such as validation
+    errors, as a single JSON line.
+    """
+
+    media_type = "application/x-ndjson"
+    format = "ndjson"
+
+    def render(self, data, accepted_media_type=None, renderer_context=None) -> bytes:
+        return super().render(data, None, renderer_context) + b"\n"
@@ -0,0 +1,147 @@
+import random
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Iterator
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+# cookie marking a client that wrote recently, so its reads stay on the primary
+PIN_COOKIE = "recipes_primary"
+
+
+class RoutingState:
+    """
+    Database routing for one request: the replica its reads use, or None
+    once they must go to the primary.
+    """
+
+    def __init__(self, pinned: bool) -> None:
+        replicas: list[str] = settings.RECIPE_READ_REPLICAS
+        # one replica per request, so all of its reads see the same snapshot
+        self.replica: str | None = (
+            None if pinned or not replicas else random.choice(replicas)
+        )
+        self.wrote: bool = False
+
+
+current_routing: ContextVar[RoutingState | None] = ContextVar(
+    "current_routing", default=None
+)
+
+
+def read_alias() -> str:
+    """
+    The database a read in the current context should use.
+
+    Only requests passing through ReplicaRoutingMiddleware read from a
+    replica; management commands, job workers and reads inside a primary
+    transaction use the primary.
+    """
+    state: RoutingState | None = current_routing.get()
+    if state is None or state.replica is None:
+        return DEFAULT_DB_ALIAS
+    if connections[DEFAULT_DB_ALIAS].in_atomic_block:
+        return DEFAULT_DB_ALIAS
+    return state.replica
+
+
+def pin_primary() -> None:
+    """
+    Treat the current request as a write: its remaining reads use the primary
+    and ReplicaRoutingMiddleware pins the client to it. For views whose writes
+    the router cannot see while the middleware decides, such as saves inside
+    a streamed response or on worker threads and processes.
+    """
+    state: RoutingState | None = current_routing.get()
+    if state is not None:
+        state.replica = None
+        state.wrote = True
+
+
+@contextmanager
+def use_primary() -> Iterator[None]:
+    """
+    Send the reads in this block to the primary, for data that must be
+    current, such as the in-memory indexes and freshly invalidated responses.
+    """
+    token = current_routing.set(None)
+    try:
+        yield
+    finally:
+        current_routing.reset(token)
+
+
+class ReplicaRouter:
+    """
+    Send writes to the primary ("default") and request reads to the read
+    replicas in RECIPE_READ_REPLICAS. After a write, the rest of the request
+    and, through ReplicaRoutingMiddleware, the client's requests for the next
+    RECIPE_REPLICA_LAG seconds read from the primary, so they see their writes.
+    """
+
+    def db_for_read(self, model, **hints) -> str:
+        return read_alias()
+
+    def db_for_write(self, model, **hints) -> str:
+        pin_primary()
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints) -> bool:
+        # every alias holds the same data
+        return True
+
+    def allow_migrate(self, db: str, app_label: str, **hints) -> bool:
+        # replicas get their schema by replication
+        return db not in settings.RECIPE_READ_REPLICAS
+
+
+class ReplicaRoutingMiddleware:
+    """
+    Route each request's reads to a replica unless the client wrote within
+    the last RECIPE_REPLICA_LAG seconds, and mark clients that write.
+    Does nothing while no replicas are configured.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response) -> None:
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        if not settings.RECIPE_READ_REPLICAS:
+            return self.get_response(request)
+        state = RoutingState(pinned=PIN_COOKIE in request.COOKIES)
+        token = current_routing.set(state)
+        try:
+            response = self.get_response(request)
+        finally:
+            current_routing.reset(token)
+        return self.finish(response, state)
+
+    async def __acall__(self, request):
+        if not settings.RECIPE_READ_REPLICAS:
+            return await self.get_response(request)
+        state = RoutingState(pinned=PIN_COOKIE in request.COOKIES)
+        token = current_routing.set(state)
+        try:
+            response = await self.get_response(request)
+        finally:
+            current_routing.reset(token)
+        return self.finish(response, state)
+
+    def finish(self, response, state: RoutingState):
+        if state.wrote and settings.RECIPE_REPLICA_LAG > 0:
+            response.set_cookie(
+                PIN_COOKIE,
+                "1",
+                max_age=settings.RECIPE_REPLICA_LAG,
+                httponly=True,
+                samesite="Lax",
+            )
+        return response
@@ -0,0 +1,145 @@
+import re
+from decimal import ROUND_HALF_UP, Decimal
+from typing import Any, Iterable
+from django.conf import settings
+from .costs import cost_summary, line_cost
+from .units import readable
+
+# quantities and costs are reported with the two decimal places they are stored with
+CENT = Decimal("0.01")
+
+# nutrition keys holding identifiers or per-measure reference data, not amounts
+NON_SCALING_KEYS: frozenset[str] = frozenset(
+    {"ndb_no", "source", "meal_type", "lat", "lng", "upc", "serving_unit"}
+)
+COPIED_KEYS: frozenset[str] = frozenset({"photo", "metadata", "tags", "alt_measures"})
+
+# a leading amount in a nutrition string such as "18g" or "2.5 mg"
+AMOUNT_PATTERN = re.compile(r"^\s*(\d+(?:\.\d+)?)(.*)$", re.DOTALL)
+
+
+def scale_amount(amount: Any, servings: int, base_servings: int) -> Decimal:
+    """
+    Scale a stored amount from base_servings to servings, rounded to cents.
+    """
+    return (Decimal(str(amount)) * servings / base_servings).quantize(
+        CENT, rounding=ROUND_HALF_UP
+    )
+
+
+def scale_nutrition(value: Any, factor: float, key: str | None = None) -> Any:
+    """
+    Return a copy of a nutrition blob with every amount multiplied by factor.
+
+    Handles both flat blobs ({"calories": 350, "protein": "10g"}) and the
+    Nutritionix food list, leaving identifiers and reference data untouched.
+    """
+    if key in COPIED_KEYS:
+        return value
+    if isinstance(value, dict):
+        return {k: scale_nutrition(v, factor, k) for k, v in value.items()}
+    if isinstance(value, list):
+        return [scale_nutrition(item, factor, key) for item in value]
+    if key is None or key in NON_SCALING_KEYS or key.endswith("_id"):
+        return value
+    if isinstance(value, bool):
+        return value
+    if isinstance(value, (int, float)):
+        return round(value * factor, 2)
+    if isinstance(value, str):
+        match = AMOUNT_PATTERN.match(value)
+        if match:
+            scaled: float = round(float(match.group(1)) * factor, 2)
+            return f"{scaled:g}{match.group(2)}"
+    return value
+
+
+def scaled_line_cost(
+    ingredient: Any, servings: int, base_servings: int
+) -> Decimal | None:
+    """
+    The unrounded cost of an ingredient line scaled to a servings count, or
+    None when its ingredient has no price.
+    """
+    if ingredient.cost_per_unit is None:
+        return None
+    # cost_per_unit is priced in the line's base unit, whichever unit the line
+    # is written or shown in
+    return (
+        line_cost(
+            ingredient.base_quantity, ingredient.base_unit, ingredient.cost_per_unit
+        )
+        * servings
+        / base_servings
+    )
+
+
+def scale_ingredients(
+    ingredients: Iterable[Any], servings: int, base_servings: int
+) -> list[dict[str, Any]]:
+    """
+    Scale ingredient lines to a servings count without modifying them.
+    A scaled amount that outgrows its unit, or shrinks well below it, is
+    reported in a neighbouring unit of the same family (12 tsp as 4 tbsp).
+    """
+    scaled: list[dict[str, Any]] = []
+    for ingredient in ingredients:
+        quantity: Decimal = scale_amount(ingredient.quantity, servings, base_servings)
+        cost: Decimal | None = scaled_line_cost(ingredient, servings, base_servings)
+        unit: str = ingredient.unit
+        if servings != base_servings:
+            quantity, unit = readable(quantity, unit)
+        scaled.append(
+            {
+                "id": ingredient.ingredient_id,
+                "name": ingredient.name,
+                "unit": unit,
+                "quantity": str(quantity),
+                "cost": (
+                    None
+                    if cost is None
+                    else str(cost.quantize(CENT, rounding=ROUND_HALF_UP))
+                ),
+            }
+        )
+    return scaled
+
+
+def scale_recipe(recipe: Any, servings: int) -> dict[str, Any]:
+    """
+    Compute a recipe's ingredient quantities, nutrition and cost for a servings
+    count, entirely in memory. Prefetch the recipe's ingredients when scaling
+    many recipes.
+    """
+    base_servings: int = recipe.servings or 1
+    lines: list[Any] = list(recipe.ingredients.all())
+    # summed unrounded and rounded once, as the stored Recipe.cost is
+    costs: list[Decimal] = [
+        cost
+        for line in lines
+        if (cost := scaled_line_cost(line, servings, base_servings)) is not None
+    ]
+    return {
+        "recipe": recipe.pk,
+        "title": recipe.title,
+        "servings": servings,
+        "base_servings": base_servings,
+        "ingredients": scale_ingredients(lines, servings, base_servings),
+        "nutritional_info": scale_nutrition(
+            recipe.nutritional_info, servings / base_servings
+        ),
+        "cost": str(cost_summary(sum(costs, Decimal(0)), servings)[0]),
+    }
+
+
+def parse_servings(raw: Any) -> int:
+    """
+    Validate a requested servings count, raising ValueError when it is not a
+    whole number between 1 and RECIPE_MAX_SERVINGS.
+    """
+    if isinstance(raw, bool) or (isinstance(raw, float) and not raw.is_integer()):
+        raise ValueError(raw)
+    servings: int = int(raw)
+    if not 1 <= servings <= settings.RECIPE_MAX_SERVINGS:
+        raise ValueError(raw)
+    return servings
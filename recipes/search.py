@@ -0,0 +1,163 @@
+import re
+from django.db import connection, connections
+from django.db.models import Q, QuerySet
+
+FTS_TABLE = "recipes_recipe_fts"
+
+# external-content FTS5 index over the recipe text; the triggers keep it in sync
+# with every insert, update and delete, including bulk_create and raw SQL writes
+SQLITE_FTS_TABLE_SQL = f"""
+CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5(
+    title, description, instructions,
+    content='recipes_recipe', content_rowid='id', tokenize='porter unicode61'
+)
+"""
+
+SQLITE_FTS_TRIGGERS_SQL = {
+    f"{FTS_TABLE}_ai": f"""
+CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ai AFTER INSERT ON recipes_recipe BEGIN
+    INSERT INTO {FTS_TABLE}(rowid, title, description, instructions)
+    VALUES (new.id, new.title, new.description, new.instructions);
+END
+""",
+    f"{FTS_TABLE}_ad": f"""
+CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ad AFTER DELETE ON recipes_recipe BEGIN
+    INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, title, description, instructions)
+    VALUES ('delete', old.id, old.title, old.description, old.instructions);
+END
+""",
+    f"{FTS_TABLE}_au": f"""
+CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_au
+AFTER UPDATE OF title, description, instructions ON recipes_recipe BEGIN
+    INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, title, description, instructions)
+    VALUES ('delete', old.id, old.title, old.description, old.instructions);
+    INSERT INTO {FTS_TABLE}(rowid, title, description, instructions)
+    VALUES (new.id, new.title, new.description, new.instructions);
+END
+""",
+}
+
+# a stored generated column keeps the vector in sync on every write
+POSTGRES_SEARCH_SQL = [
+    """
+ALTER TABLE recipes_recipe ADD COLUMN IF NOT EXISTS search_vector tsvector
+GENERATED ALWAYS AS (
+    setweight(to_tsvector('english', coalesce(title, '')), 'A')
+    || setweight(to_tsvector('english', coalesce(description, '')), 'B')
+    || setweight(to_tsvector('english', coalesce(instructions, '')), 'C')
+) STORED
+""",
+    """
+CREATE INDEX IF NOT EXISTS recipe_search_vector_idx
+ON recipes_recipe USING GIN (search_vector)
+""",
+]
+
+TOKEN_PATTERN = re.compile(r"\w+", re.UNICODE)
+
+
+def ensure_search_index(conn=connection) -> None:
+    """
+    Create the full-text index for the connection's database if it is missing.
+
+    Safe to run repeatedly. On SQLite, Django rebuilds a table to apply some
+    schema changes and the rebuild drops its triggers, so this also runs after
+    every migrate and restores them, re-indexing from the recipe table when
+    they had to be recreated.
+    """
+    with conn.cursor() as cursor:
+        if conn.vendor == "sqlite":
+            cursor.execute(SQLITE_FTS_TABLE_SQL)
+            cursor.execute(
+                "SELECT name FROM sqlite_master WHERE type = 'trigger' AND tbl_name = %s",
+                ["recipes_recipe"],
+            )
+            existing: set[str] = {row[0] for row in cursor.fetchall()}
+            missing: list[str] = [
+                name for name in SQLITE_FTS_TRIGGERS_SQL if name not in existing
+            ]
+            for name in missing:
+                cursor.execute(SQLITE_FTS_TRIGGERS_SQL[name])
+            if missing:
+                cursor.execute(
+                    f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')"
+                )
+        elif conn.vendor == "postgresql":
+            for statement in POSTGRES_SEARCH_SQL:
+                cursor.execute(statement)
+
+
+def drop_search_index(conn=connection) -> None:
+    """
+    Remove the full-text index created by ensure_search_index.
+    """
+    with conn.cursor() as cursor:
+        if conn.vendor == "sqlite":
+            for name in SQLITE_FTS_TRIGGERS_SQL:
+                cursor.execute(f"DROP TRIGGER IF EXISTS {name}")
+            cursor.execute(f"DROP TABLE IF EXISTS {FTS_TABLE}")
+        elif conn.vendor == "postgresql":
+            cursor.execute("DROP INDEX IF EXISTS recipe_search_vector_idx")
+            cursor.execute(
+                "ALTER TABLE recipes_recipe DROP COLUMN IF EXISTS search_vector"
+            )
+
+
+def search_terms(query: str) -> list[str]:
+    """
+    Split free text into search terms, dropping punctuation and query syntax.
+    """
+    return TOKEN_PATTERN.findall(query.lower())
+
+
+def fts5_query(terms: list[str]) -> str:
+    """
+    Build an FTS5 MATCH expression that requires every term, the last one as a
+    prefix so results show up while the user is still typing.
+    """
+    quoted: list[str] = [f'"{term}"' for term in terms]
+    quoted[-1] += "*"
+    return " ".join(quoted)
+
+
+def search_recipes(queryset: QuerySet, query: str) -> QuerySet:
+    """
+    Restrict a recipe queryset to full-text matches of query, best match first.
+
+    Uses the FTS5 index on SQLite and the tsvector column on Postgres, so the
+    cost depends on the number of matches rather than the size of the table.
+    Other backends fall back to an unindexed substring match.
+    """
+    terms: list[str] = search_terms(query)
+    if not terms:
+        return queryset.none()
+
+    vendor: str = connections[queryset.db].vendor
+    if vendor == "sqlite":
+        return queryset.extra(
+            tables=[FTS_TABLE],
+            where=[f"{FTS_TABLE}.rowid = recipes_recipe.id", f"{FTS_TABLE} MATCH %s"],
+            params=[fts5_query(terms)],
+            # bm25 with title matches weighted above description and instructions
+            select={"rank": f"bm25({FTS_TABLE}, 10.0, 4.0, 1.0)"},
+            order_by=["rank", "-id"],
+        )
+
+    if vendor == "postgresql":
+        tsquery: str = " & ".join(f"{term}:*" for term in terms)
+        return queryset.extra(
+            where=["search_vector @@ to_tsquery('english', %s)"],
+            params=[tsquery],
+            select={"rank": "ts_rank(search_vector, to_tsquery('english', %s))"},
+            select_params=[tsquery],
+            order_by=["-rank", "-id"],
+        )
+
+    condition = Q()
+    for term in terms:
+        condition &= (
+            Q(title__icontains=term)
+            | Q(description__icontains=term)
+            | Q(instructions__icontains=term)
+        )
+    return queryset.filter(condition).order_by("-created_at", "-id")
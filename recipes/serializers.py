@@ -1,5 +1,9 @@
 from rest_framework import serializers
-from .models import Recipe, Ingredient
+from .bulk import link_ingredients, normalize_ingredient
+from .costs import COST_FIELDS
+from .metrics import timed
+from .models import GenerationJob, Ingredient, Recipe, RecipeIngredient
+from .nutrition import SUMMARY_FIELDS
 
 
 class IngredientSerializer(serializers.ModelSerializer):
@@ -8,32 +12,73 @@ class IngredientSerializer(serializers.ModelSerializer):
         fields = "__all__"
 
 
+class RecipeIngredientSerializer(serializers.ModelSerializer):
+    """
+    An ingredient line of a recipe, flattened with its canonical ingredient:
+    id is the ingredient's, quantity and unit the line's own.
+    """
+
+    id = serializers.IntegerField(source="ingredient_id", read_only=True)
+    name = serializers.CharField(max_length=100)
+    allergens = serializers.CharField(
+        max_length=200, required=False, allow_blank=True, allow_null=True
+    )
+    cost_per_unit = serializers.DecimalField(
+        max_digits=1000, decimal_places=2, required=False, allow_null=True
+    )
+
+    class Meta:
+        model = RecipeIngredient
+        fields = ["id", "name", "quantity", "unit", "allergens", "cost_per_unit"]
+        extra_kwargs = {"unit": {"allow_null": True}}
+        # lines are matched to canonical ingredients in RecipeSerializer.create
+        validators = []
+
+
+class TimedListSerializer(serializers.ListSerializer):
+    @property
+    def data(self):
+        with timed("serialize"):
+            return super().data
+
+
 class RecipeSerializer(serializers.ModelSerializer):
-    ingredients = IngredientSerializer(many=True)
+    ingredients = RecipeIngredientSerializer(many=True)
     instructions = serializers.CharField(required=False)
 
     class Meta:
         model = Recipe
         fields = "__all__"
+        # derived from nutritional_info and the ingredient lines on every write
+        read_only_fields = SUMMARY_FIELDS + COST_FIELDS
+        list_serializer_class = TimedListSerializer
+
+    @property
+    def data(self):
+        with timed("serialize"):
+            return super().data
 
     def create(self, validated_data) -> Recipe:
         ingredients_data = validated_data.pop("ingredients", [])
         recipe = Recipe.objects.create(**validated_data)
+        link_ingredients(
+            [recipe], [[normalize_ingredient(data) for data in ingredients_data]]
+        )
+        return recipe
 
-        for ingredient_data in ingredients_data:
-            name = str(ingredient_data.get("name", "")).strip().lower()
-            unit = str(ingredient_data.get("unit", "")).strip().lower()
-            quantity = str(ingredient_data.get("quantity", "")).strip().lower()
-
-            ingredient = Ingredient.objects.filter(
-                name=name, unit=unit, quantity=quantity
-            ).first()
-
-            if not ingredient:
-                ingredient = Ingredient.objects.create(
-                    name=name, unit=unit, quantity=quantity
-                )
 
-            recipe.ingredients.add(ingredient)
+class GenerationJobSerializer(serializers.ModelSerializer):
+    recipe = RecipeSerializer(read_only=True)
 
-        return recipe
+    class Meta:
+        model = GenerationJob
+        fields = [
+            "id",
+            "status",
+            "error",
+            "attempts",
+            "recipe",
+            "created_at",
+            "started_at",
+            "finished_at",
+        ]
@@ -0,0 +1,184 @@
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Iterator
+from django.conf import settings
+from django.db import transaction
+from .bulk import bulk_create_recipes
+from .models import Ingredient, Recipe, RecipeIngredient
+from .serializers import RecipeSerializer
+from .upstream import get_upstream_executor, upstream_task
+from .utils import generate_recipe_content, get_nutritional_info, stream_recipe_content
+
+
+class GenerationError(Exception):
+    """
+    Raised when the upstream recipe generation call fails.
+    """
+
+
+def generation_inputs(validated_data: dict[str, Any]) -> dict[str, Any]:
+    """
+    Extract the keyword arguments for generate_recipe_content from validated recipe data.
+    """
+    return {
+        "ingredients": [
+            ingredient["name"] for ingredient in validated_data.get("ingredients", [])
+        ],
+        "cuisine": validated_data.get("cuisine"),
+        "dietary_restrictions": validated_data.get("dietary_restrictions"),
+        "difficulty": validated_data.get("difficulty"),
+    }
+
+
+def ingredient_lines(validated_data: dict[str, Any]) -> list[RecipeIngredient]:
+    """
+    Build unsaved ingredient lines for a nutrition lookup before the recipe exists.
+    """
+    return [
+        RecipeIngredient(
+            ingredient=Ingredient(name=ingredient.get("name")),
+            quantity=ingredient.get("quantity"),
+            unit=ingredient.get("unit"),
+        )
+        for ingredient in validated_data.get("ingredients", [])
+    ]
+
+
+def save_generated_recipe(
+    serializer: RecipeSerializer, instructions: str, nutritional_info: dict
+) -> Recipe:
+    """
+    Persist a validated recipe together with its generated instructions and nutrition.
+    """
+    with transaction.atomic():
+        return serializer.save(
+            instructions=instructions, nutritional_info=nutritional_info
+        )
+
+
+def generate_recipe_for(serializer: RecipeSerializer) -> Recipe:
+    """
+    Run the Gemini and Nutritionix calls for a validated serializer and save the recipe.
+    """
+    return save_generated_recipe(serializer, *generate_content_for(serializer))
+
+
+def generate_content_for(serializer: RecipeSerializer) -> tuple[str, dict]:
+    """
+    Run the Gemini and Nutritionix calls for a validated serializer at once,
+    on the upstream executor. Returns the instructions and the nutrition.
+    """
+    executor = get_upstream_executor()
+    # nutrition depends only on the requested ingredients, not on the text
+    nutrition = executor.submit(
+        upstream_task(get_nutritional_info),
+        ingredient_lines(serializer.validated_data),
+    )
+    generation = executor.submit(
+        upstream_task(generate_recipe_content),
+        **generation_inputs(serializer.validated_data),
+    )
+    ai_response: dict[str, str] = generation.result()
+    if "error" in ai_response:
+        nutrition.cancel()
+        raise GenerationError(ai_response["error"])
+
+    return ai_response.get("text", ""), nutrition.result()
+
+
+def stream_generated_recipe(
+    serializer: RecipeSerializer,
+) -> Iterator[tuple[str, dict[str, Any]]]:
+    """
+    Stream a generation as (event, data) pairs: "chunk" events while Gemini
+    produces text, then one "recipe" event with the saved recipe, or an "error"
+    event if generation fails. Nutrition is fetched while the text streams.
+    """
+    nutrition = get_upstream_executor().submit(
+        upstream_task(get_nutritional_info),
+        ingredient_lines(serializer.validated_data),
+    )
+    parts: list[str] = []
+    for item in stream_recipe_content(**generation_inputs(serializer.validated_data)):
+        if "error" in item:
+            yield "error", item
+            return
+        parts.append(item["text"])
+        yield "chunk", item
+
+    recipe: Recipe = save_generated_recipe(
+        serializer, "".join(parts), nutrition.result()
+    )
+    yield "recipe", RecipeSerializer(recipe).data
+
+
+def _generate_upstream(validated_data: dict[str, Any]) -> dict[str, Any]:
+    """
+    Run both upstream calls for one batch item, turning failures into an error entry.
+    """
+    try:
+        ai_response: dict[str, str] = generate_recipe_content(
+            **generation_inputs(validated_data)
+        )
+        if "error" in ai_response:
+            return {"error": ai_response["error"]}
+        return {
+            "instructions": ai_response.get("text", ""),
+            "nutritional_info": get_nutritional_info(ingredient_lines(validated_data)),
+        }
+    except Exception as e:
+        return {"error": str(e)}
+
+
+def generate_recipes_batch(
+    items: list[Any], concurrency: int | None = None
+) -> list[dict[str, Any]]:
+    """
+    Generate and save recipes for many generation requests.
+
+    Upstream calls are fanned out over at most `concurrency` threads (capped by
+    RECIPE_BATCH_MAX_CONCURRENCY) and the successful recipes are written with
+    bulk inserts. Returns one result per item, in order, with a "status" of
+    "created" or "error", so one bad item does not fail the batch.
+    """
+    results: list[dict[str, Any]] = [{} for _ in items]
+    valid: list[tuple[int, dict[str, Any]]] = []
+    for index, item in enumerate(items):
+        serializer = RecipeSerializer(data=item)
+        if serializer.is_valid():
+            valid.append((index, serializer.validated_data))
+        else:
+            results[index] = {"status": "error", "errors": serializer.errors}
+
+    workers: int = max(
+        1,
+        min(
+            concurrency or settings.RECIPE_BATCH_CONCURRENCY,
+            settings.RECIPE_BATCH_MAX_CONCURRENCY,
+        ),
+    )
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        outcomes: list[dict[str, Any]] = list(
+            pool.map(upstream_task(_generate_upstream), [data for _, data in valid])
+        )
+
+    generated: list[tuple[int, dict[str, Any]]] = []
+    for (index, data), outcome in zip(valid, outcomes):
+        if "error" in outcome:
+            results[index] = {"status": "error", "errors": {"error": outcome["error"]}}
+        else:
+            generated.append((index, {**data, **outcome}))
+
+    recipes: list[Recipe] = bulk_create_recipes([entry for _, entry in generated])
+    serialized: dict[int, Any] = {
+        data["id"]: data
+        for data in RecipeSerializer(
+            Recipe.objects.filter(
+                pk__in=[recipe.pk for recipe in recipes]
+            ).prefetch_related("ingredients"),
+            many=True,
+        ).data
+    }
+    for (index, _), recipe in zip(generated, recipes):
+        results[index] = {"status": "created", "recipe": serialized[recipe.pk]}
+
+    return [{"index": index, **result} for index, result in enumerate(results)]
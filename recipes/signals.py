@@ -0,0 +1,43 @@
+from typing import Iterable
+from django.dispatch import Signal
+
+# sent with recipe_ids whenever the stored content of those recipes may have
+# changed: the recipe row itself, its ingredient lines or an ingredient it uses.
+# Receivers run inside the writing transaction; defer with on_commit as needed.
+recipes_changed = Signal()
+
+
+def notify_recipes_changed(recipe_ids: Iterable[int]) -> None:
+    """
+    Send recipes_changed for a write, e.g. a bulk insert that skips model signals.
+    """
+    from .models import Recipe
+
+    recipe_ids = sorted(set(recipe_ids))
+    if recipe_ids:
+        recipes_changed.send(sender=Recipe, recipe_ids=recipe_ids)
+
+
+def recipe_saved(sender, instance, **kwargs) -> None:
+    """
+    post_save and post_delete receiver for Recipe.
+    """
+    notify_recipes_changed([instance.pk])
+
+
+def recipe_line_changed(sender, instance, **kwargs) -> None:
+    """
+    post_save and post_delete receiver for RecipeIngredient.
+    """
+    notify_recipes_changed([instance.recipe_id])
+
+
+def ingredient_changed(sender, instance, **kwargs) -> None:
+    """
+    post_save and pre_delete receiver for Ingredient; a renamed or deleted
+    ingredient changes every recipe that uses it.
+    """
+    if instance.pk is not None and not kwargs.get("created"):
+        notify_recipes_changed(
+            instance.recipe_lines.values_list("recipe_id", flat=True)
+        )
@@ -0,0 +1,277 @@
+import hashlib
+import random
+import re
+from array import array
+from bisect import bisect_left, insort
+from functools import lru_cache
+from typing import Any, Iterable
+from django.conf import settings
+from django.db import transaction
+from .cache import normalize_ingredient_name
+from .indexing import RecipeIndex
+from .models import Recipe, RecipeIngredient
+
+# MinHash signature length and the LSH band size. Recipes whose signatures
+# agree on all rows of any band are compared exactly; with 8 bands of 4 rows
+# a pair at Jaccard 0.8 becomes a candidate ~98% of the time, at 0.5 ~40%.
+NUM_HASHES = 32
+BAND_ROWS = 4
+
+MASK64 = (1 << 64) - 1
+# (odd multiplier, offset) pairs of the multiply-shift hash family
+HASH_PARAMS: list[tuple[int, int]] = [
+    (rng.getrandbits(64) | 1, rng.getrandbits(64))
+    for rng in [random.Random(20240601)]
+    for _ in range(NUM_HASHES)
+]
+
+# words that describe how an ingredient is prepared rather than what it is
+DESCRIPTORS: frozenset[str] = frozenset(
+    {
+        "boneless",
+        "canned",
+        "chopped",
+        "cooked",
+        "crushed",
+        "diced",
+        "dried",
+        "finely",
+        "fresh",
+        "freshly",
+        "frozen",
+        "grated",
+        "ground",
+        "large",
+        "medium",
+        "minced",
+        "organic",
+        "raw",
+        "ripe",
+        "roughly",
+        "skinless",
+        "sliced",
+        "small",
+        "whole",
+    }
+)
+
+Partition = tuple[str, str, str]
+
+
+def singular(word: str) -> str:
+    """
+    Strip a plural ending from an ingredient word ("tomatoes" -> "tomato").
+    """
+    if len(word) > 4 and word.endswith("ies"):
+        return word[:-3] + "y"
+    if len(word) > 4 and word.endswith("oes"):
+        return word[:-2]
+    if word.endswith(("ches", "shes", "xes")):
+        return word[:-2]
+    if len(word) > 3 and word.endswith("s") and not word.endswith(("ss", "us", "is")):
+        return word[:-1]
+    return word
+
+
+def ingredient_token(name: Any) -> str:
+    """
+    Reduce an ingredient name to the token compared for similarity, so
+    "Fresh Basil" and "basil", or "tomatoes" and "tomato", are the same.
+    """
+    words: list[str] = [
+        word
+        for word in re.findall(r"[a-z]+", normalize_ingredient_name(name))
+        if word not in DESCRIPTORS
+    ]
+    if words:
+        words[-1] = singular(words[-1])
+    return " ".join(words)
+
+
+def ingredient_tokens(names: Iterable[Any]) -> frozenset[str]:
+    tokens: set[str] = {ingredient_token(name) for name in names}
+    tokens.discard("")
+    return frozenset(tokens)
+
+
+@lru_cache(maxsize=65536)
+def token_signature(token: str) -> tuple[int, ...]:
+    """
+    The MinHash values of a single token; a set's signature is their elementwise minimum.
+    """
+    base: int = int.from_bytes(
+        hashlib.blake2b(token.encode("utf-8"), digest_size=8).digest(), "big"
+    )
+    return tuple((a * base + b) & MASK64 for a, b in HASH_PARAMS)
+
+
+def signature(tokens: Iterable[str]) -> tuple[int, ...]:
+    return tuple(map(min, zip(*(token_signature(token) for token in tokens))))
+
+
+def band_keys(partition: Partition, tokens: Iterable[str]) -> list[int]:
+    """
+    The LSH bucket keys of an ingredient set within a cuisine/diet/difficulty partition.
+    """
+    values: tuple[int, ...] = signature(tokens)
+    return [
+        hash((partition, start, values[start : start + BAND_ROWS]))
+        for start in range(0, NUM_HASHES, BAND_ROWS)
+    ]
+
+
+def jaccard(a: frozenset[str], b: frozenset[str]) -> float:
+    return len(a & b) / len(a | b)
+
+
+class SimilarityIndex(RecipeIndex):
+    """
+    MinHash/LSH index over the ingredient sets of recipes that have
+    instructions, partitioned by cuisine, dietary restrictions and difficulty.
+
+    A lookup only compares the recipes sharing an LSH bucket with the request,
+    so its cost does not grow with the catalog. The index is kept current
+    across processes through the RecipeIndex change log.
+    """
+
+    namespace = "similarity"
+
+    def _reset(self) -> None:
+        self.buckets: dict[int, array] = {}
+        self.recipe_tokens: dict[int, frozenset[str]] = {}
+        self.recipe_partition: dict[int, Partition] = {}
+
+    def _load(
+        self, recipe_ids: Iterable[int] | None = None
+    ) -> dict[int, tuple[Partition, frozenset[str]]]:
+        recipes = Recipe.objects.filter(instructions__gt="")
+        rows = RecipeIngredient.objects.filter(recipe__instructions__gt="").order_by()
+        if recipe_ids is not None:
+            recipe_ids = list(recipe_ids)
+            recipes = recipes.filter(pk__in=recipe_ids)
+            rows = rows.filter(recipe_id__in=recipe_ids)
+        names: dict[int, list[str]] = {}
+        for recipe_id, name in rows.values_list("recipe_id", "ingredient__name"):
+            names.setdefault(recipe_id, []).append(name)
+        loaded: dict[int, tuple[Partition, frozenset[str]]] = {}
+        for recipe_id, *partition in recipes.values_list(
+            "id", "cuisine", "dietary_restrictions", "difficulty"
+        ):
+            tokens: frozenset[str] = ingredient_tokens(names.get(recipe_id, ()))
+            if tokens:
+                loaded[recipe_id] = (tuple(partition), tokens)
+        return loaded
+
+    def _link(self, recipe_id: int, entry: tuple[Partition, frozenset[str]]) -> None:
+        partition, tokens = entry
+        self.recipe_partition[recipe_id] = partition
+        self.recipe_tokens[recipe_id] = tokens
+        for key in band_keys(partition, tokens):
+            insort(self.buckets.setdefault(key, array("q")), recipe_id)
+
+    def _unlink(self, recipe_id: int) -> None:
+        tokens: frozenset[str] | None = self.recipe_tokens.pop(recipe_id, None)
+        if tokens is None:
+            return
+        for key in band_keys(self.recipe_partition.pop(recipe_id), tokens):
+            bucket: array = self.buckets[key]
+            del bucket[bisect_left(bucket, recipe_id)]
+            if not bucket:
+                del self.buckets[key]
+
+    def find(
+        self,
+        ingredients: Iterable[Any],
+        cuisine: str,
+        dietary_restrictions: str,
+        difficulty: str,
+        threshold: float,
+    ) -> tuple[int, float] | None:
+        """
+        Return the (recipe id, Jaccard similarity) of the most similar recipe
+        in the same partition, if it reaches the threshold. Ties go to the
+        newest recipe.
+        """
+        self.sync()
+        tokens: frozenset[str] = ingredient_tokens(ingredients)
+        if not tokens:
+            return None
+        partition: Partition = (cuisine, dietary_restrictions, difficulty)
+        best: tuple[float, int] | None = None
+        with self.lock:
+            candidates: set[int] = set()
+            for key in band_keys(partition, tokens):
+                candidates.update(self.buckets.get(key, ()))
+            for recipe_id in candidates:
+                if self.recipe_partition[recipe_id] != partition:
+                    continue
+                score: float = jaccard(tokens, self.recipe_tokens[recipe_id])
+                if score >= threshold and (best is None or (score, recipe_id) > best):
+                    best = (score, recipe_id)
+        return (best[1], best[0]) if best else None
+
+
+similarity_index = SimilarityIndex()
+
+
+def update_similarity_index(sender, recipe_ids: list[int], **kwargs) -> None:
+    """
+    recipes_changed receiver: refresh the index once the write has committed.
+    """
+    transaction.on_commit(lambda: similarity_index.record_change(recipe_ids))
+
+
+def adaptation_note(requested: frozenset[str], stored: frozenset[str]) -> str:
+    """
+    Describe how the requested ingredients differ from a reused recipe's.
+    """
+    parts: list[str] = []
+    if stored - requested:
+        parts.append(f"Leave out: {', '.join(sorted(stored - requested))}.")
+    if requested - stored:
+        parts.append(f"Also add: {', '.join(sorted(requested - stored))}.")
+    if not parts:
+        return ""
+    return "\n\nAdapted from a similar recipe. " + " ".join(parts)
+
+
+def reuse_similar_recipe(
+    ingredients: list, cuisine: str, dietary_restrictions: str, difficulty: str
+) -> dict[str, Any] | None:
+    """
+    Return the instructions of a stored recipe similar enough to a generation
+    request, in the generate_recipe_content result shape, or None.
+
+    Off unless RECIPE_SIMILAR_REUSE is set. A match needs the same cuisine,
+    diet and difficulty and an ingredient-set Jaccard similarity of at least
+    RECIPE_SIMILARITY_THRESHOLD; differing ingredients are noted in the text.
+    """
+    if not settings.RECIPE_SIMILAR_REUSE:
+        return None
+    match: tuple[int, float] | None = similarity_index.find(
+        ingredients,
+        cuisine,
+        dietary_restrictions,
+        difficulty,
+        settings.RECIPE_SIMILARITY_THRESHOLD,
+    )
+    if match is None:
+        return None
+    recipe_id, score = match
+    instructions: str | None = (
+        Recipe.objects.filter(pk=recipe_id)
+        .exclude(instructions="")
+        .values_list("instructions", flat=True)
+        .first()
+    )
+    if instructions is None:
+        return None
+    with similarity_index.lock:
+        stored: frozenset[str] = similarity_index.recipe_tokens.get(
+            recipe_id, frozenset()
+        )
+    return {
+        "text": instructions + adaptation_note(ingredient_tokens(ingredients), stored),
+        "similar_recipe": recipe_id,
+        "similarity": round(score, 3),
+    }
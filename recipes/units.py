@@ -0,0 +1,210 @@
+import re
+from decimal import ROUND_HALF_UP, Decimal
+from functools import lru_cache
+from typing import Any, Iterable
+
+MASS = "mass"
+VOLUME = "volume"
+COUNT = "count"
+
+# the unit every amount of a dimension is converted to
+BASE_UNITS: dict[str, str] = {MASS: "g", VOLUME: "ml", COUNT: "piece"}
+
+# canonical unit: (dimension, size in the dimension's base unit, other spellings)
+UNITS: dict[str, tuple[str, Decimal, tuple[str, ...]]] = {
+    "mg": (MASS, Decimal("0.001"), ("milligram", "milligrams", "milligramme")),
+    "g": (MASS, Decimal("1"), ("gram", "grams", "gramme", "grammes", "gr", "gm")),
+    "kg": (MASS, Decimal("1000"), ("kilogram", "kilograms", "kilo", "kilos", "kgs")),
+    "oz": (MASS, Decimal("28.349523125"), ("ounce", "ounces")),
+    "lb": (MASS, Decimal("453.59237"), ("lbs", "pound", "pounds")),
+    "ml": (
+        VOLUME,
+        Decimal("1"),
+        ("milliliter", "milliliters", "millilitre", "millilitres", "mls", "cc"),
+    ),
+    "cl": (
+        VOLUME,
+        Decimal("10"),
+        ("centiliter", "centiliters", "centilitre", "centilitres"),
+    ),
+    "dl": (
+        VOLUME,
+        Decimal("100"),
+        ("deciliter", "deciliters", "decilitre", "decilitres"),
+    ),
+    "l": (VOLUME, Decimal("1000"), ("liter", "liters", "litre", "litres", "ltr")),
+    "tsp": (VOLUME, Decimal("4.92892159375"), ("teaspoon", "teaspoons", "tsps")),
+    "tbsp": (
+        VOLUME,
+        Decimal("14.78676478125"),
+        ("tablespoon", "tablespoons", "tbsps", "tbs", "tbl", "tbls"),
+    ),
+    "fl oz": (
+        VOLUME,
+        Decimal("29.5735295625"),
+        ("fluid ounce", "fluid ounces", "floz"),
+    ),
+    "cup": (VOLUME, Decimal("236.5882365"), ("cups", "c")),
+    "pint": (VOLUME, Decimal("473.176473"), ("pints", "pt")),
+    "quart": (VOLUME, Decimal("946.352946"), ("quarts", "qt")),
+    "gallon": (VOLUME, Decimal("3785.411784"), ("gallons", "gal")),
+    "piece": (
+        COUNT,
+        Decimal("1"),
+        ("pieces", "pc", "pcs", "each", "ea", "whole", "item", "items"),
+    ),
+}
+
+# plural spellings of units that only count themselves
+PLURALS: dict[str, str] = {
+    "cloves": "clove",
+    "slices": "slice",
+    "pinches": "pinch",
+    "dashes": "dash",
+    "cans": "can",
+    "bunches": "bunch",
+    "sprigs": "sprig",
+    "sticks": "stick",
+    "leaves": "leaf",
+    "heads": "head",
+}
+
+# grams per millilitre, so volumes of these ingredients share keys with weights
+DENSITIES: dict[str, Decimal] = {
+    "water": Decimal("1"),
+    "milk": Decimal("1.03"),
+    "buttermilk": Decimal("1.03"),
+    "yogurt": Decimal("1.03"),
+    "cream": Decimal("1.01"),
+    "butter": Decimal("0.911"),
+    "oil": Decimal("0.92"),
+    "olive oil": Decimal("0.91"),
+    "vegetable oil": Decimal("0.92"),
+    "honey": Decimal("1.42"),
+    "maple syrup": Decimal("1.32"),
+    "flour": Decimal("0.53"),
+    "all-purpose flour": Decimal("0.53"),
+    "sugar": Decimal("0.85"),
+    "brown sugar": Decimal("0.93"),
+    "powdered sugar": Decimal("0.56"),
+    "salt": Decimal("1.22"),
+    "rice": Decimal("0.85"),
+    "oats": Decimal("0.41"),
+    "cocoa powder": Decimal("0.42"),
+}
+
+# units a scaled amount may move between, smallest first
+LADDERS: tuple[tuple[str, ...], ...] = (
+    ("mg", "g", "kg"),
+    ("oz", "lb"),
+    ("ml", "l"),
+    ("tsp", "tbsp", "cup"),
+)
+
+# every spelling, mapped to its canonical unit once at import
+ALIASES: dict[str, str] = {
+    **PLURALS,
+    **{alias: unit for unit, (_, _, aliases) in UNITS.items() for alias in aliases},
+    **{unit: unit for unit in UNITS},
+}
+LADDER_OF: dict[str, tuple[str, ...]] = {
+    unit: ladder for ladder in LADDERS for unit in ladder
+}
+
+# dots and runs of whitespace, so "Fl. Oz." reads as "fl oz"
+SEPARATORS = re.compile(r"[.\s]+")
+
+# the smallest share of a unit a scaled amount is still shown in
+MIN_AMOUNT = Decimal("0.25")
+CENT = Decimal("0.01")
+
+
+@lru_cache(maxsize=4096)
+def canonical_unit(unit: Any) -> str:
+    """
+    Return the canonical spelling of a unit: "Grams" and "gr" become "g",
+    "Cups" becomes "cup". Unknown units are only lowercased and trimmed.
+    """
+    cleaned: str = SEPARATORS.sub(" ", str(unit or "")).strip().lower()
+    return ALIASES.get(cleaned, cleaned)
+
+
+def density(name: Any) -> Decimal | None:
+    """
+    Grams per millilitre of an ingredient, when known.
+    """
+    return DENSITIES.get(" ".join(str(name or "").split()).lower())
+
+
+def to_base(quantity: Any, unit: Any, name: Any = None) -> tuple[Decimal, str]:
+    """
+    Convert an amount to its dimension's base unit: grams, millilitres or
+    pieces. Volumes of ingredients with a known density become grams, and
+    units that cannot be converted are returned in their canonical spelling.
+    Raises decimal.InvalidOperation for a quantity that is not a number.
+    """
+    amount: Decimal = Decimal(str(quantity).strip())
+    canonical: str = canonical_unit(unit)
+    if not canonical:
+        return amount, BASE_UNITS[COUNT]
+    if canonical not in UNITS:
+        return amount, canonical
+    kind, size, _ = UNITS[canonical]
+    amount *= size
+    if kind == VOLUME and (grams_per_ml := density(name)) is not None:
+        return amount * grams_per_ml, BASE_UNITS[MASS]
+    return amount, BASE_UNITS[kind]
+
+
+def to_base_many(lines: Iterable[tuple[Any, Any, Any]]) -> list[tuple[Decimal, str]]:
+    """
+    Convert a whole ingredient list of (quantity, unit, name) lines to base
+    units, rounded to hundredths, so equivalent lines compare equal.
+    """
+    converted: list[tuple[Decimal, str]] = []
+    for quantity, unit, name in lines:
+        amount, base = to_base(quantity, unit, name)
+        converted.append(
+            (amount.quantize(CENT, rounding=ROUND_HALF_UP).normalize(), base)
+        )
+    return converted
+
+
+def convert(quantity: Any, unit: Any, target: Any) -> Decimal | None:
+    """
+    Convert an amount between two units of the same dimension, or None when
+    they do not share one.
+    """
+    source: str = canonical_unit(unit)
+    target = canonical_unit(target)
+    if source not in UNITS or target not in UNITS:
+        return None
+    if UNITS[source][0] != UNITS[target][0]:
+        return None
+    return Decimal(str(quantity)) * UNITS[source][1] / UNITS[target][1]
+
+
+def readable(quantity: Decimal, unit: Any) -> tuple[Decimal, str]:
+    """
+    Express a scaled amount in a unit a cook would use: an amount that has
+    outgrown its unit (12 tsp) or shrunk below a quarter of it (0.1 kg) moves
+    to the largest unit of its family it fills at least once (4 tbsp, 100 g).
+    Amounts in units outside a family are returned unchanged.
+    """
+    canonical: str = canonical_unit(unit)
+    ladder: tuple[str, ...] | None = LADDER_OF.get(canonical)
+    if ladder is None:
+        return quantity, canonical
+    position: int = ladder.index(canonical)
+    too_small: bool = position > 0 and quantity < MIN_AMOUNT
+    too_large: bool = (
+        position < len(ladder) - 1
+        and quantity >= UNITS[ladder[position + 1]][1] / UNITS[canonical][1]
+    )
+    if not (too_small or too_large):
+        return quantity, canonical
+    for candidate in reversed(ladder):
+        amount: Decimal = convert(quantity, canonical, candidate)
+        if amount >= 1 or candidate == ladder[0]:
+            return amount.quantize(CENT, rounding=ROUND_HALF_UP), candidate
+    return quantity, canonical
@@ -0,0 +1,355 @@
+import queue
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from functools import lru_cache
+from typing import Any, Callable, Iterator
+import httpx
+import requests
+from django.conf import settings
+from django.db import close_old_connections
+from google import genai
+from google.genai import types
+from requests.adapters import HTTPAdapter
+from tenacity import (
+    Retrying,
+    retry_if_exception,
+    stop_after_attempt,
+    wait_exponential_jitter,
+)
+from .metrics import with_request_timings
+
+# throttling and transient server errors; anything else is the caller's fault
+RETRYABLE_STATUS_CODES: frozenset[int] = frozenset({408, 429, 500, 502, 503, 504})
+
+# successful call latencies kept per provider for the hedging percentile, and
+# how many are needed before hedging starts
+LATENCY_WINDOW = 200
+HEDGE_MIN_SAMPLES = 20
+
+
+@lru_cache(maxsize=None)
+def get_http_session() -> requests.Session:
+    """
+    Return the process-wide pooled session used for plain HTTP upstream APIs.
+    Connections are kept alive between calls, so only the first request to a
+    host pays for the TCP and TLS handshakes.
+    """
+    session = requests.Session()
+    # retries are handled by post_json so they get backoff and respect the settings
+    adapter = HTTPAdapter(
+        pool_connections=settings.UPSTREAM_POOL_CONNECTIONS,
+        pool_maxsize=settings.UPSTREAM_POOL_MAXSIZE,
+        max_retries=0,
+    )
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+@lru_cache(maxsize=None)
+def get_upstream_executor() -> ThreadPoolExecutor:
+    """
+    Return the process-wide thread pool used to overlap blocking upstream calls.
+    """
+    return ThreadPoolExecutor(
+        max_workers=settings.UPSTREAM_POOL_MAXSIZE, thread_name_prefix="upstream"
+    )
+
+
+def upstream_task(func: Callable) -> Callable:
+    """
+    Wrap func to run on a pool thread for the current request: bound to its
+    timings, and with the thread's database connections closed before and
+    after once unusable or older than CONN_MAX_AGE, as Django does around a
+    request. Pool threads never see a request finish, so they would
+    otherwise keep their connections for good.
+    """
+    timed: Callable = with_request_timings(func)
+
+    def run(*args, **kwargs) -> Any:
+        close_old_connections()
+        try:
+            return timed(*args, **kwargs)
+        finally:
+            close_old_connections()
+
+    return run
+
+
+@lru_cache(maxsize=None)
+def get_genai_client(api_key: str | None) -> genai.Client:
+    """
+    Return a shared Gemini client whose httpx transport is pooled and bounded by timeouts.
+    """
+    limits = httpx.Limits(
+        max_connections=settings.UPSTREAM_POOL_MAXSIZE,
+        max_keepalive_connections=settings.UPSTREAM_POOL_MAXSIZE,
+    )
+    return genai.Client(
+        api_key=api_key,
+        http_options=types.HttpOptions(
+            # httpx applies a single per-request timeout, in milliseconds here;
+            # an attempt never needs to outlive the call's deadline
+            timeout=int(min(settings.GEMINI_TIMEOUT, settings.GEMINI_DEADLINE) * 1000),
+            client_args={"limits": limits},
+            async_client_args={"limits": limits},
+            retry_options=types.HttpRetryOptions(
+                attempts=settings.UPSTREAM_RETRY_ATTEMPTS,
+                initial_delay=settings.UPSTREAM_RETRY_BACKOFF,
+                max_delay=settings.UPSTREAM_RETRY_MAX_BACKOFF,
+                http_status_codes=sorted(RETRYABLE_STATUS_CODES),
+            ),
+        ),
+    )
+
+
+def is_retryable(exc: BaseException) -> bool:
+    """
+    Decide whether a failed upstream request is worth another attempt.
+    """
+    if isinstance(exc, (requests.ConnectionError, requests.Timeout)):
+        return True
+    if isinstance(exc, requests.HTTPError) and exc.response is not None:
+        return exc.response.status_code in RETRYABLE_STATUS_CODES
+    return False
+
+
+def post_json(url: str, headers: dict[str, Any], payload: dict[str, Any]) -> Any:
+    """
+    POST a JSON payload through the pooled session and return the decoded response.
+
+    Each attempt is bounded by the configured connect and read timeouts, and
+    connection errors, timeouts and retryable status codes are retried with
+    jittered exponential backoff. Raises requests.RequestException once the
+    attempts are exhausted.
+    """
+    retrying = Retrying(
+        stop=stop_after_attempt(settings.UPSTREAM_RETRY_ATTEMPTS),
+        wait=wait_exponential_jitter(
+            initial=settings.UPSTREAM_RETRY_BACKOFF,
+            max=settings.UPSTREAM_RETRY_MAX_BACKOFF,
+            jitter=settings.UPSTREAM_RETRY_BACKOFF,
+        ),
+        retry=retry_if_exception(is_retryable),
+        reraise=True,
+    )
+    for attempt in retrying:
+        with attempt:
+            response = get_http_session().post(
+                url,
+                headers=headers,
+                json=payload,
+                timeout=(
+                    settings.UPSTREAM_CONNECT_TIMEOUT,
+                    settings.UPSTREAM_READ_TIMEOUT,
+                ),
+            )
+            response.raise_for_status()
+    return response.json()
+
+
+class UpstreamUnavailable(Exception):
+    """
+    Raised instead of calling an upstream whose circuit breaker is open.
+    """
+
+
+class UpstreamTimeout(Exception):
+    """
+    Raised when an upstream call does not finish within its deadline.
+    """
+
+
+class CircuitBreaker:
+    """
+    A per-process circuit breaker for one upstream provider.
+
+    After UPSTREAM_BREAKER_FAILURES consecutive failures the circuit opens and
+    calls fail fast for UPSTREAM_BREAKER_RESET seconds. Then a single trial
+    call is let through (half-open): success closes the circuit, failure
+    opens it again.
+    """
+
+    def __init__(self, provider: str) -> None:
+        self.provider = provider
+        self.failures: int = 0
+        self.opened_at: float | None = None
+        self.trial_running: bool = False
+        self.lock = threading.Lock()
+
+    def before_call(self) -> None:
+        with self.lock:
+            if self.opened_at is None:
+                return
+            remaining: float = (
+                self.opened_at + settings.UPSTREAM_BREAKER_RESET - time.monotonic()
+            )
+            if remaining > 0 or self.trial_running:
+                raise UpstreamUnavailable(
+                    f"{self.provider} is unavailable after repeated failures; "
+                    f"retry in {max(remaining, 1):.0f}s"
+                )
+            self.trial_running = True
+
+    def record_success(self) -> None:
+        with self.lock:
+            self.failures = 0
+            self.opened_at = None
+            self.trial_running = False
+
+    def record_failure(self) -> None:
+        with self.lock:
+            self.failures += 1
+            if (
+                self.trial_running
+                or self.failures >= settings.UPSTREAM_BREAKER_FAILURES
+            ):
+                self.opened_at = time.monotonic()
+            self.trial_running = False
+
+
+class LatencyTracker:
+    """
+    A sliding window of successful call latencies, in seconds.
+    """
+
+    def __init__(self) -> None:
+        self.samples: deque[float] = deque(maxlen=LATENCY_WINDOW)
+        self.lock = threading.Lock()
+
+    def observe(self, seconds: float) -> None:
+        with self.lock:
+            self.samples.append(seconds)
+
+    def percentile(self, percent: float) -> float | None:
+        with self.lock:
+            if len(self.samples) < HEDGE_MIN_SAMPLES:
+                return None
+            ordered: list[float] = sorted(self.samples)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * percent / 100))]
+
+
+@lru_cache(maxsize=None)
+def get_breaker(provider: str) -> CircuitBreaker:
+    return CircuitBreaker(provider)
+
+
+@lru_cache(maxsize=None)
+def get_latency_tracker(provider: str) -> LatencyTracker:
+    return LatencyTracker()
+
+
+@lru_cache(maxsize=None)
+def get_call_executor() -> ThreadPoolExecutor:
+    """
+    Return the thread pool that runs deadline-bound upstream calls. It is
+    separate from get_upstream_executor, whose tasks wait on these calls.
+    """
+    return ThreadPoolExecutor(
+        max_workers=settings.UPSTREAM_POOL_MAXSIZE, thread_name_prefix="upstream-call"
+    )
+
+
+def _hedge_delay(provider: str, hedge_percentile: float) -> float | None:
+    if not hedge_percentile:
+        return None
+    latency: float | None = get_latency_tracker(provider).percentile(hedge_percentile)
+    if latency is None:
+        return None
+    return max(latency, settings.GEMINI_HEDGE_MIN_DELAY)
+
+
+def guarded_call(
+    provider: str, call: Callable[[], Any], deadline: float, hedge_percentile: float = 0
+) -> Any:
+    """
+    Run an upstream call under the provider's circuit breaker and a deadline.
+
+    Raises UpstreamUnavailable while the circuit is open and UpstreamTimeout
+    once `deadline` seconds pass. When hedge_percentile is set and the call is
+    slower than that percentile of recent successful calls, a second identical
+    call is started and whichever succeeds first wins. A call that outlives its
+    deadline keeps its thread until its own timeouts end it.
+    """
+    breaker: CircuitBreaker = get_breaker(provider)
+    breaker.before_call()
+    executor: ThreadPoolExecutor = get_call_executor()
+    call = with_request_timings(call)
+    started: float = time.monotonic()
+    expires: float = started + deadline
+
+    pending: set[Future] = {executor.submit(call)}
+    hedge_delay: float | None = _hedge_delay(provider, hedge_percentile)
+    error: BaseException | None = None
+    while pending:
+        timeout: float = expires - time.monotonic()
+        if hedge_delay is not None:
+            timeout = min(timeout, started + hedge_delay - time.monotonic())
+        done, pending = wait(
+            pending, timeout=max(timeout, 0), return_when=FIRST_COMPLETED
+        )
+        for future in done:
+            if future.exception() is None:
+                breaker.record_success()
+                get_latency_tracker(provider).observe(time.monotonic() - started)
+                return future.result()
+            error = future.exception()
+        if hedge_delay is not None and not done and time.monotonic() < expires:
+            # the first call is slow: race a second one against it
+            pending.add(executor.submit(call))
+            hedge_delay = None
+            continue
+        if time.monotonic() >= expires:
+            break
+
+    breaker.record_failure()
+    if error is not None and not pending:
+        raise error
+    raise UpstreamTimeout(f"{provider} did not answer within {deadline:g}s")
+
+
+def guarded_stream(
+    provider: str, open_stream: Callable[[], Iterator[Any]], deadline: float
+) -> Iterator[Any]:
+    """
+    Iterate an upstream stream under the provider's circuit breaker, raising
+    UpstreamTimeout if it has not finished `deadline` seconds after it started.
+    The stream is read on a worker thread, which stops at the next item once
+    the consumer times out or goes away.
+    """
+    breaker: CircuitBreaker = get_breaker(provider)
+    breaker.before_call()
+    items: queue.Queue = queue.Queue()
+    stopped = threading.Event()
+
+    def pump() -> None:
+        try:
+            for item in open_stream():
+                if stopped.is_set():
+                    return
+                items.put(("item", item))
+            items.put(("done", None))
+        except Exception as e:
+            items.put(("error", e))
+
+    get_call_executor().submit(with_request_timings(pump))
+    expires: float = time.monotonic() + deadline
+    try:
+        while True:
+            try:
+                kind, value = items.get(timeout=max(expires - time.monotonic(), 0))
+            except queue.Empty:
+                breaker.record_failure()
+                raise UpstreamTimeout(f"{provider} did not answer within {deadline:g}s")
+            if kind == "item":
+                yield value
+            elif kind == "done":
+                breaker.record_success()
+                return
+            else:
+                breaker.record_failure()
+                raise value
+    finally:
+        stopped.set()
@@ -3,6 +3,31 @@ from . import views
 
 urlpatterns = [
     path("recipes/", views.recipe_list, name="recipe_list"),
+    path("recipes/pantry/", views.recipe_pantry_match, name="recipe_pantry_match"),
+    path("recipes/search/", views.recipe_search, name="recipe_search"),
+    path("recipes/export/", views.recipe_export, name="recipe_export"),
+    path("recipes/scale/", views.recipe_scale_batch, name="recipe_scale_batch"),
     path("recipes/<int:pk>/", views.recipe_detail, name="recipe_detail"),
+    path("recipes/<int:pk>/scale/", views.recipe_scale, name="recipe_scale"),
     path("recipes/generate/", views.generate_recipe, name="generate_recipe"),
+    path(
+        "recipes/generate/batch/",
+        views.generate_recipe_batch,
+        name="generate_recipe_batch",
+    ),
+    path(
+        "recipes/generate/stream/",
+        views.generate_recipe_stream,
+        name="generate_recipe_stream",
+    ),
+    path(
+        "recipes/generate/async/",
+        views.generate_recipe_async,
+        name="generate_recipe_async",
+    ),
+    path(
+        "recipes/jobs/<int:pk>/",
+        views.generation_job_detail,
+        name="generation_job_detail",
+    ),
 ]
@@ -1,7 +1,28 @@
+from decimal import Decimal
 from os import getenv
+from typing import Any, Iterator
 import requests
-from google import genai
+from django.conf import settings
 from dotenv import load_dotenv
+from .cache import (
+    generation_cache,
+    generation_fingerprint,
+    normalize_quantity,
+    nutrition_cache,
+    nutrition_fingerprint,
+)
+from .metrics import timed
+from .nutrition import compact_foods
+from .similarity import reuse_similar_recipe
+from .units import BASE_UNITS, COUNT, canonical_unit, to_base_many
+from .upstream import (
+    UpstreamTimeout,
+    UpstreamUnavailable,
+    get_genai_client,
+    guarded_call,
+    guarded_stream,
+    post_json,
+)
 
 load_dotenv()
 
@@ -9,7 +30,27 @@ GOOGLE_AI_STUDIO_API_KEY = getenv("GOOGLE_AI_STUDIO_API_KEY")
 NUTRITIONIX_API_KEY = getenv("NUTRITIONIX_API_KEY")
 NUTRITIONIX_APP_ID = getenv("NUTRITIONIX_APP_ID")
 
-client = genai.Client(api_key=GOOGLE_AI_STUDIO_API_KEY)
+GEMINI_MODEL = "gemini-1.5-flash"
+# bump whenever build_recipe_prompt changes, so stale cached generations are not served
+PROMPT_VERSION = 1
+
+
+def build_recipe_prompt(
+    ingredients: list, cuisine: str, dietary_restrictions: str, difficulty: str
+) -> str:
+    """
+    Build the Gemini prompt for a recipe generation request.
+    """
+    return (
+        f"Generate a {difficulty} {cuisine} recipe for a {dietary_restrictions} diet "
+        f"using ingredients: {', '.join(ingredients)}.\n\n"
+        "Include:\n"
+        "- Title\n"
+        "- Description\n"
+        "- Step-by-step instructions\n"
+        "- Substitution suggestions\n"
+        "- Serving tips"
+    )
 
 
 # using the Google AI Studio API to generate a recipe based on user input
@@ -18,32 +59,173 @@ def generate_recipe_content(
 ) -> dict[str, str]:
     """
     Generate a recipe using Google AI Studio API based on user input.
+    Successful responses are cached on a fingerprint of the inputs.
     """
+    key: str = generation_fingerprint(
+        ingredients=ingredients,
+        cuisine=cuisine,
+        dietary_restrictions=dietary_restrictions,
+        difficulty=difficulty,
+        model=GEMINI_MODEL,
+        prompt_version=PROMPT_VERSION,
+    )
+    cached: dict[str, str] | None = generation_cache.get(key)
+    if cached is not None:
+        return cached
+
+    similar: dict[str, str] | None = reuse_similar_recipe(
+        ingredients, cuisine, dietary_restrictions, difficulty
+    )
+    if similar is not None:
+        return similar
+
     try:
-        response = client.models.generate_content(
-            model="gemini-1.5-flash",
-            contents=(
-                f"Generate a {difficulty} {cuisine} recipe for a {dietary_restrictions} diet "
-                f"using ingredients: {', '.join(ingredients)}.\n\n"
-                "Include:\n"
-                "- Title\n"
-                "- Description\n"
-                "- Step-by-step instructions\n"
-                "- Substitution suggestions\n"
-                "- Serving tips"
-            ),
-        )
+        client = get_genai_client(GOOGLE_AI_STUDIO_API_KEY)
 
-        return {"text": response.text}
+        def call():
+            with timed("gemini"):
+                return client.models.generate_content(
+                    model=GEMINI_MODEL,
+                    contents=build_recipe_prompt(
+                        ingredients, cuisine, dietary_restrictions, difficulty
+                    ),
+                )
+
+        response = guarded_call(
+            "gemini",
+            call,
+            deadline=settings.GEMINI_DEADLINE,
+            hedge_percentile=settings.GEMINI_HEDGE_PERCENTILE,
+        )
 
     except Exception as e:
         return {"error": str(e)}
 
+    result: dict[str, str] = {"text": response.text}
+    generation_cache.set(key, result)
+    return result
+
+
+# streaming variant of generate_recipe_content, yielding text as Gemini produces it
+def stream_recipe_content(
+    ingredients: list, cuisine: str, dietary_restrictions: str, difficulty: str
+) -> Iterator[dict[str, str]]:
+    """
+    Stream a recipe from Google AI Studio API as {"text": chunk} items.
+    A failure ends the stream with an {"error": ...} item. The assembled text
+    shares the generate_recipe_content cache, so a hit is yielded as one chunk.
+    """
+    key: str = generation_fingerprint(
+        ingredients=ingredients,
+        cuisine=cuisine,
+        dietary_restrictions=dietary_restrictions,
+        difficulty=difficulty,
+        model=GEMINI_MODEL,
+        prompt_version=PROMPT_VERSION,
+    )
+    cached: dict[str, str] | None = generation_cache.get(key)
+    if cached is not None:
+        yield cached
+        return
+
+    similar: dict[str, str] | None = reuse_similar_recipe(
+        ingredients, cuisine, dietary_restrictions, difficulty
+    )
+    if similar is not None:
+        yield {"text": similar["text"]}
+        return
+
+    parts: list[str] = []
+    try:
+        client = get_genai_client(GOOGLE_AI_STUDIO_API_KEY)
+
+        def open_stream():
+            with timed("gemini"):
+                yield from client.models.generate_content_stream(
+                    model=GEMINI_MODEL,
+                    contents=build_recipe_prompt(
+                        ingredients, cuisine, dietary_restrictions, difficulty
+                    ),
+                )
+
+        # not hedged: a second stream would repeat text already sent
+        for chunk in guarded_stream(
+            "gemini", open_stream, deadline=settings.GEMINI_DEADLINE
+        ):
+            if chunk.text:
+                parts.append(chunk.text)
+                yield {"text": chunk.text}
+
+    except Exception as e:
+        yield {"error": str(e)}
+        return
+
+    generation_cache.set(key, {"text": "".join(parts)})
+
+
+def nutrition_query(ingredient: Any) -> str:
+    """
+    Write an ingredient line as a Nutritionix query, such as "200 g pasta",
+    with its unit in canonical spelling and counted items left bare.
+    """
+    unit: str = canonical_unit(ingredient.unit)
+    if unit == BASE_UNITS[COUNT]:
+        unit = ""
+    return " ".join(
+        part
+        for part in (normalize_quantity(ingredient.quantity), unit, ingredient.name)
+        if part
+    )
+
 
 # using the Nutritionix API to get nutritional information for a recipe
 def get_nutritional_info(ingredients: list) -> dict[str, str]:
     """
     Get nutritional information for a list of ingredients using the Nutritionix API.
+    Foods are cached per ingredient line and only uncached lines are queried.
+    """
+    measured: list[Any] = [i for i in ingredients if i.quantity and i.name]
+    # lines are keyed by their amount in base units, so "1 kg" hits "1000 g"
+    amounts: list[tuple[Decimal, str]] = to_base_many(
+        (i.quantity, i.unit, i.name) for i in measured
+    )
+    lines: list[tuple[str, str]] = [
+        (nutrition_fingerprint(i.name, amount, unit), nutrition_query(i))
+        for i, (amount, unit) in zip(measured, amounts)
+    ]
+    foods_by_line: dict[str, list] = nutrition_cache.get_many(key for key, _ in lines)
+    missing: dict[str, str] = {
+        key: query for key, query in lines if key not in foods_by_line
+    }
+
+    unattributed: list = []
+    if missing:
+        response: dict = _query_nutritionix(list(missing.values()))
+        if "error" in response:
+            return response
+
+        # cached and stored without per-food photos and metadata
+        foods: list = compact_foods(response.get("foods", []))
+        if len(foods) == len(missing):
+            # Nutritionix answers one food per query line, in query order
+            fresh: dict[str, list] = {key: [food] for key, food in zip(missing, foods)}
+            nutrition_cache.set_many(fresh)
+            foods_by_line.update(fresh)
+        else:
+            # a line matched several foods (or none), so results can't be
+            # attributed to lines; return them uncached
+            unattributed = foods
+
+    merged: list = []
+    for key, _ in lines:
+        merged.extend(foods_by_line.get(key, []))
+    merged.extend(unattributed)
+    return {"foods": merged}
+
+
+def _query_nutritionix(lines: list[str]) -> dict:
+    """
+    Post ingredient lines to the Nutritionix natural language nutrients endpoint.
     """
     url: str = "https://trackapi.nutritionix.com/v2/natural/nutrients"
     headers: dict[str, str | None] = {
@@ -51,16 +233,14 @@ def get_nutritional_info(ingredients: list) -> dict[str, str]:
         "x-app-key": NUTRITIONIX_API_KEY,
         "Content-Type": "application/json",
     }
+    data: dict[str, str] = {"query": "\n".join(lines), "timezone": "Asia/Kolkata"}
 
-    query: str = "\n".join(
-        [f"{i.quantity} {i.name}" for i in ingredients if i.quantity and i.name]
-    )
-    data: dict[str, str] = {"query": query, "timezone": "Asia/Kolkata"}
+    def call():
+        with timed("nutritionix"):
+            return post_json(url, headers=headers, payload=data)
 
     try:
-        response = requests.post(url, headers=headers, json=data)
-        response.raise_for_status()
-        return response.json()
+        return guarded_call("nutritionix", call, deadline=settings.NUTRITIONIX_DEADLINE)
 
-    except requests.RequestException as e:
+    except (requests.RequestException, UpstreamUnavailable, UpstreamTimeout) as e:
         return {"error": str(e)}
@@ -1,8 +1,43 @@
+import asyncio
+import json
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
+from django.urls import reverse
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_GET, require_POST
 from rest_framework import status
-from rest_framework.decorators import api_view
+from rest_framework.decorators import api_view, renderer_classes
 from rest_framework.response import Response
-from .models import Recipe
-from .serializers import RecipeSerializer
+from .catalog import encode_ndjson, iter_recipe_chunks
+from .filters import filter_recipes, filter_since
+from .http_cache import LIST_VERSION_KEY, RECIPE_VERSION_KEY, cached_response
+from .jobs import enqueue_generation_job
+from .metrics import render_metrics
+from .models import GenerationJob, Recipe
+from .pagination import RecipeCursorPagination
+from .pantry import pantry_index
+from .readers import read_recipes, recipe_columns, serialize_recipe_rows
+from .routers import pin_primary
+from .renderers import (
+    EventStreamRenderer,
+    FastJSONRenderer,
+    NDJSONRenderer,
+    sse_event,
+)
+from .scaling import parse_servings, scale_recipe
+from .search import search_recipes
+from .serializers import GenerationJobSerializer, RecipeSerializer
+from .services import (
+    GenerationError,
+    generate_recipe_for,
+    generate_recipes_batch,
+    generation_inputs,
+    ingredient_lines,
+    save_generated_recipe,
+    stream_generated_recipe,
+)
+from .upstream import upstream_task
 from .utils import get_nutritional_info, generate_recipe_content
 from typing import Any
 
@@ -10,11 +45,130 @@ from typing import Any
 @api_view(["GET"])
 def recipe_list(request):
     """
-    List all recipes.
+    List recipes, newest first, one cursor-paginated page at a time.
+    Filter with ?cuisine=, ?dietary_restrictions=, ?difficulty= (comma-separated
+    values allowed), ?min_total_time= and ?max_total_time= (minutes), and
+    per-serving nutrition bounds such as ?calories_per_serving__lte=, and
+    cost bounds (?cost__lte=, ?cost_per_serving__gte=, ...). ?ordering= sorts
+    by cost or cost_per_serving instead, with a leading - for descending.
+    Responses carry an ETag and are cached until a recipe changes.
     """
-    recipes = Recipe.objects.all()
-    serializer = RecipeSerializer(recipes, many=True)
-    return Response(serializer.data, status=status.HTTP_200_OK)
+
+    def build() -> Response:
+        recipes = filter_recipes(Recipe.objects.all(), request.query_params)
+        paginator = RecipeCursorPagination()
+        rows: list = paginator.paginate_queryset(
+            recipes.values(*recipe_columns()), request
+        )
+        return paginator.get_paginated_response(serialize_recipe_rows(rows))
+
+    return cached_response(request, LIST_VERSION_KEY, build)
+
+
+@api_view(["GET"])
+@renderer_classes([FastJSONRenderer, NDJSONRenderer])
+def recipe_export(request):
+    """
+    Stream every recipe as NDJSON, oldest first, ordered by created_at then
+    id. ?since= limits the export to recipes created at or after a date or
+    datetime for incremental pulls; the recipe_list filters also apply.
+    Recipes are read and serialized RECIPE_EXPORT_CHUNK_SIZE at a time, so
+    memory stays flat however large the catalog.
+    """
+    recipes = filter_since(
+        filter_recipes(Recipe.objects.all(), request.query_params),
+        request.query_params,
+    ).order_by("created_at", "id")
+    # the stream is read after this view returns, outside the request's
+    # database routing, so bind it to the database chosen now
+    recipes = recipes.using(recipes.db)
+    response = StreamingHttpResponse(
+        encode_ndjson(iter_recipe_chunks(recipes, settings.RECIPE_EXPORT_CHUNK_SIZE)),
+        content_type="application/x-ndjson",
+    )
+    response["Cache-Control"] = "no-cache"
+    response["X-Accel-Buffering"] = "no"
+    return response
+
+
+@api_view(["GET"])
+def recipe_search(request):
+    """
+    Full-text search over recipe titles, descriptions and instructions with ?q=,
+    best matches first. Accepts the recipe_list filters and ?limit= (default
+    RECIPE_PAGE_SIZE, at most RECIPE_MAX_PAGE_SIZE).
+    """
+    query: str = request.query_params.get("q", "").strip()
+    if not query:
+        return Response(
+            {"q": ["A search query is required."]}, status=status.HTTP_400_BAD_REQUEST
+        )
+    try:
+        limit: int = int(request.query_params.get("limit", settings.RECIPE_PAGE_SIZE))
+    except ValueError:
+        return Response(
+            {"limit": ["A valid integer is required."]},
+            status=status.HTTP_400_BAD_REQUEST,
+        )
+    limit = max(1, min(limit, settings.RECIPE_MAX_PAGE_SIZE))
+
+    recipes = filter_recipes(Recipe.objects.all(), request.query_params)
+    matches: list[dict[str, Any]] = read_recipes(search_recipes(recipes, query)[:limit])
+    return Response({"results": matches}, status=status.HTTP_200_OK)
+
+
+@api_view(["POST"])
+def recipe_pantry_match(request):
+    """
+    Find stored recipes for a pantry: {"ingredients": ["tomato", ...], "limit": n,
+    "max_missing": n}. Recipes are ranked by the share of their ingredients the
+    pantry covers, and each result lists the ingredients still missing.
+    """
+    pantry: Any = (
+        request.data.get("ingredients") if isinstance(request.data, dict) else None
+    )
+    if (
+        not isinstance(pantry, list)
+        or not pantry
+        or not all(isinstance(name, str) for name in pantry)
+    ):
+        return Response(
+            {"ingredients": ["Expected a non-empty list of ingredient names."]},
+            status=status.HTTP_400_BAD_REQUEST,
+        )
+    try:
+        limit: int = int(request.data.get("limit", settings.RECIPE_PAGE_SIZE))
+        max_missing: int | None = (
+            int(request.data["max_missing"])
+            if request.data.get("max_missing") is not None
+            else None
+        )
+    except (TypeError, ValueError):
+        return Response(
+            {"error": "limit and max_missing must be integers."},
+            status=status.HTTP_400_BAD_REQUEST,
+        )
+    limit = max(1, min(limit, settings.RECIPE_MAX_PAGE_SIZE))
+
+    matches: list[dict[str, Any]] = [
+        match
+        for match in pantry_index.match(pantry)
+        if max_missing is None or len(match["missing"]) <= max_missing
+    ][:limit]
+    recipes: dict[int, Recipe] = Recipe.objects.prefetch_related("ingredients").in_bulk(
+        [match["recipe_id"] for match in matches]
+    )
+    results: list[dict[str, Any]] = [
+        {
+            "recipe": RecipeSerializer(recipes[match["recipe_id"]]).data,
+            "coverage": round(match["coverage"], 4),
+            "missing": match["missing"],
+        }
+        for match in matches
+        # deleted since the index last synced, or not on the read replica yet
+        if match["recipe_id"] in recipes
+    ]
+    return Response({"results": results}, status=status.HTTP_200_OK)
 
 
 @api_view(["GET"])
@@ -22,53 +176,269 @@ def recipe_detail(request, pk):
     """
     Retrieve a specific recipe by its ID.
     """
+
+    def build() -> Response:
+        recipes: list[dict[str, Any]] = read_recipes(Recipe.objects.filter(pk=pk))
+        if not recipes:
+            return Response(
+                {"error": "Recipe not found"}, status=status.HTTP_404_NOT_FOUND
+            )
+        return Response(recipes[0], status=status.HTTP_200_OK)
+
+    return cached_response(request, RECIPE_VERSION_KEY.format(pk), build)
+
+
+@api_view(["GET"])
+def recipe_scale(request, pk):
+    """
+    Scale a recipe's ingredients, nutrition and cost to ?servings=n.
+    Read-only: nothing is written to the database.
+    """
     try:
-        recipe = Recipe.objects.get(pk=pk)
-        serializer = RecipeSerializer(recipe)
-        return Response(serializer.data, status=status.HTTP_200_OK)
+        servings: int = parse_servings(request.query_params.get("servings"))
+    except (TypeError, ValueError):
+        return Response(
+            {
+                "servings": [
+                    f"Expected an integer between 1 and {settings.RECIPE_MAX_SERVINGS}."
+                ]
+            },
+            status=status.HTTP_400_BAD_REQUEST,
+        )
+    try:
+        recipe = Recipe.objects.prefetch_related("ingredients").get(pk=pk)
     except Recipe.DoesNotExist:
         return Response({"error": "Recipe not found"}, status=status.HTTP_404_NOT_FOUND)
+    return Response(scale_recipe(recipe, servings), status=status.HTTP_200_OK)
+
+
+@api_view(["POST"])
+def recipe_scale_batch(request):
+    """
+    Scale many recipes in one call, e.g. for a meal plan:
+    {"items": [{"recipe": id, "servings": n}, ...]}. Every recipe and its
+    ingredients are loaded in two queries, and each item reports success or errors.
+    """
+    items: Any = request.data.get("items") if isinstance(request.data, dict) else None
+    if not isinstance(items, list) or not items:
+        return Response(
+            {"items": ["Expected a non-empty list of {recipe, servings} items."]},
+            status=status.HTTP_400_BAD_REQUEST,
+        )
+    if len(items) > settings.RECIPE_SCALE_MAX_ITEMS:
+        return Response(
+            {
+                "items": [
+                    f"Ensure this list has at most {settings.RECIPE_SCALE_MAX_ITEMS} items."
+                ]
+            },
+            status=status.HTTP_400_BAD_REQUEST,
+        )
+
+    requested: list[tuple[int, int] | dict[str, list[str]]] = []
+    for item in items:
+        errors: dict[str, list[str]] = {}
+        recipe_id: Any = item.get("recipe") if isinstance(item, dict) else None
+        servings: Any = item.get("servings") if isinstance(item, dict) else None
+        if isinstance(recipe_id, bool) or not isinstance(recipe_id, int):
+            errors["recipe"] = ["A valid recipe id is required."]
+        try:
+            servings = parse_servings(servings)
+        except (TypeError, ValueError):
+            errors["servings"] = [
+                f"Expected an integer between 1 and {settings.RECIPE_MAX_SERVINGS}."
+            ]
+        requested.append(errors or (recipe_id, servings))
+
+    recipes: dict[int, Recipe] = Recipe.objects.prefetch_related("ingredients").in_bulk(
+        [entry[0] for entry in requested if isinstance(entry, tuple)]
+    )
+    results: list[dict[str, Any]] = []
+    for index, entry in enumerate(requested):
+        if isinstance(entry, dict):
+            results.append({"index": index, "status": "error", "errors": entry})
+        elif entry[0] not in recipes:
+            results.append(
+                {
+                    "index": index,
+                    "status": "error",
+                    "errors": {"recipe": ["Recipe not found."]},
+                }
+            )
+        else:
+            results.append(
+                {
+                    "index": index,
+                    "status": "scaled",
+                    "result": scale_recipe(recipes[entry[0]], entry[1]),
+                }
+            )
+    return Response({"results": results}, status=status.HTTP_200_OK)
 
 
 @api_view(["POST"])
 def generate_recipe(request):
     """
     Generate a recipe based on user input.
+    Pass ?async=true to queue the generation and get a job id back instead.
     """
     serializer = RecipeSerializer(data=request.data)
     if serializer.is_valid():
-        ing_names: list = [
-            ingredient["name"] for ingredient in request.data["ingredients"]
-        ]
-        cuisine: Any = request.data.get("cuisine")
-        diet: Any = request.data.get("dietary_restrictions")
-        difficulty: Any = request.data.get("difficulty")
-
-        # generating the recipe instructions and details from gemini
-        ai_response: dict[str, str] = generate_recipe_content(
-            ingredients=ing_names,
-            cuisine=cuisine,
-            dietary_restrictions=diet,
-            difficulty=difficulty,
-        )
-        if "error" in ai_response:
+        # the recipe is saved by a job worker, or after the upstream calls;
+        # pin the client now so it reads the recipe back from the primary
+        pin_primary()
+        if request.query_params.get("async") in ("1", "true"):
+            job: GenerationJob = enqueue_generation_job(request.data)
+            status_url: str = reverse("generation_job_detail", args=[job.pk])
+            return Response(
+                {"job_id": job.pk, "status": job.status, "status_url": status_url},
+                status=status.HTTP_202_ACCEPTED,
+                headers={"Location": status_url},
+            )
+
+        # generating the recipe instructions, details and nutrition from the upstream APIs
+        try:
+            recipe_object: Any = generate_recipe_for(serializer)
+        except GenerationError as e:
             return Response(
-                {"error": ai_response["error"]},
+                {"error": str(e)},
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR,
             )
 
-        recipe_object: Any = serializer.save()
+        final_serializer = RecipeSerializer(recipe_object)
+        return Response(final_serializer.data, status=status.HTTP_201_CREATED)
+
+    return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+
+@api_view(["POST"])
+def generate_recipe_batch(request):
+    """
+    Generate many recipes in one call, with bounded upstream concurrency.
+    Accepts {"items": [...], "concurrency": n} and reports success or errors per item.
+    """
+    items: Any = request.data.get("items") if isinstance(request.data, dict) else None
+    if not isinstance(items, list) or not items:
+        return Response(
+            {"items": ["Expected a non-empty list of generation requests."]},
+            status=status.HTTP_400_BAD_REQUEST,
+        )
+    if len(items) > settings.RECIPE_BATCH_MAX_ITEMS:
+        return Response(
+            {
+                "items": [
+                    f"Ensure this list has at most {settings.RECIPE_BATCH_MAX_ITEMS} items."
+                ]
+            },
+            status=status.HTTP_400_BAD_REQUEST,
+        )
 
-        nutritional_info: dict[str, str] = get_nutritional_info(
-            recipe_object.ingredients.all()
+    try:
+        concurrency: int | None = (
+            int(request.data["concurrency"]) if "concurrency" in request.data else None
+        )
+    except (TypeError, ValueError):
+        return Response(
+            {"concurrency": ["A valid integer is required."]},
+            status=status.HTTP_400_BAD_REQUEST,
         )
-        recipe_object.nutritional_info = nutritional_info
 
-        recipe_object.instructions = ai_response.get("text", "")
-        recipe_object.save()
+    # only the upstream calls run on the executor's threads; the recipes are
+    # bulk-inserted on this thread, where the router sees the write, but only
+    # if some item succeeds. Pin up front so every valid batch pins the
+    # client, as the other generate views do
+    pin_primary()
+    results: list[dict[str, Any]] = generate_recipes_batch(items, concurrency)
+    return Response({"results": results}, status=status.HTTP_200_OK)
 
-        final_serializer = RecipeSerializer(recipe_object)
-        return Response(final_serializer.data, status=status.HTTP_201_CREATED)
 
-    print("❌ Serializer Errors:", serializer.errors)  # Add this line
-    return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+@api_view(["GET"])
+def generation_job_detail(request, pk):
+    """
+    Retrieve the status of a background generation job, and its recipe once finished.
+    """
+    try:
+        job = GenerationJob.objects.select_related("recipe").get(pk=pk)
+        serializer = GenerationJobSerializer(job)
+        return Response(serializer.data, status=status.HTTP_200_OK)
+    except GenerationJob.DoesNotExist:
+        return Response({"error": "Job not found"}, status=status.HTTP_404_NOT_FOUND)
+
+
+@api_view(["POST"])
+@renderer_classes([FastJSONRenderer, EventStreamRenderer])
+def generate_recipe_stream(request):
+    """
+    Generate a recipe, streaming the instructions as Server-Sent Events while
+    Gemini produces them. The final "recipe" event carries the saved recipe.
+    """
+    serializer = RecipeSerializer(data=request.data)
+    if not serializer.is_valid():
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+    # the recipe is saved while the response streams, after
+    # ReplicaRoutingMiddleware has set its cookies
+    pin_primary()
+    events = (
+        sse_event(event, data) for event, data in stream_generated_recipe(serializer)
+    )
+    response = StreamingHttpResponse(events, content_type="text/event-stream")
+    response["Cache-Control"] = "no-cache"
+    # stop nginx from buffering the stream until it completes
+    response["X-Accel-Buffering"] = "no"
+    return response
+
+
+@csrf_exempt
+@require_POST
+async def generate_recipe_async(request):
+    """
+    Generate a recipe without blocking a worker, running the Gemini and
+    Nutritionix calls concurrently. Serve through recipe_creator.asgi.
+    """
+    try:
+        data: Any = json.loads(request.body)
+    except (json.JSONDecodeError, UnicodeDecodeError):
+        return JsonResponse(
+            {"error": "Request body must be valid JSON"},
+            status=status.HTTP_400_BAD_REQUEST,
+        )
+
+    serializer = RecipeSerializer(data=data)
+    if not await sync_to_async(serializer.is_valid)():
+        return JsonResponse(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+    pin_primary()
+
+    # nutrition depends only on the requested ingredients, so both upstream calls
+    # run at once on separate threads instead of the shared sync thread
+    ai_response, nutritional_info = await asyncio.gather(
+        sync_to_async(upstream_task(generate_recipe_content), thread_sensitive=False)(
+            **generation_inputs(serializer.validated_data)
+        ),
+        sync_to_async(upstream_task(get_nutritional_info), thread_sensitive=False)(
+            ingredient_lines(serializer.validated_data)
+        ),
+    )
+    if "error" in ai_response:
+        return JsonResponse(
+            {"error": ai_response["error"]},
+            status=status.HTTP_500_INTERNAL_SERVER_ERROR,
+        )
+
+    recipe_object: Recipe = await sync_to_async(save_generated_recipe)(
+        serializer, ai_response.get("text", ""), nutritional_info
+    )
+    data = await sync_to_async(lambda: RecipeSerializer(recipe_object).data)()
+    return JsonResponse(data, status=status.HTTP_201_CREATED)
+
+
+@require_GET
+def metrics(request):
+    """
+    Expose the request, database, upstream and serialization histograms in
+    the Prometheus text format, aggregated over every worker sharing the
+    recipes_state cache.
+    """
+    return HttpResponse(
+        render_metrics(), content_type="text/plain; version=0.0.4; charset=utf-8"
+    )